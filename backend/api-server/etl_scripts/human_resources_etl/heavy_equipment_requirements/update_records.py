@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 """
 批量更新人力資源記錄
-根據 out.json 中的記錄，逐一發送 PATCH API 請求來更新資料庫
+根據 out.json 中的記錄，分批發送 PATCH /human_resources/bulk 請求來更新資料庫
 
-API 格式: PATCH https://guangfu250923.pttapp.cc/human_resources/{id}
+API 格式: PATCH https://guangfu250923.pttapp.cc/human_resources/bulk
+    請求主體為陣列，每筆為 {"id": ..., 其餘欄位同 PATCH /human_resources/{id}}，需要 API Key
 
 使用方法:
     python update_records.py                # 互動模式，會詢問確認
@@ -13,6 +14,8 @@ API 格式: PATCH https://guangfu250923.pttapp.cc/human_resources/{id}
 
 參數說明:
     --auto-confirm, -y    自動確認，不需要互動輸入
+    --api-key             API Key（未指定時讀取環境變數 GF_API_KEY）
+    --batch-size          每次請求的筆數（預設 500，不可超過伺服器的 BULK_MAX_ITEMS）
 
 依賴套件:
     pip install requests
@@ -20,17 +23,18 @@ API 格式: PATCH https://guangfu250923.pttapp.cc/human_resources/{id}
 功能特點:
     - 安全確認: 執行前會顯示摘要並要求確認（除非使用 --auto-confirm）
     - 錯誤處理: 包含完整的錯誤處理和日誌記錄
-    - 請求限制: 每次請求間隔 1 秒，避免過於頻繁的 API 調用
-    - 詳細日誌: 顯示每筆記錄的更新狀態和結果摘要
-    - 容錯機制: 單筆記錄失敗不會影響其他記錄的更新
+    - 批次請求: 每批一次請求、伺服器端一個交易，批次間隔 1 秒
+    - 詳細日誌: 依伺服器回傳的 results 顯示每筆記錄的更新狀態和結果摘要
+    - 容錯機制: 單筆記錄失敗不會影響同批其他記錄的更新
 
 注意事項:
     - 確保 out.json 文件存在且格式正確
     - 確認網路連線正常，能夠訪問 API 端點
-    - 腳本會自動移除請求主體中的 id 欄位
+    - id 欄位會連同其他欄位一起送出，伺服器以 id 對應要更新的記錄
 """
 
 import json
+import os
 import requests
 import time
 from typing import List, Dict, Any
@@ -39,7 +43,9 @@ import argparse
 
 # API 設定
 BASE_URL = "https://guangfu250923.pttapp.cc/human_resources"
-REQUEST_DELAY = 1  # 每次請求間隔秒數，避免過於頻繁的請求
+BULK_URL = f"{BASE_URL}/bulk"
+REQUEST_DELAY = 1  # 每批請求間隔秒數，避免過於頻繁的請求
+DEFAULT_BATCH_SIZE = 500
 
 def load_records(file_path: str) -> List[Dict[str, Any]]:
     """讀取 out.json 文件"""
@@ -55,45 +61,41 @@ def load_records(file_path: str) -> List[Dict[str, Any]]:
         print(f"❌ JSON 格式錯誤: {e}")
         sys.exit(1)
 
-def prepare_patch_data(record: Dict[str, Any]) -> Dict[str, Any]:
-    """準備 PATCH 請求的資料，移除 id 欄位"""
-    patch_data = record.copy()
-    patch_data.pop('id', None)  # 移除 id，因為它不應該在請求主體中
-    return patch_data
-
-def update_record(record: Dict[str, Any]) -> bool:
-    """發送 PATCH 請求更新單筆記錄"""
-    record_id = record.get('id')
-    if not record_id:
+def update_batch(records: List[Dict[str, Any]], api_key: str) -> int:
+    """發送一次 PATCH /bulk 請求更新一批記錄，回傳成功筆數"""
+    missing_id = [record for record in records if not record.get('id')]
+    for record in missing_id:
         print(f"❌ 記錄缺少 ID: {record}")
-        return False
-
-    url = f"{BASE_URL}/{record_id}"
-    patch_data = prepare_patch_data(record)
+    records = [record for record in records if record.get('id')]
+    if not records:
+        return 0
 
     try:
-        print(f"🔄 更新記錄: {record_id} ({record.get('org', 'N/A')})")
-
-        # 發送 PATCH 請求
         response = requests.patch(
-            url,
-            json=patch_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            BULK_URL,
+            json=records,
+            headers={'Content-Type': 'application/json', 'x-api-key': api_key},
+            timeout=120
         )
-
-        if response.status_code == 200:
-            print(f"✅ 成功更新: {record_id}")
-            return True
-        else:
-            print(f"❌ 更新失敗: {record_id}")
-            print(f"   狀態碼: {response.status_code}")
-            print(f"   回應: {response.text}")
-            return False
-
     except requests.exceptions.RequestException as e:
-        print(f"❌ 網路錯誤: {record_id} - {e}")
-        return False
+        print(f"❌ 網路錯誤: {e}")
+        return 0
+
+    if response.status_code != 200:
+        print(f"❌ 批次更新失敗，狀態碼: {response.status_code}")
+        print(f"   回應: {response.text}")
+        return 0
+
+    body = response.json()
+    for result in body['results']:
+        record = records[result['index']]
+        if result['status'] == 200:
+            print(f"✅ 成功更新: {record['id']} ({record.get('org', 'N/A')})")
+        else:
+            print(f"❌ 更新失敗: {record['id']} ({record.get('org', 'N/A')})")
+            print(f"   狀態碼: {result['status']}")
+            print(f"   原因: {result['detail']}")
+    return body['succeeded']
 
 def show_summary(records: List[Dict[str, Any]]):
     """顯示將要更新的記錄摘要"""
@@ -125,13 +127,21 @@ def main():
     parser = argparse.ArgumentParser(description='批量更新人力資源記錄')
     parser.add_argument('--auto-confirm', '-y', action='store_true',
                        help='自動確認，不需要互動輸入')
+    parser.add_argument('--api-key', default=os.environ.get('GF_API_KEY', ''),
+                       help='API Key（預設讀取環境變數 GF_API_KEY）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='每次請求的筆數')
     args = parser.parse_args()
 
+    if not args.api_key:
+        print("❌ 請以 --api-key 或環境變數 GF_API_KEY 提供 API Key")
+        sys.exit(1)
+
     input_file = "out.json"
 
     print("🚀 人力資源記錄批量更新工具")
     print(f"📂 讀取文件: {input_file}")
-    print(f"🌐 API 端點: {BASE_URL}")
+    print(f"🌐 API 端點: {BULK_URL}")
 
     # 讀取記錄
     records = load_records(input_file)
@@ -145,22 +155,18 @@ def main():
         return
 
     # 執行批量更新
-    print(f"\n🔄 開始批量更新 (每次請求間隔 {REQUEST_DELAY} 秒)...")
+    print(f"\n🔄 開始批量更新 (每批 {args.batch_size} 筆，批次間隔 {REQUEST_DELAY} 秒)...")
 
     success_count = 0
-    fail_count = 0
-
-    for i, record in enumerate(records, 1):
-        print(f"\n[{i}/{len(records)}]", end=" ")
-
-        if update_record(record):
-            success_count += 1
-        else:
-            fail_count += 1
+    for start in range(0, len(records), args.batch_size):
+        batch = records[start:start + args.batch_size]
+        print(f"\n[{start + 1}-{start + len(batch)}/{len(records)}]")
+        success_count += update_batch(batch, args.api_key)
 
-        # 在請求之間添加延遲
-        if i < len(records):
+        # 在批次之間添加延遲
+        if start + args.batch_size < len(records):
             time.sleep(REQUEST_DELAY)
+    fail_count = len(records) - success_count
 
     # 顯示最終結果
     print("\n" + "="*60)
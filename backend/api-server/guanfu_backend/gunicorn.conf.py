@@ -0,0 +1,32 @@
+# ============================================================================
+# gunicorn 設定：多個 uvicorn worker process
+# ============================================================================
+# 使用方式：gunicorn -c gunicorn.conf.py src.main:app
+# 本機開發仍可直接使用 uvicorn src.main:app --reload
+# ============================================================================
+import multiprocessing
+import os
+
+from src.config import settings
+
+bind = f"0.0.0.0:{os.environ.get('PORT', settings.SERVER_PORT)}"
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# WEB_CONCURRENCY 未設定時依 CPU 核心數計算（gunicorn 建議值 2 * CPU + 1）
+# 注意：每個 worker 各自持有 DB 連線池，需確認總連線數不超過 Postgres max_connections
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count() * 2 + 1
+# 寫回實際的 worker 數：worker 沿用這份 settings，多 worker 時停用無法跨 process 失效的記憶體快取
+settings.WEB_CONCURRENCY = workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# 不預先載入 app：每個 worker 在 fork 之後才建立 engine 與連線池
+# （若改為 True，database.py 也會在 fork 後重置繼承來的連線池）
+preload_app = False
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+loglevel = "info"
+accesslog = None
+errorlog = "-"
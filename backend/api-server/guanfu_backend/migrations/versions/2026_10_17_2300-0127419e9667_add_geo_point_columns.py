@@ -0,0 +1,63 @@
+"""add geo point columns
+
+Revision ID: 0127419e9667
+Revises: 366782842de9
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0127419e9667'
+down_revision: Union[str, Sequence[str], None] = '366782842de9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATION_TABLES = (
+    "shelters",
+    "medical_stations",
+    "mental_health_resources",
+    "accommodations",
+    "shower_stations",
+    "water_refill_stations",
+    "restrooms",
+)
+# 資料表 -> (緯度 JSONB 路徑, 經度 JSONB 路徑)；與 src/models.py 的 geo_column 相同
+GEO_PATHS = {table: (("{lat}",), ("{lng}",)) for table in STATION_TABLES}
+# places 為 GeoJSON：Point 取該點，Polygon / LineString 取第一個頂點
+GEO_PATHS["places"] = (("{coordinates,1}", "{coordinates,0,1}"), ("{coordinates,0}", "{coordinates,0,0}"))
+
+
+def _coordinate_sql(paths) -> str:
+    values = ", ".join(
+        f"CASE WHEN jsonb_typeof(coordinates #> '{path}') = 'number' "
+        f"THEN (coordinates #>> '{path}')::double precision END"
+        for path in paths
+    )
+    return f"COALESCE({values})"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for table, (lat_paths, lng_paths) in GEO_PATHS.items():
+        # places 等資料表可能是由 init_db() 的 create_all 建立，已含新欄位
+        if not inspector.has_table(table):
+            continue
+        op.execute(
+            f"ALTER TABLE {table} "
+            f"ADD COLUMN IF NOT EXISTS geo_lat double precision GENERATED ALWAYS AS ({_coordinate_sql(lat_paths)}) STORED, "
+            f"ADD COLUMN IF NOT EXISTS geo_lng double precision GENERATED ALWAYS AS ({_coordinate_sql(lng_paths)}) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_geo_point ON {table} USING gist (point(geo_lng, geo_lat))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in GEO_PATHS:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_geo_point")
+        op.execute(f"ALTER TABLE IF EXISTS {table} DROP COLUMN IF EXISTS geo_lat, DROP COLUMN IF EXISTS geo_lng")
@@ -0,0 +1,74 @@
+"""add bigram search vectors
+
+Revision ID: 5d2c8e1f4a7b
+Revises: 0127419e9667
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2c8e1f4a7b'
+down_revision: Union[str, Sequence[str], None] = '0127419e9667'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 與 src/models.py 的 SEARCH_FUNCTIONS_DDL 相同
+SEARCH_FUNCTIONS_DDL = """
+CREATE OR REPLACE FUNCTION gf_search_vector(doc text) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT array_to_tsvector(coalesce(array_agg(DISTINCT tok), '{}'))
+    FROM regexp_split_to_table(lower(coalesce(doc, '')), '[[:space:][:punct:]]+') AS word,
+         generate_series(1, char_length(word)) AS i,
+         LATERAL (VALUES (substr(word, i, 1)), (substr(word, i, 2))) AS t(tok)
+    WHERE word <> ''
+$$;
+
+CREATE OR REPLACE FUNCTION gf_search_query(q text) RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT string_agg(quote_literal(tok), ' & ')::tsquery
+    FROM (
+        SELECT DISTINCT CASE WHEN char_length(word) = 1 THEN word ELSE substr(word, i, 2) END AS tok
+        FROM regexp_split_to_table(lower(coalesce(q, '')), '[[:space:][:punct:]]+') AS word,
+             generate_series(1, greatest(char_length(word) - 1, 1)) AS i
+        WHERE word <> ''
+    ) t
+$$;
+"""
+
+# 資料表 -> 搜尋的文字欄位；與 src/models.py 的 search_column 相同
+SEARCH_COLUMNS = {
+    "human_resources": ("role_name", "role_type", "assignment_notes"),
+    "supplies": ("name",),
+    "supply_items": ("name",),
+    "places": ("name", "address"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(SEARCH_FUNCTIONS_DDL)
+    inspector = sa.inspect(op.get_bind())
+    for table, columns in SEARCH_COLUMNS.items():
+        # places 等資料表可能是由 init_db() 的 create_all 建立，已含新欄位
+        if not inspector.has_table(table):
+            continue
+        document = " || ' ' || ".join(f"coalesce({name}, '')" for name in columns)
+        op.execute(
+            f"ALTER TABLE {table} "
+            f"ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (gf_search_vector({document})) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SEARCH_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+        op.execute(f"ALTER TABLE IF EXISTS {table} DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP FUNCTION IF EXISTS gf_search_query(text)")
+    op.execute("DROP FUNCTION IF EXISTS gf_search_vector(text)")
@@ -0,0 +1,72 @@
+"""add list query indexes
+
+Revision ID: 9b4e7a1c3d52
+Revises: 5d2c8e1f4a7b
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e7a1c3d52'
+down_revision: Union[str, Sequence[str], None] = '5d2c8e1f4a7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 資料表 -> (排序欄位, 篩選欄位)；與 src/models.py 的 list_indexes 相同
+LIST_INDEXES = {
+    "shelters": ("updated_at", ("status",)),
+    "medical_stations": ("updated_at", ("status", "station_type")),
+    "mental_health_resources": ("updated_at", ("status",)),
+    "accommodations": ("updated_at", ("status", "township")),
+    "shower_stations": ("updated_at", ("status",)),
+    "water_refill_stations": ("updated_at", ("status",)),
+    "restrooms": ("updated_at", ("status",)),
+    "places": ("updated_at", ("status", "type")),
+    "human_resources": ("created_at", ("status", "role_status")),
+    "supplies": ("updated_at", ()),
+    "reports": ("updated_at", ("status",)),
+    "supply_providers": ("updated_at", ("supply_item_id",)),
+    "requirements_hr": ("updated_at", ("place_id",)),
+    "requirements_supplies": ("updated_at", ("place_id",)),
+}
+# 其他索引：(資料表, 索引名稱, 欄位, WHERE 條件)
+EXTRA_INDEXES = (
+    ("supply_items", "ix_supply_items_supply_id", "supply_id", None),
+    ("supply_items", "ix_supply_items_unfulfilled", "supply_id", "received_count < total_number"),
+)
+
+
+def _indexes():
+    for table, (sort_column, filter_columns) in LIST_INDEXES.items():
+        yield table, f"ix_{table}_{sort_column}", f"{sort_column}, id", None
+        for column in filter_columns:
+            yield table, f"ix_{table}_{column}_{sort_column}", f"{column}, {sort_column}, id", None
+    yield from EXTRA_INDEXES
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    tables = set()
+    for table, name, columns, where in _indexes():
+        # 資料表可能是由 init_db() 的 create_all 建立，已含這些索引
+        if not inspector.has_table(table):
+            continue
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})" + (f" WHERE {where}" if where else "")
+        )
+        tables.add(table)
+    # 更新統計資料，讓 planner 立即考慮新索引
+    for table in sorted(tables):
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for _, name, _, _ in _indexes():
+        op.execute(f"DROP INDEX IF EXISTS {name}")
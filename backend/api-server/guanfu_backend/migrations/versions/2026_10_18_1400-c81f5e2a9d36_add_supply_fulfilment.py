@@ -0,0 +1,84 @@
+"""add supply fulfilment columns
+
+Revision ID: c81f5e2a9d36
+Revises: 9b4e7a1c3d52
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f5e2a9d36'
+down_revision: Union[str, Sequence[str], None] = '9b4e7a1c3d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 與 src/models.py 的 SUPPLY_REMAINING_DDL 相同
+SUPPLY_REMAINING_DDL = """
+CREATE OR REPLACE FUNCTION gf_refresh_supply_remaining(target_supply_id varchar) RETURNS void
+LANGUAGE sql AS $$
+    UPDATE supplies SET remaining_count = (
+        SELECT coalesce(sum(greatest(total_number - coalesce(received_count, 0), 0)), 0)
+        FROM supply_items WHERE supply_id = target_supply_id
+    )
+    WHERE id = target_supply_id
+$$;
+
+CREATE OR REPLACE FUNCTION gf_supply_items_remaining_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM gf_refresh_supply_remaining(OLD.supply_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.supply_id IS DISTINCT FROM OLD.supply_id) THEN
+        PERFORM gf_refresh_supply_remaining(NEW.supply_id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS supply_items_remaining ON supply_items;
+CREATE TRIGGER supply_items_remaining
+    AFTER INSERT OR DELETE OR UPDATE OF supply_id, total_number, received_count ON supply_items
+    FOR EACH ROW EXECUTE FUNCTION gf_supply_items_remaining_trigger();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not (inspector.has_table("supplies") and inspector.has_table("supply_items")):
+        return
+    op.execute(
+        "ALTER TABLE supplies "
+        "ADD COLUMN IF NOT EXISTS remaining_count integer NOT NULL DEFAULT 0, "
+        "ADD COLUMN IF NOT EXISTS is_fulfilled boolean GENERATED ALWAYS AS (remaining_count = 0) STORED"
+    )
+    op.execute(SUPPLY_REMAINING_DDL)
+    # 既有資料回填
+    op.execute(
+        "UPDATE supplies SET remaining_count = coalesce(("
+        "SELECT sum(greatest(total_number - coalesce(received_count, 0), 0)) "
+        "FROM supply_items WHERE supply_items.supply_id = supplies.id), 0)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_supplies_is_fulfilled_updated_at ON supplies (is_fulfilled, updated_at, id)")
+    # crud.get_full_supply 改用 supplies.is_fulfilled，不再需要
+    op.execute("DROP INDEX IF EXISTS ix_supply_items_unfulfilled")
+    op.execute("ANALYZE supplies")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS supply_items_remaining ON supply_items")
+    op.execute("DROP FUNCTION IF EXISTS gf_supply_items_remaining_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS gf_refresh_supply_remaining(varchar)")
+    op.execute("DROP INDEX IF EXISTS ix_supplies_is_fulfilled_updated_at")
+    op.execute("ALTER TABLE IF EXISTS supplies DROP COLUMN IF EXISTS is_fulfilled, DROP COLUMN IF EXISTS remaining_count")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_supply_items_unfulfilled ON supply_items (supply_id) "
+        "WHERE received_count < total_number"
+    )
@@ -0,0 +1,87 @@
+"""add change_log table and triggers
+
+Revision ID: e4f1a7c2b960
+Revises: c81f5e2a9d36
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f1a7c2b960'
+down_revision: Union[str, Sequence[str], None] = 'c81f5e2a9d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 與 src/models.py 的 CHANGE_LOG_TABLES 相同
+CHANGE_LOG_TABLES = (
+    "accommodations",
+    "human_resources",
+    "medical_stations",
+    "mental_health_resources",
+    "places",
+    "reports",
+    "requirements_hr",
+    "requirements_supplies",
+    "restrooms",
+    "shelters",
+    "shower_stations",
+    "supplies",
+    "supply_items",
+    "supply_providers",
+    "volunteer_organizations",
+    "water_refill_stations",
+)
+
+# 與 src/models.py 的 CHANGE_LOG_DDL 相同（trigger 另外依資料表建立）
+CHANGE_LOG_FUNCTION_DDL = """
+CREATE OR REPLACE FUNCTION gf_change_log_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO change_log (resource, resource_id, action) VALUES (TG_TABLE_NAME, OLD.id, 'delete');
+    ELSE
+        INSERT INTO change_log (resource, resource_id, action) VALUES (TG_TABLE_NAME, NEW.id, lower(TG_OP));
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("change_log"):
+        op.create_table(
+            "change_log",
+            sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+            sa.Column("resource", sa.String(), nullable=False),
+            sa.Column("resource_id", sa.String(), nullable=False),
+            sa.Column("action", sa.String(), nullable=False),
+            sa.Column("txid", sa.BigInteger(), nullable=False, server_default=sa.text("txid_current()")),
+            sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+        )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_change_log_txid_id ON change_log (txid, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_change_log_resource_txid_id ON change_log (resource, txid, id)")
+    op.execute(CHANGE_LOG_FUNCTION_DDL)
+    for table in CHANGE_LOG_TABLES:
+        if not inspector.has_table(table):
+            continue
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_change_log ON {table}")
+        op.execute(
+            f"CREATE TRIGGER {table}_change_log AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION gf_change_log_trigger()"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in CHANGE_LOG_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_change_log ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS gf_change_log_trigger()")
+    op.execute("DROP TABLE IF EXISTS change_log")
@@ -0,0 +1,73 @@
+"""notify /events listeners from the change_log trigger
+
+Revision ID: f3b8d1e6a074
+Revises: e4f1a7c2b960
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1e6a074'
+down_revision: Union[str, Sequence[str], None] = 'e4f1a7c2b960'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 與 src/models.py 的 CHANGE_LOG_DDL 相同（trigger 已在上一版建立，只替換函式）
+CHANGE_LOG_FUNCTION_DDL = """
+CREATE OR REPLACE FUNCTION gf_change_log_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    row_id varchar;
+    public_id varchar;
+    change_id bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+    ELSE
+        row_id := NEW.id;
+    END IF;
+    INSERT INTO change_log (resource, resource_id, action)
+        VALUES (TG_TABLE_NAME, row_id, lower(TG_OP)) RETURNING id INTO change_id;
+    -- 推播給 /events（src/events.py）；與人力需求列表相同，已完成的需求不公開 id
+    public_id := row_id;
+    IF TG_TABLE_NAME = 'human_resources' AND TG_OP <> 'DELETE' THEN
+        IF NEW.status = 'completed' THEN
+            public_id := '';
+        END IF;
+    END IF;
+    PERFORM pg_notify('gf_changes', json_build_object(
+        'version', change_id, 'resource', TG_TABLE_NAME, 'id', public_id, 'action', lower(TG_OP)
+    )::text);
+    RETURN NULL;
+END
+$$;
+"""
+
+# 上一版（e4f1a7c2b960）的函式，不含 pg_notify
+PREVIOUS_FUNCTION_DDL = """
+CREATE OR REPLACE FUNCTION gf_change_log_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO change_log (resource, resource_id, action) VALUES (TG_TABLE_NAME, OLD.id, 'delete');
+    ELSE
+        INSERT INTO change_log (resource, resource_id, action) VALUES (TG_TABLE_NAME, NEW.id, lower(TG_OP));
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(CHANGE_LOG_FUNCTION_DDL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_FUNCTION_DDL)
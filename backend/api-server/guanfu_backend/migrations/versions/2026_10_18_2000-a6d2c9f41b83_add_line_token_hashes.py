@@ -0,0 +1,50 @@
+"""add line_users token hash columns
+
+Revision ID: a6d2c9f41b83
+Revises: f3b8d1e6a074
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2c9f41b83'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d1e6a074'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("line_users"):
+        return
+    op.execute(
+        "ALTER TABLE line_users "
+        "ADD COLUMN IF NOT EXISTS access_token_hash varchar(64), "
+        "ADD COLUMN IF NOT EXISTS id_token_hash varchar(64)"
+    )
+    # 既有資料回填；與 src/services/line_auth.token_hash 相同（UTF-8 的 SHA-256 hex）
+    op.execute(
+        "UPDATE line_users SET "
+        "access_token_hash = CASE WHEN access_token IS NOT NULL "
+        "THEN encode(sha256(convert_to(access_token, 'UTF8')), 'hex') END, "
+        "id_token_hash = CASE WHEN id_token IS NOT NULL "
+        "THEN encode(sha256(convert_to(id_token, 'UTF8')), 'hex') END"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_line_users_access_token_hash ON line_users (access_token_hash)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_line_users_id_token_hash ON line_users (id_token_hash)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_line_users_id_token_hash")
+    op.execute("DROP INDEX IF EXISTS ix_line_users_access_token_hash")
+    op.execute(
+        "ALTER TABLE IF EXISTS line_users "
+        "DROP COLUMN IF EXISTS access_token_hash, DROP COLUMN IF EXISTS id_token_hash"
+    )
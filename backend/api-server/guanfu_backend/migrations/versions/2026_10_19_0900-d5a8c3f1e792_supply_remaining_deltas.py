@@ -0,0 +1,119 @@
+"""apply supply item remaining deltas instead of re-summing
+
+Revision ID: d5a8c3f1e792
+Revises: a6d2c9f41b83
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8c3f1e792'
+down_revision: Union[str, Sequence[str], None] = 'a6d2c9f41b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 與 src/models.py 的 SUPPLY_REMAINING_DDL 相同
+SUPPLY_REMAINING_DDL = """
+CREATE OR REPLACE FUNCTION gf_supply_item_remaining(total_number integer, received_count integer) RETURNS integer
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT greatest(coalesce(total_number, 0) - coalesce(received_count, 0), 0)
+$$;
+
+CREATE OR REPLACE FUNCTION gf_supply_items_remaining_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    old_remaining integer := 0;
+    new_remaining integer := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_remaining := gf_supply_item_remaining(OLD.total_number, OLD.received_count);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_remaining := gf_supply_item_remaining(NEW.total_number, NEW.received_count);
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND NEW.supply_id IS NOT DISTINCT FROM OLD.supply_id THEN
+        IF new_remaining <> old_remaining THEN
+            UPDATE supplies SET remaining_count = remaining_count + new_remaining - old_remaining
+            WHERE id = NEW.supply_id;
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND old_remaining <> 0 THEN
+        UPDATE supplies SET remaining_count = remaining_count - old_remaining WHERE id = OLD.supply_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND new_remaining <> 0 THEN
+        UPDATE supplies SET remaining_count = remaining_count + new_remaining WHERE id = NEW.supply_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP FUNCTION IF EXISTS gf_refresh_supply_remaining(varchar);
+
+DROP TRIGGER IF EXISTS supply_items_remaining ON supply_items;
+CREATE TRIGGER supply_items_remaining
+    AFTER INSERT OR DELETE OR UPDATE OF supply_id, total_number, received_count ON supply_items
+    FOR EACH ROW EXECUTE FUNCTION gf_supply_items_remaining_trigger();
+"""
+
+# c81f5e2a9d36 的版本（downgrade 用）
+PREVIOUS_SUPPLY_REMAINING_DDL = """
+CREATE OR REPLACE FUNCTION gf_refresh_supply_remaining(target_supply_id varchar) RETURNS void
+LANGUAGE sql AS $$
+    UPDATE supplies SET remaining_count = (
+        SELECT coalesce(sum(greatest(total_number - coalesce(received_count, 0), 0)), 0)
+        FROM supply_items WHERE supply_id = target_supply_id
+    )
+    WHERE id = target_supply_id
+$$;
+
+CREATE OR REPLACE FUNCTION gf_supply_items_remaining_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM gf_refresh_supply_remaining(OLD.supply_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.supply_id IS DISTINCT FROM OLD.supply_id) THEN
+        PERFORM gf_refresh_supply_remaining(NEW.supply_id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP FUNCTION IF EXISTS gf_supply_item_remaining(integer, integer);
+"""
+
+# 舊版 trigger 並行更新時可能已累積誤差，以物資項目重新計算一次；
+# 鎖住 supply_items 避免重算期間有其他寫入
+RESYNC_REMAINING = """
+LOCK TABLE supply_items IN SHARE MODE;
+UPDATE supplies SET remaining_count = coalesce((
+    SELECT sum(greatest(total_number - coalesce(received_count, 0), 0))
+    FROM supply_items WHERE supply_items.supply_id = supplies.id), 0)
+WHERE remaining_count IS DISTINCT FROM coalesce((
+    SELECT sum(greatest(total_number - coalesce(received_count, 0), 0))
+    FROM supply_items WHERE supply_items.supply_id = supplies.id), 0);
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not (inspector.has_table("supplies") and inspector.has_table("supply_items")):
+        return
+    op.execute(SUPPLY_REMAINING_DDL)
+    op.execute(RESYNC_REMAINING)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not (inspector.has_table("supplies") and inspector.has_table("supply_items")):
+        return
+    op.execute(PREVIOUS_SUPPLY_REMAINING_DDL)
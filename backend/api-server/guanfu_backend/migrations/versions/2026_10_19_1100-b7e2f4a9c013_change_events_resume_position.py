@@ -0,0 +1,91 @@
+"""add the resume position to /events notifications
+
+Revision ID: b7e2f4a9c013
+Revises: d5a8c3f1e792
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2f4a9c013'
+down_revision: Union[str, Sequence[str], None] = 'd5a8c3f1e792'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 與 src/models.py 的 CHANGE_LOG_DDL 相同（只替換函式）
+CHANGE_LOG_FUNCTION_DDL = """
+CREATE OR REPLACE FUNCTION gf_change_log_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    row_id varchar;
+    public_id varchar;
+    change_id bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+    ELSE
+        row_id := NEW.id;
+    END IF;
+    INSERT INTO change_log (resource, resource_id, action)
+        VALUES (TG_TABLE_NAME, row_id, lower(TG_OP)) RETURNING id INTO change_id;
+    -- 推播給 /events（src/events.py）；與人力需求列表相同，已完成的需求不公開 id
+    public_id := row_id;
+    IF TG_TABLE_NAME = 'human_resources' AND TG_OP <> 'DELETE' THEN
+        IF NEW.status = 'completed' THEN
+            public_id := '';
+        END IF;
+    END IF;
+    -- xmin、changed_at：SSE 的 id（/changes 的 since），txid 小於 xmin 的交易在此之前都已結束、已推播
+    PERFORM pg_notify('gf_changes', json_build_object(
+        'version', change_id, 'resource', TG_TABLE_NAME, 'id', public_id, 'action', lower(TG_OP),
+        'xmin', txid_snapshot_xmin(txid_current_snapshot()), 'changed_at', now()
+    )::text);
+    RETURN NULL;
+END
+$$;
+"""
+
+# f3b8d1e6a074 的版本（downgrade 用）
+PREVIOUS_FUNCTION_DDL = """
+CREATE OR REPLACE FUNCTION gf_change_log_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    row_id varchar;
+    public_id varchar;
+    change_id bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+    ELSE
+        row_id := NEW.id;
+    END IF;
+    INSERT INTO change_log (resource, resource_id, action)
+        VALUES (TG_TABLE_NAME, row_id, lower(TG_OP)) RETURNING id INTO change_id;
+    -- 推播給 /events（src/events.py）；與人力需求列表相同，已完成的需求不公開 id
+    public_id := row_id;
+    IF TG_TABLE_NAME = 'human_resources' AND TG_OP <> 'DELETE' THEN
+        IF NEW.status = 'completed' THEN
+            public_id := '';
+        END IF;
+    END IF;
+    PERFORM pg_notify('gf_changes', json_build_object(
+        'version', change_id, 'resource', TG_TABLE_NAME, 'id', public_id, 'action', lower(TG_OP)
+    )::text);
+    RETURN NULL;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(CHANGE_LOG_FUNCTION_DDL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_FUNCTION_DDL)
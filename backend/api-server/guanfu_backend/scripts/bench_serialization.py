@@ -0,0 +1,100 @@
+"""
+列表回應序列化效能比較與一致性檢查
+
+比較兩種輸出路徑：
+- response_model：FastAPI 驗證 + pydantic 序列化 + JSONResponse（原本的路徑）
+- serializers.fast_response：預先編譯的 row -> dict + orjson
+
+兩者輸出的 bytes 必須完全相同，否則以非 0 結束。
+
+使用方式（在 guanfu_backend 目錄下，需設定 DATABASE_URL）：
+    python -m scripts.bench_serialization --rows 500 --repeat 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+from itertools import cycle, islice
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy.orm import selectinload
+
+from src import crud, models, schemas, serializers
+from src.database import SessionLocal
+
+# response schema -> (model, 查詢 options)
+TARGETS = [
+    (schemas.PlaceCollection, models.Place, ()),
+    (schemas.SupplyCollection, models.Supply, (selectinload(models.Supply.supplies),)),
+    (schemas.HumanResourceCollection, models.HumanResource, ()),
+    (schemas.ShelterCollection, models.Shelter, ()),
+    (schemas.MedicalStationCollection, models.MedicalStation, ()),
+    (schemas.MentalHealthResourceCollection, models.MentalHealthResource, ()),
+    (schemas.AccommodationCollection, models.Accommodation, ()),
+    (schemas.ShowerStationCollection, models.ShowerStation, ()),
+    (schemas.WaterRefillStationCollection, models.WaterRefillStation, ()),
+    (schemas.RestroomCollection, models.Restroom, ()),
+    (schemas.ReportCollection, models.Report, ()),
+    (schemas.SupplyProviderCollection, models.SupplyProvider, ()),
+    (schemas.SupplyItemCollection, models.SupplyItem, ()),
+    (schemas.SupplyItemEmbedCollection, models.SupplyItem, (selectinload(models.SupplyItem.supply),)),
+    (schemas.VolunteerOrgCollection, models.VolunteerOrganization, ()),
+    (schemas.RequirementsHrCollection, models.RequirementsHr, ()),
+    (schemas.RequirementsSuppliesCollection, models.RequirementsSupplies, ()),
+]
+
+
+def response_model_body(field, payload) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=payload))
+    return JSONResponse(content).body
+
+
+def fast_body(schema, payload) -> bytes:
+    return serializers.fast_response(schema, payload).body
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="每個回應的筆數（資料不足時重複使用）")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    failed = False
+    db = SessionLocal()
+    try:
+        print(f"{'schema':<34}{'rows':>6}{'response_model ms':>20}{'fast ms':>10}{'speedup':>9}  identical")
+        for schema, model, options in TARGETS:
+            rows = db.query(model).options(*options).limit(args.rows).all()
+            if not rows:
+                print(f"{schema.__name__:<34}{0:>6}  (no data, skipped)")
+                continue
+            rows = list(islice(cycle(rows), args.rows))
+            if model is models.HumanResource:
+                rows = crud.mask_id_if_field_equals(rows, "status", "completed")
+            payload = {"member": rows, "totalItems": len(rows), "limit": args.rows, "offset": 0, "next": None}
+            field = create_model_field(name="Response_bench", type_=schema, mode="serialization")
+
+            identical = response_model_body(field, payload) == fast_body(schema, payload)
+            failed = failed or not identical
+            slow_ms = timed(lambda: response_model_body(field, payload), args.repeat)
+            fast_ms = timed(lambda: fast_body(schema, payload), args.repeat)
+            print(
+                f"{schema.__name__:<34}{len(rows):>6}{slow_ms:>20.2f}{fast_ms:>10.2f}"
+                f"{slow_ms / fast_ms:>8.1f}x  {'yes' if identical else 'NO'}"
+            )
+    finally:
+        db.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+列表查詢的執行計畫檢查：資料量大的資料表上不應出現 Seq Scan
+
+在同一個交易中為各資料表插入 --rows 筆合成資料並 ANALYZE，對各路由實際使用的查詢
+（分頁、游標分頁、篩選、單筆查詢、關聯載入）執行 EXPLAIN，最後 ROLLBACK，不會留下任何資料。
+任何查詢在筆數 >= --min-rows 的資料表上出現 Seq Scan 時列出執行計畫並以非 0 結束。
+
+totalItems 的 count 需要讀取所有符合條件的資料列，不在檢查範圍內。
+change_log 由各資料表的 trigger 在 seed 時寫入，一併檢查 /changes 的查詢。
+列表 ETag 的查詢（crud.collection_state_select）不檢查：seed 的紀錄都屬於目前這個尚未結束的交易，與實際的分布不同。
+
+使用方式（在 guanfu_backend 目錄下，DATABASE_URL 指向本機測試用資料庫，需已建立資料表）：
+    python -m scripts.check_query_plans --rows 20000
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import ARRAY, BigInteger, Boolean, DateTime, Float, Integer, String, Text, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from src import crud, models
+from src.database import engine
+from src.geo import Area
+from src.search import Search
+
+PAGE_SIZE = 50
+# 合成資料中文字欄位的相異值個數；篩選條件使用其中一個值
+DISTINCT_VALUES = 50
+FILTER_VALUE = "v1"
+SEARCH_KEYWORD = "發電機"
+
+# (model, 排序欄位, 篩選欄位)；對應各 routers 的列表查詢
+LIST_QUERIES = [
+    (models.Place, models.Place.updated_at, ("status", "type")),
+    (models.Supply, models.Supply.updated_at, ("is_fulfilled",)),
+    (models.HumanResource, models.HumanResource.created_at, ("status", "role_status")),
+    (models.Shelter, models.Shelter.updated_at, ("status",)),
+    (models.MedicalStation, models.MedicalStation.updated_at, ("status", "station_type")),
+    (models.MentalHealthResource, models.MentalHealthResource.updated_at, ("status",)),
+    (models.Accommodation, models.Accommodation.updated_at, ("status", "township")),
+    (models.ShowerStation, models.ShowerStation.updated_at, ("status",)),
+    (models.WaterRefillStation, models.WaterRefillStation.updated_at, ("status",)),
+    (models.Restroom, models.Restroom.updated_at, ("status",)),
+    (models.Report, models.Report.updated_at, ("status",)),
+    (models.SupplyProvider, models.SupplyProvider.updated_at, ("supply_item_id",)),
+    (models.RequirementsHr, models.RequirementsHr.updated_at, ("place_id",)),
+    (models.RequirementsSupplies, models.RequirementsSupplies.updated_at, ("place_id",)),
+    (models.SupplyItem, None, ("supply_id",)),
+]
+SEEDED_TABLES = {model.__table__ for model, _, _ in LIST_QUERIES}
+
+
+def _seed_expression(table, column, position: int, rows: int):
+    """產生第 i 筆合成資料的欄位值（SQL 運算式）；回傳 None 表示不填（generated column）"""
+    if column.computed is not None:
+        return None
+    if column.primary_key:
+        return f"'seed-{table.name}-' || i"
+    foreign_key = next(iter(column.foreign_keys), None)
+    if foreign_key is not None:
+        return f"'seed-{foreign_key.column.table.name}-' || (i % {rows} + 1)"
+    if column.name == "coordinates":
+        lng, lat = "121 + (i % 1000) / 1000.0", "23 + (i / 1000 % 1000) / 1000.0"
+        if table.name == "places":
+            return f"jsonb_build_object('type', 'Point', 'coordinates', jsonb_build_array({lng}, {lat}))"
+        return f"jsonb_build_object('lat', {lat}, 'lng', {lng})"
+    column_type = column.type
+    if isinstance(column_type, ARRAY):
+        return "'{}'"
+    if isinstance(column_type, JSONB):
+        return "'{}'::jsonb"
+    if isinstance(column_type, DateTime):
+        return "now() - i * interval '1 second'"
+    if isinstance(column_type, Boolean):
+        return "i % 2 = 0"
+    if isinstance(column_type, (Integer, BigInteger, Float)):
+        # 每個欄位錯開，避免 received_count 與 total_number 永遠相同
+        return f"(i + {position}) % 100"
+    if isinstance(column_type, (String, Text)):
+        return f"'v' || (i % {DISTINCT_VALUES})"
+    raise TypeError(f"unsupported column type {table.name}.{column.name}: {column_type!r}")
+
+
+def seed(conn, rows: int) -> None:
+    for table in models.Base.metadata.sorted_tables:  # 依外鍵相依順序
+        if table not in SEEDED_TABLES:
+            continue
+        columns, values = [], []
+        for position, column in enumerate(table.columns):
+            expression = _seed_expression(table, column, position, rows)
+            if expression is not None:
+                columns.append(column.name)
+                values.append(expression)
+        conn.execute(
+            text(
+                f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                f"SELECT {', '.join(values)} FROM generate_series(1, {rows}) AS g(i)"
+            )
+        )
+        conn.execute(text(f"ANALYZE {table.name}"))
+    conn.execute(text(f"ANALYZE {models.ChangeLog.__tablename__}"))
+
+
+def _filter_value(model, column: str):
+    return False if isinstance(model.__table__.c[column].type, Boolean) else FILTER_VALUE
+
+
+def queries():
+    """(名稱, select 敘述)"""
+    cursor_values = [datetime.now(timezone.utc), "seed"]
+    for model, sort_column, filter_columns in LIST_QUERIES:
+        table = model.__tablename__
+        cursor = crud.encode_cursor(cursor_values if sort_column is not None else cursor_values[1:])
+        for column in (None, *filter_columns):
+            filters = {column: _filter_value(model, column)} if column else {}
+            label = f"{table}?{column}=" if column else table
+            stmt = crud.filtered_select(model, filters)
+            if sort_column is not None:
+                yield f"{label} page", stmt.order_by(sort_column.desc()).limit(PAGE_SIZE)
+            yield f"{label} cursor", crud.apply_cursor(
+                stmt, model, cursor=cursor, limit=PAGE_SIZE, sort_column=sort_column
+            )
+        yield f"{table} by id", select(model).filter(model.id == f"seed-{table}-1")
+
+    supply_ids = [f"seed-supplies-{i}" for i in range(1, PAGE_SIZE + 1)]
+    yield "supply_items of page (selectinload)", select(models.SupplyItem).filter(
+        models.SupplyItem.supply_id.in_(supply_ids)
+    )
+    yield "places bbox", crud.filtered_select(models.Place, {}, Area(bbox=(121.1, 23.1, 121.2, 23.2))).order_by(
+        models.Place.updated_at.desc()
+    ).limit(PAGE_SIZE)
+    yield "places near", nearest(models.Place, Area(near=(23.5, 121.5), radius=500))
+    # 合成資料的文字欄位只有 v0 ~ v49，任一值都符合大量資料列；以不存在的關鍵字模擬只符合少數資料列的實際搜尋
+    yield "human_resources q_role", crud.filtered_select(
+        models.HumanResource, {}, search=Search((SEARCH_KEYWORD,))
+    ).order_by(models.HumanResource.created_at.desc()).limit(PAGE_SIZE)
+
+    # /changes：seed 時各資料表的 trigger 已寫入 change_log
+    position = (0, 0, datetime.now(timezone.utc))
+    yield "change_log since", crud.changes_select(position, PAGE_SIZE)
+    yield "change_log since ?resource=", crud.changes_select(position, PAGE_SIZE, ["places"])
+
+
+def nearest(model, area: Area):
+    """與 crud.get_multi 帶 near 時相同的查詢"""
+    return crud.filtered_select(model, {}, area).order_by(area.distance(model)).limit(PAGE_SIZE)
+
+
+def seq_scans(plan: dict):
+    """執行計畫中的 Seq Scan 節點 (資料表名稱)"""
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", ()):
+        yield from seq_scans(child)
+
+
+def explain(conn, stmt) -> dict:
+    compiled = stmt.compile(bind=conn, compile_kwargs={"render_postcompile": True})
+    result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="每張資料表插入的合成資料筆數")
+    parser.add_argument("--min-rows", type=int, default=10000, help="筆數達到此值的資料表不允許 Seq Scan")
+    args = parser.parse_args()
+
+    failed = False
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            seed(conn, args.rows)
+            row_counts = dict(
+                conn.execute(text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")).all()
+            )
+            for name, stmt in queries():
+                plan = explain(conn, stmt)
+                large = sorted({t for t in seq_scans(plan) if row_counts.get(t, 0) >= args.min_rows})
+                print(f"{name:<48}{'SEQ SCAN ' + ', '.join(large) if large else 'ok'}")
+                if large:
+                    failed = True
+                    print(json.dumps(plan, indent=2, ensure_ascii=False))
+        finally:
+            transaction.rollback()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
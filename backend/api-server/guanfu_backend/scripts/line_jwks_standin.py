@@ -0,0 +1,80 @@
+"""
+本機測試用的 LINE JWKS 替身：產生 ES256 金鑰、輸出 JWKS 檔案，並簽發 ID Token
+
+將 LINE_JWKS_FILE 設為輸出的 JWKS 檔案後，line_auth.verify_id_token 會改用其中的公鑰，
+不需連線到 LINE 即可測試登入流程中的 ID Token 驗證。私鑰存在 --key，重複執行時沿用同一把金鑰。
+
+使用方式（在 guanfu_backend 目錄下）：
+    python -m scripts.line_jwks_standin --jwks /tmp/line_jwks.json --sub U1234 --nonce <nonce>
+    python -m scripts.line_jwks_standin --alg HS256 --sub U1234 --nonce <nonce>   # 以 LINE_CLIENT_SECRET 簽章
+"""
+import argparse
+import json
+import os
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from src.config import settings
+from src.services.line_auth import ID_TOKEN_ISSUER
+
+KID = "standin"
+
+
+def _load_or_create_key(path: str) -> ec.EllipticCurvePrivateKey:
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return serialization.load_pem_private_key(f.read(), password=None)
+    key = ec.generate_private_key(ec.SECP256R1())
+    with open(path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alg", choices=["ES256", "HS256"], default="ES256")
+    parser.add_argument("--key", default="/tmp/line_jwks_standin.pem", help="ES256 私鑰（PEM），不存在時產生")
+    parser.add_argument("--jwks", default="/tmp/line_jwks.json", help="輸出的 JWKS 檔案（設為 LINE_JWKS_FILE）")
+    parser.add_argument("--sub", default="U00000000000000000000000000000000")
+    parser.add_argument("--nonce", default=None)
+    parser.add_argument("--name", default="測試使用者")
+    parser.add_argument("--picture", default=None)
+    parser.add_argument("--expires-in", type=int, default=3600)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    claims = {
+        "iss": ID_TOKEN_ISSUER,
+        "sub": args.sub,
+        "aud": str(settings.LINE_CLIENT_ID),
+        "exp": now + args.expires_in,
+        "iat": now,
+        "amr": ["pwd"],
+        "name": args.name,
+    }
+    if args.nonce is not None:
+        claims["nonce"] = args.nonce
+    if args.picture is not None:
+        claims["picture"] = args.picture
+
+    if args.alg == "HS256":
+        print(jwt.encode(claims, settings.LINE_CLIENT_SECRET, algorithm="HS256"))
+        return
+
+    key = _load_or_create_key(args.key)
+    jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(key.public_key()))
+    jwk.update({"kid": KID, "alg": "ES256", "use": "sig"})
+    with open(args.jwks, "w", encoding="utf-8") as f:
+        json.dump({"keys": [jwk]}, f)
+    print(jwt.encode(claims, key, algorithm="ES256", headers={"kid": KID}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+刪除超過保留期限的異動紀錄（change_log，GET /changes 使用）
+
+建議每天以 cron 執行一次；同步進度落後超過保留天數的用戶端會收到 410，需以 /{resource}/export 重新同步。
+
+使用方式（在 guanfu_backend 目錄下）：
+    python -m scripts.prune_change_log
+    python -m scripts.prune_change_log --days 30
+"""
+import argparse
+
+from src import crud
+from src.config import settings
+from src.database import SessionLocal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--days", type=int, default=settings.CHANGE_LOG_RETENTION_DAYS, help="保留天數（預設 CHANGE_LOG_RETENTION_DAYS）"
+    )
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        deleted = crud.prune_change_log(db, args.days)
+    print(f"deleted {deleted} change_log rows older than {args.days} days")
+
+
+if __name__ == "__main__":
+    main()
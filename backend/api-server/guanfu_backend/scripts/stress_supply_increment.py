@@ -0,0 +1,202 @@
+"""
+POST /supplies/{id} 批次累加 received_count 的並行壓力測試
+
+與路由相同呼叫 crud.supply_batch_increment_received，以 --workers 個執行緒各自開 Session 同時送出請求：
+
+1. 相同項目：一張供應單兩個物資項目（A 的 total_number 為 --total，B 足夠大），
+   送出 --requests 次「A +1、B +1」，檢查：
+   - 成功次數 == min(--requests, --total)，其餘皆為 409
+   - A、B 的 received_count 都等於成功次數（沒有遺失的累加；A 收滿後整批不更新，B 也不會多加）
+2. 不同項目：一張供應單 --items 個物資項目，分成 --rounds 輪，每輪 --items 個執行緒同時起跑、各自對自己的項目 +1，
+   每輪結束後檢查 remaining_count。這些交易都會更新 supplies 的同一列，trigger 若以語句開始時的 snapshot
+   重新加總，後提交的交易會覆蓋先提交的結果（之後的更新可能再蓋掉誤差，所以每輪都要檢查）。
+3. 重疊項目：一張供應單 --items 個物資項目，送出 --requests 次、每次隨機挑 1～3 個項目 +1
+   （每個項目的 total_number 等於會被挑中的次數，全部成功後供應單應為已收滿），檢查全部成功（沒有 deadlock）、
+   沒有遺失的累加。
+
+每個階段最後都以 SQL 重新加總，檢查 remaining_count == sum(greatest(total_number - received_count, 0))。
+結束後刪除測試資料；任一檢查失敗時以非 0 結束。
+
+使用方式（在 guanfu_backend 目錄下，DATABASE_URL 指向本機測試用資料庫；連線池需容納所有執行緒）：
+    DB_POOL_SIZE=64 python -m scripts.stress_supply_increment --workers 64 --requests 2000 --total 1500 --items 16
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+
+from src import crud, models
+from src.database import SessionLocal
+
+
+def create_supply(totals: list) -> tuple:
+    """建立測試用供應單，回傳 (supply_id, [item_id, ...])"""
+    with SessionLocal() as db:
+        supply = models.Supply(name="stress test", address="-", phone="-", valid_pin="000000")
+        db.add(supply)
+        db.flush()
+        items = [
+            models.SupplyItem(supply_id=supply.id, tag="stress", name=f"item {i}", total_number=total, received_count=0)
+            for i, total in enumerate(totals)
+        ]
+        db.add_all(items)
+        db.commit()
+        return supply.id, [item.id for item in items]
+
+
+def delete_supply(supply_id: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete(models.SupplyItem).where(models.SupplyItem.supply_id == supply_id))
+        db.execute(delete(models.Supply).where(models.Supply.id == supply_id))
+        db.commit()
+
+
+def read_supply(supply_id: str) -> tuple:
+    """(各項目 received_count, remaining_count, is_fulfilled, 以物資項目重新加總的 remaining)"""
+    item = models.SupplyItem
+    with SessionLocal() as db:
+        supply = db.get(models.Supply, supply_id)
+        received = {row.id: row.received_count or 0 for row in supply.supplies}
+        recomputed = db.scalar(
+            select(func.coalesce(func.sum(func.greatest(item.total_number - func.coalesce(item.received_count, 0), 0)), 0))
+            .where(item.supply_id == supply_id)
+        )
+        return received, supply.remaining_count, supply.is_fulfilled, recomputed
+
+
+def increment(supply_id: str, item_counts: dict) -> int:
+    with SessionLocal() as db:
+        try:
+            crud.supply_batch_increment_received(db, supply_id, item_counts)
+            return 200
+        except HTTPException as exc:
+            return exc.status_code
+
+
+def report(title: str, checks: list) -> bool:
+    """輸出檢查結果，有不符合的項目時回傳 True"""
+    print(title)
+    failed = False
+    for name, actual, wanted in checks:
+        ok = actual == wanted
+        failed = failed or not ok
+        print(f"  {name:<24}{actual!s:>8}  expected {wanted!s:>8}  {'ok' if ok else 'MISMATCH'}")
+    return failed
+
+
+def same_items(pool: ThreadPoolExecutor, args) -> bool:
+    supply_id, (item_a, item_b) = create_supply([args.total, args.requests + 1])
+    try:
+        started = time.perf_counter()
+        results = Counter(pool.map(lambda _: increment(supply_id, {item_a: 1, item_b: 1}), range(args.requests)))
+        elapsed = time.perf_counter() - started
+        received, remaining_count, is_fulfilled, recomputed = read_supply(supply_id)
+
+        expected = min(args.requests, args.total)
+        return report(
+            f"same items: {args.requests} requests / {args.workers} workers in {elapsed:.2f}s, "
+            f"status codes: {dict(results)}",
+            [
+                ("successful increments", results[200], expected),
+                ("409 responses", results[409], args.requests - expected),
+                ("A received_count", received[item_a], expected),
+                ("B received_count", received[item_b], expected),
+                ("remaining_count", remaining_count, (args.total - expected) + (args.requests + 1 - expected)),
+                ("recomputed remaining", recomputed, remaining_count),
+                ("is_fulfilled", is_fulfilled, False),
+            ],
+        )
+    finally:
+        delete_supply(supply_id)
+
+
+def different_items(args) -> bool:
+    supply_id, item_ids = create_supply([args.rounds] * args.items)
+    barrier = threading.Barrier(args.items)
+
+    def increment_together(item_id: str) -> int:
+        barrier.wait()
+        return increment(supply_id, {item_id: 1})
+
+    try:
+        started = time.perf_counter()
+        results = Counter()
+        drifted_rounds = 0
+        with ThreadPoolExecutor(max_workers=args.items) as pool:
+            for _ in range(args.rounds):
+                results.update(pool.map(increment_together, item_ids))
+                _, remaining_count, _, recomputed = read_supply(supply_id)
+                drifted_rounds += remaining_count != recomputed
+        elapsed = time.perf_counter() - started
+        received, remaining_count, is_fulfilled, recomputed = read_supply(supply_id)
+
+        return report(
+            f"different items: {args.rounds} rounds x {args.items} items in {elapsed:.2f}s, "
+            f"status codes: {dict(results)}",
+            [
+                ("successful increments", results[200], args.rounds * args.items),
+                ("rounds with drift", drifted_rounds, 0),
+                ("remaining_count", remaining_count, 0),
+                ("recomputed remaining", recomputed, remaining_count),
+                ("is_fulfilled", is_fulfilled, True),
+            ],
+        )
+    finally:
+        delete_supply(supply_id)
+
+
+def overlapping_items(pool: ThreadPoolExecutor, args) -> bool:
+    rng = random.Random(args.seed)
+    batches = [rng.sample(range(args.items), rng.randint(1, min(3, args.items))) for _ in range(args.requests)]
+    hits = Counter(index for batch in batches for index in batch)
+    supply_id, item_ids = create_supply([hits[index] for index in range(args.items)])
+    try:
+        started = time.perf_counter()
+        results = Counter(pool.map(lambda batch: increment(supply_id, {item_ids[i]: 1 for i in batch}), batches))
+        elapsed = time.perf_counter() - started
+        received, remaining_count, is_fulfilled, recomputed = read_supply(supply_id)
+
+        lost = sum(hits[index] - received[item_ids[index]] for index in range(args.items))
+        return report(
+            f"overlapping items: {args.requests} requests over {args.items} items / {args.workers} workers "
+            f"in {elapsed:.2f}s, status codes: {dict(results)}",
+            [
+                ("successful increments", results[200], args.requests),
+                ("lost increments", lost, 0),
+                ("remaining_count", remaining_count, 0),
+                ("recomputed remaining", recomputed, remaining_count),
+                ("is_fulfilled", is_fulfilled, True),
+            ],
+        )
+    finally:
+        delete_supply(supply_id)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=64, help="同時送出請求的執行緒數")
+    parser.add_argument("--requests", type=int, default=2000, help="每個階段的累加請求總數")
+    parser.add_argument("--total", type=int, default=1500, help="階段 1 項目 A 的 total_number")
+    parser.add_argument("--items", type=int, default=16, help="階段 2、3 供應單的物資項目數")
+    parser.add_argument("--rounds", type=int, default=100, help="階段 2 的輪數")
+    parser.add_argument("--seed", type=int, default=0, help="階段 3 挑選項目的亂數種子")
+    args = parser.parse_args()
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            failed = same_items(pool, args)
+            failed = different_items(args) or failed
+            failed = overlapping_items(pool, args) or failed
+        return 1 if failed else 0
+    finally:
+        crud.invalidate_caches(models.Supply, models.SupplyItem)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
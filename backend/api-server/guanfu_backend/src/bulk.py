@@ -0,0 +1,184 @@
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette import status
+
+from . import crud, schemas
+from .config import settings
+from .enum_serializer import normalize_payload_dict
+
+# ===================================================================
+# 批次建立 / 更新：POST /{resource}/bulk、PATCH /{resource}/bulk
+# 每筆先各自以 schema 與路由的檢核函式驗證，通過的資料以一個 executemany 寫入，整批一次 commit。
+# 單筆失敗（驗證錯誤、找不到、違反資料庫限制）只影響該筆，結果依請求順序放在 results。
+# ===================================================================
+
+# 與單筆 API 相同的檢核：不符合時 raise HTTPException，該筆以其 status_code / detail 回報
+CreateValidator = Callable[[Session, BaseModel], None]
+PatchValidator = Callable[[Session, BaseModel, Any], None]
+# 寫入成功的資料列在同一個交易中的後續處理（例如更新父層的 updated_at）
+BeforeCommit = Callable[[Session, List[Any]], None]
+
+
+def _check_size(items: List[Any]) -> None:
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"一次最多 {settings.BULK_MAX_ITEMS} 筆，請分批送出",
+        )
+
+
+def _failure(index: int, status_code: int, detail: Any) -> schemas.BulkItemResult:
+    return schemas.BulkItemResult(index=index, status=status_code, detail=detail)
+
+
+def _validation_failure(index: int, exc: ValidationError) -> schemas.BulkItemResult:
+    return _failure(index, status.HTTP_422_UNPROCESSABLE_ENTITY, jsonable_encoder(exc.errors(include_url=False)))
+
+
+def _database_failure(index: int, exc: SQLAlchemyError) -> schemas.BulkItemResult:
+    status_code = status.HTTP_409_CONFLICT if isinstance(exc, IntegrityError) else status.HTTP_400_BAD_REQUEST
+    message = str(getattr(exc, "orig", None) or exc).strip().splitlines()[0]
+    return _failure(index, status_code, message)
+
+
+def _success(index: int, status_code: int, db_obj: Any, response_schema: Type[BaseModel]) -> schemas.BulkItemResult:
+    data = response_schema.model_validate(db_obj).model_dump(mode="json")
+    return schemas.BulkItemResult(index=index, status=status_code, id=db_obj.id, data=data)
+
+
+def _response(results: Dict[int, schemas.BulkItemResult]) -> schemas.BulkResponse:
+    ordered = [results[index] for index in sorted(results)]
+    succeeded = sum(1 for result in ordered if result.status < 400)
+    return schemas.BulkResponse(succeeded=succeeded, failed=len(ordered) - succeeded, results=ordered)
+
+
+def create_many(
+    db: Session,
+    model: Type[Any],
+    items: List[Dict[str, Any]],
+    create_schema: Type[BaseModel],
+    response_schema: Type[BaseModel],
+    validate: Optional[CreateValidator] = None,
+    extra: Optional[Callable[[], Dict[str, Any]]] = None,
+    before_commit: Optional[BeforeCommit] = None,
+) -> Tuple[schemas.BulkResponse, List[Any]]:
+    """
+    批次建立；extra 回傳每筆額外寫入的欄位（例如 valid_pin），schema 中不是資料表欄位的值（例如 PIN 檢核用的 valid_pin）不寫入。
+    回傳 (回應, 建立成功的 model 物件)，物件供路由在 commit 後做快取失效等後續處理。
+    """
+    _check_size(items)
+    keys = crud.column_keys(model)
+    results: Dict[int, schemas.BulkItemResult] = {}
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    for index, item in enumerate(items):
+        try:
+            obj_in = create_schema.model_validate(item)
+            if validate is not None:
+                validate(db, obj_in)
+        except ValidationError as exc:
+            results[index] = _validation_failure(index, exc)
+        except HTTPException as exc:
+            results[index] = _failure(index, exc.status_code, exc.detail)
+        else:
+            row = {key: value for key, value in normalize_payload_dict(obj_in.model_dump()).items() if key in keys}
+            if extra is not None:
+                row.update(extra())
+            pending.append((index, row))
+
+    created = []
+    for (index, _), db_obj in zip(pending, crud.bulk_insert(db, model, [row for _, row in pending])):
+        if isinstance(db_obj, SQLAlchemyError):
+            results[index] = _database_failure(index, db_obj)
+        else:
+            results[index] = _success(index, status.HTTP_201_CREATED, db_obj, response_schema)
+            created.append(db_obj)
+    if created and before_commit is not None:
+        before_commit(db, created)
+    db.commit()
+    if created:
+        crud.invalidate_caches(model)
+    return _response(results), created
+
+
+def patch_many(
+    db: Session,
+    model: Type[Any],
+    items: List[Dict[str, Any]],
+    patch_schema: Type[BaseModel],
+    response_schema: Type[BaseModel],
+    validate: Optional[PatchValidator] = None,
+    before_commit: Optional[BeforeCommit] = None,
+) -> Tuple[schemas.BulkResponse, List[Tuple[Dict[str, Any], Any]]]:
+    """
+    批次部分更新；每筆為 {"id": ..., 其餘欄位同單筆 PATCH}。
+    回傳 (回應, [(更新前的欄位值, 更新後的 model 物件)])。
+    """
+    _check_size(items)
+    results: Dict[int, schemas.BulkItemResult] = {}
+    parsed: List[Tuple[int, str, BaseModel]] = []
+    for index, item in enumerate(items):
+        item_id = item.get("id")
+        if not isinstance(item_id, str) or not item_id:
+            results[index] = _failure(index, status.HTTP_422_UNPROCESSABLE_ENTITY, "每筆資料都必須包含 id")
+            continue
+        try:
+            parsed.append((index, item_id, patch_schema.model_validate({k: v for k, v in item.items() if k != "id"})))
+        except ValidationError as exc:
+            results[index] = _validation_failure(index, exc)
+
+    # 一次查出所有要更新的資料列（同時取得列鎖，避免與單筆 PATCH 交錯）
+    ids = {item_id for _, item_id, _ in parsed}
+    existing = {
+        db_obj.id: db_obj
+        for db_obj in db.scalars(select(model).where(model.id.in_(ids)).with_for_update())
+    } if ids else {}
+
+    keys = crud.column_keys(model)
+    now = datetime.now(timezone.utc)
+    pending: List[Tuple[int, Dict[str, Any], Dict[str, Any]]] = []
+    for index, item_id, obj_in in parsed:
+        db_obj = existing.get(item_id)
+        if db_obj is None:
+            results[index] = _failure(index, status.HTTP_404_NOT_FOUND, f"{model.__tablename__} {item_id} not found")
+            continue
+        try:
+            if validate is not None:
+                validate(db, obj_in, db_obj)
+        except HTTPException as exc:
+            results[index] = _failure(index, exc.status_code, exc.detail)
+            continue
+        update_data = normalize_payload_dict(obj_in.model_dump(exclude_unset=True))
+        row = {"id": item_id, **{key: value for key, value in update_data.items() if key in keys}}
+        if "updated_at" in keys:
+            row["updated_at"] = now
+        previous = {key: getattr(db_obj, key) for key in keys}
+        pending.append((index, row, previous))
+
+    succeeded = []
+    for (index, row, previous), error in zip(pending, crud.bulk_update(db, model, [row for _, row, _ in pending])):
+        if error is not None:
+            results[index] = _database_failure(index, error)
+        else:
+            succeeded.append((index, row["id"], previous))
+
+    # executemany UPDATE 不會更新 session 中的物件，重新載入以取得最新值（含 generated column）
+    changes = []
+    if succeeded:
+        stmt = select(model).where(model.id.in_({item_id for _, item_id, _ in succeeded}))
+        updated = {db_obj.id: db_obj for db_obj in db.scalars(stmt.execution_options(populate_existing=True))}
+        for index, item_id, previous in succeeded:
+            results[index] = _success(index, status.HTTP_200_OK, updated[item_id], response_schema)
+            changes.append((previous, updated[item_id]))
+    if changes and before_commit is not None:
+        before_commit(db, [db_obj for _, db_obj in changes])
+    db.commit()
+    if changes:
+        crud.invalidate_caches(model)
+    return _response(results), changes
@@ -18,10 +18,27 @@ class Settings(BaseSettings):
     ENVIRONMENT: str
     APP_TITLE: str
     DATABASE_URL: str = ""
+    # 唯讀副本連線 URL；留空則讀取也使用主庫
+    DATABASE_READ_URL: str = ""
+    # 寫入後此秒數內，同一 client 的讀取仍走主庫（read-your-writes）
+    READ_AFTER_WRITE_STICKY_SECONDS: int = 5
     DB_USER: str
     DB_PASS: str
     DB_NAME: str
     INSTANCE_CONNECTION_NAME: str = ""
+    # 開啟後 async 路由改用 asyncpg + AsyncSession；關閉時同一批路由經 threadpool 使用 psycopg2（方便 A/B 比較）
+    DB_ASYNC_ENABLED: bool = False
+
+    # 連線池（每個 worker process 各自一組，總連線數上限約為 WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW)）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # 等待池中連線的秒數
+    DB_POOL_RECYCLE: int = 1800  # 連線使用超過此秒數後重建；-1 為不回收
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 單一 SQL 的執行上限（毫秒）；0 為不限制
+
+    # gunicorn worker 數；0 代表依 CPU 核心數自動計算（gunicorn.conf.py 啟動時會寫回實際的 worker 數）
+    WEB_CONCURRENCY: int = 0
 
     # PROD_SERVER_URL 可以有預設值，因為它不是敏感資訊
     PROD_SERVER_URL: str = "https://api.gf250923.org"
@@ -32,14 +49,92 @@ class Settings(BaseSettings):
     SERVER_PORT: str = "8080"
     ALLOW_MODIFY_API_KEY_LIST: str = ""
 
+    # 列表 totalItems 計算方式：exact / cached / estimate
+    # COUNT_MODE_OVERRIDES 以逗號分隔、依資料表覆寫，例如 "places=cached,supplies=estimate"
+    COUNT_MODE_DEFAULT: str = "exact"
+    COUNT_MODE_OVERRIDES: str = ""
+    # cached 模式的快取存在各 worker 的記憶體，多個 worker 時停用（等同 exact）
+    COUNT_CACHE_TTL_SECONDS: int = 10
+    COUNT_CACHE_MAX_ENTRIES: int = 1024
+
+    # 公開列表的回應快取；REDIS_URL 留空時只使用記憶體快取，且只在單一 worker 時啟用（其他 worker 的寫入無法通知失效）
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: int = 5
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    REDIS_URL: str = ""
+
+    # 地理查詢（near=&radius=）的預設與最大半徑（公尺）
+    GEO_DEFAULT_RADIUS_METERS: float = 5000
+    GEO_MAX_RADIUS_METERS: float = 100000
+
+    # 地圖圖磚（/places/tiles）：每張圖磚切成 N x N 格聚合；圖磚快取的存活時間與筆數上限
+    # 沒有 REDIS_URL 時圖磚存在各 worker 的記憶體，其他 worker 寫入時無法通知失效，只保留 TILE_CACHE_LOCAL_TTL_SECONDS
+    TILE_CLUSTER_GRID: int = 8
+    TILE_CACHE_TTL_SECONDS: int = 300
+    TILE_CACHE_LOCAL_TTL_SECONDS: int = 5
+    TILE_CACHE_MAX_ENTRIES: int = 4096
+
+    # 批次建立 / 更新（POST、PATCH /{resource}/bulk）單次請求的筆數上限
+    BULK_MAX_ITEMS: int = 1000
+
+    # 整表匯出（GET /{resource}/export）：server-side cursor 每次讀取、輸出的筆數
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # 異動紀錄（GET /changes）保留天數；scripts/prune_change_log.py 刪除更早的紀錄，
+    # 同步進度落後超過此天數的用戶端會收到 410，需以 /export 重新同步
+    CHANGE_LOG_RETENTION_DAYS: int = 14
+
+    # 異動推播（GET /events，Server-Sent Events），皆為每個 worker process 的設定
+    EVENTS_MAX_SUBSCRIBERS: int = 5000
+    # 每個連線尚未送出的訊息上限；用戶端讀取太慢而超過時送出 resync 並斷線
+    EVENTS_QUEUE_SIZE: int = 256
+    EVENTS_HEARTBEAT_SECONDS: int = 15
+    # 斷線後瀏覽器重新連線前的等待時間
+    EVENTS_RETRY_MS: int = 3000
+    # 重新連線（Last-Event-ID）時補送的筆數上限；超過時送出 resync，由用戶端以 /changes 補上
+    EVENTS_REPLAY_LIMIT: int = 1000
+
+    # 對外 HTTP 請求（LINE、Discord）：每個對象各一個共用連線池（每個 worker process），在 lifespan 中建立與關閉
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 20
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_CLIENT_KEEPALIVE_SECONDS: float = 60
+    HTTP_CLIENT_HTTP2: bool = True
+    HTTP_CLIENT_TIMEOUT_SECONDS: float = 15
+    HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS: float = 5
+    # 建立連線失敗時的重試次數（請求尚未送出，POST 也可安全重試）
+    HTTP_CLIENT_RETRIES: int = 2
+
     # LINE OAuth2/OIDC
     LINE_CLIENT_ID: str
     LINE_CLIENT_SECRET: str
     LINE_REDIRECT_URI: str = ""  # DEPRECATED: redirect_uri 現在由前端在 /authorize 請求中提供
     LINE_SCOPES: str = "profile openid email"
+    # verify_user_token 的 token -> 使用者快取（每個 worker process 各自一份），不會超過 token 的到期時間；
+    # 撤銷 / 更新 token 時只清除該 worker 的快取，其他 worker 最多延遲此秒數失效
+    LINE_TOKEN_CACHE_TTL_SECONDS: int = 60
+    LINE_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    # ID Token（ES256）驗證用的公鑰；LINE_JWKS_FILE 有設定時改讀本機檔案（測試用，見 scripts/line_jwks_standin.py）
+    LINE_JWKS_URL: str = "https://api.line.me/oauth2/v2.1/certs"
+    LINE_JWKS_FILE: str = ""
+    LINE_JWKS_TTL_SECONDS: int = 3600
+    # /line/authorize 產生的授權狀態：存放位置（auto / memory / redis / postgres，見 services/line_state_store.py）、
+    # 有效秒數、memory 的筆數上限、postgres 刪除過期資料的間隔
+    LINE_STATE_STORE: str = "auto"
+    LINE_STATE_TTL_SECONDS: int = 600
+    LINE_STATE_MAX_ENTRIES: int = 10000
+    LINE_STATE_PURGE_INTERVAL_SECONDS: int = 300
 
     # Discord Webhook
     DISCORD_WEBHOOK_URL: str = ""
+    # 尚未送出的通知上限（超過時丟棄新的通知）、每則訊息的發送次數上限、關閉時等待送完的秒數
+    DISCORD_QUEUE_SIZE: int = 1000
+    DISCORD_MAX_ATTEMPTS: int = 5
+    DISCORD_DRAIN_TIMEOUT_SECONDS: float = 10
+
+    @property
+    def single_worker(self) -> bool:
+        """只有一個 worker process（0 為未經 gunicorn 啟動，例如 uvicorn --reload）時，記憶體快取才能在寫入後立即失效"""
+        return self.WEB_CONCURRENCY <= 1
 
 
 # 建立一個全域的 settings 實例供整個專案引用
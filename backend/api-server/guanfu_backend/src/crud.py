@@ -1,23 +1,33 @@
-from typing import List, Optional, Type, TypeVar
+from typing import List, Optional, Sequence, Tuple, Type, TypeVar
 from urllib.parse import urlencode
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import base64
+import binascii
+import hashlib
 import json
 
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Request, Response
 from pydantic import BaseModel
-from sqlalchemy import exists, and_, select, text
+from sqlalchemy import Integer, String, column, func, select, text, tuple_, values
+from sqlalchemy import insert as sa_insert, update as sa_update
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.inspection import inspect as sa_inspect
 from starlette import status
 
-from . import models
+from . import models, response_cache
+from .cache import TTLCache
+from .config import settings
+from .geo import Area
+from .search import Search
 from .models import Supply, SupplyItem
 from .schemas import SupplyCreate, SupplyItemDistribution
 from .pin_related import generate_pin
 from .enum_serializer import *
 
 ModelType = TypeVar("ModelType", bound=models.Base)
+_UTC8 = timezone(timedelta(hours=8))
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
@@ -41,12 +51,214 @@ def build_next_link(request: Request, *, limit: int, offset: int, total: int) ->
     return f"{request.url.path}?{urlencode(q, doseq=True)}"
 
 
+def build_cursor_link(request: Request, *, limit: int, cursor: Optional[str]) -> Optional[str]:
+    """
+    回傳游標分頁的下一頁連結，如 /places?...&limit=50&cursor=eyJ...
+    cursor 為 None 代表已是最後一頁。
+    """
+    if cursor is None:
+        return None
+    q = dict(request.query_params)
+    q.pop("offset", None)  # 游標模式不使用 offset
+    q["limit"] = str(limit)
+    q["cursor"] = cursor
+    return f"{request.url.path}?{urlencode(q, doseq=True)}"
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    將排序鍵（例如 [updated_at, id]）編碼為不透明的 cursor 字串（base64url JSON）。
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, has_sort_column: bool) -> List[Any]:
+    """
+    解碼 cursor；格式不符時回傳 400。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != (2 if has_sort_column else 1):
+            raise ValueError("unexpected cursor shape")
+        if has_sort_column:
+            values[0] = datetime.fromisoformat(values[0])
+        return values
+    except (ValueError, TypeError, UnicodeEncodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_cursor(query, model: Type[ModelType], *, cursor: str, limit: int, sort_column=None, descending: bool = True):
+    """
+    對查詢套用 keyset 分頁條件：
+    - 以 (sort_column, id) 作為排序鍵；未指定 sort_column 時僅以 id 排序
+    - cursor 為空字串代表第一頁
+    - 多取一筆以判斷是否還有下一頁（交由 cursor_page 處理）
+    """
+    key_columns = [sort_column, model.id] if sort_column is not None else [model.id]
+    if cursor:
+        values = decode_cursor(cursor, sort_column is not None)
+        key = tuple_(*key_columns)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+    ordering = [c.desc() if descending else c.asc() for c in key_columns]
+    return query.order_by(None).order_by(*ordering).limit(limit + 1)
+
+
+def cursor_page(rows: List[ModelType], *, limit: int, sort_column=None) -> Tuple[List[ModelType], Optional[str]]:
+    """
+    將 apply_cursor 多取的一筆切掉，並依最後一筆產生下一頁的 cursor。
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    values = [getattr(last, sort_column.key)] if sort_column is not None else []
+    values.append(last.id)
+    return rows, encode_cursor(values)
+
+
+# =====================
+# HTTP 條件請求（ETag / Last-Modified）
+# =====================
+
+def _not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None or request.headers.get("if-none-match"):
+        return False  # 有 If-None-Match 時以 ETag 為準
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def apply_validators(
+    request: Request,
+    response: Response,
+    parts: Tuple[Any, ...],
+    last_modified: Optional[datetime],
+    allow_if_modified_since: bool = True,
+) -> None:
+    """
+    依 parts 計算 ETag，連同 Last-Modified 寫入回應標頭；
+    client 的 If-None-Match / If-Modified-Since 符合時直接回 304，不再查詢與序列化資料。
+    Cache-Control: no-cache 讓瀏覽器每次都帶驗證標頭回來確認，而不是自行推估有效期限。
+    """
+    raw = "|".join(v.isoformat() if isinstance(v, datetime) else str(v) for v in parts)
+    headers = {
+        "ETag": '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"',
+        "Cache-Control": "no-cache",
+    }
+    if last_modified is not None:
+        last_modified = last_modified.astimezone(timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if response_cache.etag_matches(request, headers["ETag"]) or (
+        allow_if_modified_since and _not_modified_since(request, last_modified)
+    ):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+def query_string_key(request: Request) -> str:
+    return urlencode(sorted(request.query_params.multi_items()))
+
+
+def check_not_modified(request: Request, response: Response, db_obj: Any, updated_at: Optional[datetime] = None) -> None:
+    """
+    單筆資料：以 (資料表, id, updated_at) 作為 ETag；updated_at 未指定時取 db_obj.updated_at，
+    沒有 updated_at 的 model 可改傳其他最後修改時間（例如父層的 updated_at），都沒有時不處理
+    """
+    if updated_at is None:
+        updated_at = getattr(db_obj, "updated_at", None)
+    if updated_at is None:
+        return
+    parts = (db_obj.__tablename__, db_obj.id, updated_at, query_string_key(request))
+    apply_validators(request, response, parts, updated_at)
+
+
+def collection_state_select(model: Type[ModelType]):
+    """
+    列表的 ETag 來源：以 change_log 判斷列表相關資料表（供應單含物資項目）是否有異動，
+    每張資料表只需兩次 (resource, txid) 索引查詢，不必掃描整組過濾條件的資料：
+    - 已結束交易的紀錄中最大的 txid：之後結束的交易 txid 一定不小於目前的 xmin，有新紀錄時必定變大
+    - 尚未被 xmin 涵蓋、但已可見的紀錄筆數：這段期間 commit 的紀錄只會增加
+    新增 / 修改 / 刪除都會留下紀錄，因此刪除也會讓 ETag 改變。
+    """
+    log = models.ChangeLog
+    snapshot = func.txid_current_snapshot()
+    tables = response_cache.CACHED_LIST_PATHS.get(f"/{model.__tablename__}", (model.__tablename__,))
+    columns = []
+    for table in tables:
+        columns.append(select(func.max(log.txid)).where(log.resource == table, _visible_changes()).scalar_subquery())
+        # 可見的紀錄 txid 一定小於 snapshot 的 xmax；加上上限讓 planner 以範圍估計筆數、使用索引
+        columns.append(
+            select(func.count())
+            .where(log.resource == table, log.txid >= func.txid_snapshot_xmin(snapshot), log.txid < func.txid_snapshot_xmax(snapshot))
+            .scalar_subquery()
+        )
+    return select(*columns)
+
+
+def check_collection_not_modified(request: Request, response: Response, db: Session, model: Type[ModelType]) -> None:
+    """
+    列表：以相關資料表的異動狀態（collection_state_select）搭配查詢參數（過濾、分頁、排序等）組成 ETag，
+    If-None-Match 符合時回 304。列表沒有單一的最後修改時間，因此不處理 If-Modified-Since。
+    """
+    state = tuple(db.execute(collection_state_select(model)).one())
+    parts = (model.__tablename__, state, query_string_key(request))
+    apply_validators(request, response, parts, None, allow_if_modified_since=False)
+
+
+def get_multi_by_cursor(
+    db: Session,
+    model: Type[ModelType],
+    cursor: str,
+    limit: int = 100,
+    sort_column=None,
+    descending: bool = True,
+    options: Sequence = (),
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+    **filters: Any,
+) -> Tuple[List[ModelType], Optional[str]]:
+    """
+    通用列表查詢（keyset / cursor 分頁）：
+    - filters、area、search、updated_since 處理方式同 get_multi，但一律依游標排序（不依距離、相關度排序）
+    - 以 WHERE (sort_column, id) < (:v, :id) 取代 OFFSET，深頁查詢不會隨頁數變慢
+    - 回傳 (資料列, 下一頁 cursor)；cursor 為 None 代表已無下一頁
+    """
+    query = db.query(model).options(*options).filter(*updated_since_criteria(model, updated_since))
+
+    if filters:
+        normalized_filters = normalize_filters_dict(filters)
+        if normalized_filters:
+            query = query.filter_by(**normalized_filters)
+
+    if area is not None:
+        query = query.filter(*area.criteria(model))
+
+    if search is not None:
+        query = query.filter(*search.criteria(model))
+
+    query = apply_cursor(query, model, cursor=cursor, limit=limit, sort_column=sort_column, descending=descending)
+    return cursor_page(query.all(), limit=limit, sort_column=sort_column)
+
+
 def get_multi(
     db: Session,
     model: Type[ModelType],
     skip: int = 0,
     limit: int = 100,
     order_by=None,
+    options: Sequence = (),
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
     **filters: Any,
 ) -> List[ModelType]:
     """
@@ -54,48 +266,329 @@ def get_multi(
     - 對 filters 做正規化（Enum -> value；移除 None）
     - 使用 filter_by（簡單等值查詢）
     - 支援 order_by（傳 ColumnElement，例如 model.created_at.desc()）
+    - options 例如 selectinload(...)，與資料列同一次請求預先載入關聯
+    - area 為 bbox / near 地理篩選；有 near 時先依距離由近到遠排序
+    - search 為關鍵字搜尋；先依相關度由高到低排序（與 near 並用時相關度優先）
+    - updated_since 只取該時間之後異動的資料（updated_at >= updated_since），供同步用戶端增量抓取
     """
-    query = db.query(model)
+    query = db.query(model).options(*options).filter(*updated_since_criteria(model, updated_since))
 
     if filters:
         normalized_filters = normalize_filters_dict(filters)
         if normalized_filters:
             query = query.filter_by(**normalized_filters)
 
+    if search is not None:
+        query = query.filter(*search.criteria(model))
+        rank = search.rank(model)
+        if rank is not None:
+            query = query.order_by(rank.desc())
+
+    if area is not None:
+        query = query.filter(*area.criteria(model))
+        if area.near is not None:
+            query = query.order_by(area.distance(model))
+
     if order_by is not None:
         query = query.order_by(order_by)
 
     return query.offset(skip).limit(limit).all()
 
 
-def orm_to_dict(obj: Any) -> dict:
+def updated_since_criteria(model: Type[ModelType], updated_since: Optional[datetime]) -> list:
+    """
+    updated_since= 查詢參數 -> 篩選條件（updated_at >= updated_since；含等於，接續同步時寧可重複也不漏）。
+    未帶時區的時間視為 UTC+8（與回應中 created_at / updated_at 的換算相同）；沒有 updated_at 的資料表回 400。
     """
-orm -> dict"""
-    mapper = sa_inspect(obj).mapper
-    data = {c.key: getattr(obj, c.key) for c in mapper.column_attrs}
-    return data
+    if updated_since is None:
+        return []
+    if "updated_at" not in model.__table__.c:
+        raise HTTPException(status_code=400, detail=f"{model.__tablename__} does not support updated_since")
+    if updated_since.tzinfo is None:
+        updated_since = updated_since.replace(tzinfo=_UTC8)
+    return [model.updated_at >= updated_since]
+
+
+def filtered_select(
+    model: Type[ModelType],
+    filters: Dict[str, Any],
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+):
+    """列表的 select()：filters、area、search、updated_since 處理方式同 get_multi（不排序）；crud_async 與匯出共用"""
+    stmt = select(model).filter(*updated_since_criteria(model, updated_since))
+    normalized_filters = normalize_filters_dict(filters) if filters else {}
+    if normalized_filters:
+        stmt = stmt.filter_by(**normalized_filters)
+    if area is not None:
+        stmt = stmt.filter(*area.criteria(model))
+    if search is not None:
+        stmt = stmt.filter(*search.criteria(model))
+    return stmt
+
+
+def updated_since_cache_key(updated_since: Optional[datetime]) -> Dict[str, Any]:
+    """count 快取 key 中 updated_since 的部分（與 area.cache_key() 相同用法）"""
+    return {"updated_since": updated_since.isoformat()} if updated_since is not None else {}
+
+
+# model class -> 欄位名稱，避免每一列都走一次 sa_inspect mapper
+_column_keys: dict = {}
+
 
+def column_keys(model: Type[ModelType]) -> Tuple[str, ...]:
+    keys = _column_keys.get(model)
+    if keys is None:
+        # deferred 欄位（search_vector 等）不屬於回應內容，讀取時會另外查詢
+        keys = _column_keys[model] = tuple(c.key for c in sa_inspect(model).column_attrs if not c.deferred)
+    return keys
 
-def mask_id_if_field_equals(rows, field: str, value: bool | str):
+
+def projected_columns(model: Type[ModelType], fields: Optional[Tuple[str, ...]], *required: str) -> Optional[Tuple[str, ...]]:
+    """
+    fields= 欄位投影實際要載入的資料表欄位（fields 為 None 時回傳 None，表示全部）。
+    非資料表欄位（關聯、統計欄位）略過；required 為分頁排序、遮罩判斷等一定要載入的欄位。
+    """
+    if fields is None:
+        return None
+    columns = column_keys(model)
+    return tuple(key for key in dict.fromkeys((*required, *fields)) if key in columns)
+
+
+def load_only_columns(model: Type[ModelType], columns: Optional[Tuple[str, ...]]) -> list:
+    """projected_columns 的結果 -> load_only option（None 時不限制）"""
+    if columns is None:
+        return []
+    return [load_only(*(getattr(model, key) for key in columns))]
+
+
+def orm_to_dict(obj: Any, keys: Optional[Tuple[str, ...]] = None) -> dict:
+    """
+orm -> dict；keys 為要讀取的欄位（預設全部欄位）"""
+    if keys is None:
+        keys = column_keys(type(obj))
+    return {key: getattr(obj, key) for key in keys}
+
+
+def mask_id_if_field_equals(rows, field: str, value: bool | str, keys: Optional[Tuple[str, ...]] = None):
     """
     When the field is value, set the id to an empty string
     """
     out: List[dict] = []
     for r in rows:
-        data = orm_to_dict(r)
+        data = orm_to_dict(r, keys)
         if data.get(field) == value:
             data["id"] = ""
         out.append(data)
     return out
 
 
-def count(db: Session, model: Type[ModelType], **filters) -> int:
-    query = db.query(model)
-    if filters:
-        query = query.filter_by(**normalize_filters_dict(filters))
+# =====================
+# totalItems 計算策略
+# =====================
+
+_count_cache = TTLCache(maxsize=settings.COUNT_CACHE_MAX_ENTRIES, ttl=settings.COUNT_CACHE_TTL_SECONDS)
+# 每張資料表的版本號；寫入時遞增，使該表所有快取的 count 立即失效
+_table_versions: Dict[str, int] = {}
+
+
+def _parse_count_mode_overrides(raw_values: str) -> Dict[str, CountModeEnum]:
+    """將 "places=cached,supplies=estimate" 轉為 {table: CountModeEnum}"""
+    overrides: Dict[str, CountModeEnum] = {}
+    for item in raw_values.split(","):
+        table, _, mode = item.partition("=")
+        if table.strip() and mode.strip():
+            overrides[table.strip()] = CountModeEnum(mode.strip())
+    return overrides
+
+
+_count_mode_overrides = _parse_count_mode_overrides(settings.COUNT_MODE_OVERRIDES)
+
+
+def resolve_count_mode(model: Type[ModelType], count_mode: Optional[CountModeEnum] = None) -> CountModeEnum:
+    """
+    決定 totalItems 的計算方式：查詢參數 > 資料表設定 (COUNT_MODE_OVERRIDES) > 預設值 (COUNT_MODE_DEFAULT)
+    """
+    if count_mode is not None:
+        return count_mode
+    return _count_mode_overrides.get(model.__tablename__, CountModeEnum(settings.COUNT_MODE_DEFAULT))
+
+
+def invalidate_count_cache(model: Type[ModelType]) -> None:
+    """寫入資料後呼叫，讓該資料表的 cached count 失效"""
+    table = model.__tablename__
+    _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+# 寫入這些資料表時，資料庫 trigger 會一併更新的資料表（supply_items -> supplies.remaining_count）
+_TRIGGER_UPDATED_MODELS = {"supply_items": (models.Supply,)}
+
+
+def invalidate_caches(*changed_models: Type[ModelType]) -> None:
+    """寫入資料（commit）後呼叫：讓相關資料表的 cached count 與列表回應快取失效"""
+    changed_models += tuple(
+        dependent
+        for model in changed_models
+        for dependent in _TRIGGER_UPDATED_MODELS.get(model.__tablename__, ())
+        if dependent not in changed_models
+    )
+    for model in changed_models:
+        invalidate_count_cache(model)
+    response_cache.invalidate(*(model.__tablename__ for model in changed_models))
+
+
+def estimate_table_rows(db: Session, model: Type[ModelType]) -> Optional[int]:
+    """以 pg_class.reltuples 取得整張表的估計筆數；尚未 ANALYZE 的表回傳 None"""
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": model.__tablename__},
+    ).scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def estimate_query_rows(db: Session, query) -> int:
+    """以 EXPLAIN 取得 planner 對查詢結果筆數的估計；query 可為 Query 或 Select"""
+    statement = getattr(query, "statement", query)
+    compiled = statement.compile(
+        dialect=db.get_bind().dialect,
+        compile_kwargs={"render_postcompile": True},
+    )
+    params = compiled.params
+    if compiled.positional:  # 例如 asyncpg 使用 $1, $2 位置參數
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _count_cache_key(model: Type[ModelType], filters_key: Dict[str, Any]) -> tuple:
+    table = model.__tablename__
+    return (
+        table,
+        _table_versions.get(table, 0),
+        tuple(sorted((k, str(v)) for k, v in filters_key.items())),
+    )
+
+
+def get_cached_count(model: Type[ModelType], filters_key: Dict[str, Any]) -> Optional[int]:
+    """取得 cached 模式下的快取筆數；未命中回傳 None（多個 worker 時不使用快取，一律未命中）"""
+    if not settings.single_worker:
+        return None
+    return _count_cache.get(_count_cache_key(model, filters_key))
+
+
+def set_cached_count(model: Type[ModelType], filters_key: Dict[str, Any], total: int) -> None:
+    # 快取與版本號存在各 worker 的記憶體，其他 worker 寫入時無法失效
+    if settings.single_worker:
+        _count_cache.set(_count_cache_key(model, filters_key), total)
+
+
+def count_query(
+    db: Session,
+    query,
+    model: Type[ModelType],
+    count_mode: Optional[CountModeEnum] = None,
+    cache_key: Optional[Dict[str, Any]] = None,
+) -> int:
+    """
+    依 count_mode 計算查詢的總筆數：
+    - exact: SELECT count(*)（原本的行為）
+    - cached: 以 (資料表, 過濾條件) 為 key 快取 COUNT_CACHE_TTL_SECONDS 秒，crud 寫入時失效；多個 worker 時同 exact
+    - estimate: 無過濾條件時讀 pg_class.reltuples，有過濾條件時讀 EXPLAIN 的估計筆數
+    cache_key 為已正規化的過濾條件，空 dict 代表未過濾。
+    """
+    mode = resolve_count_mode(model, count_mode)
+    filters_key = cache_key or {}
+
+    if mode == CountModeEnum.estimate:
+        if not filters_key:
+            estimate = estimate_table_rows(db, model)
+            if estimate is not None:
+                return estimate
+            return query.count()
+        return estimate_query_rows(db, query)
+
+    if mode == CountModeEnum.cached:
+        cached = get_cached_count(model, filters_key)
+        if cached is not None:
+            return cached
+        total = query.count()
+        set_cached_count(model, filters_key, total)
+        return total
+
     return query.count()
 
 
+def count(
+    db: Session,
+    model: Type[ModelType],
+    count_mode: Optional[CountModeEnum] = None,
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+    **filters,
+) -> int:
+    query = db.query(model).filter(*updated_since_criteria(model, updated_since))
+    normalized_filters = normalize_filters_dict(filters) if filters else {}
+    if normalized_filters:
+        query = query.filter_by(**normalized_filters)
+    cache_key = {**normalized_filters, **updated_since_cache_key(updated_since)}
+    if area is not None:
+        query = query.filter(*area.criteria(model))
+        cache_key = {**cache_key, **area.cache_key()}
+    if search is not None:
+        query = query.filter(*search.criteria(model))
+        cache_key = {**cache_key, **search.cache_key()}
+    return count_query(db, query, model, count_mode=count_mode, cache_key=cache_key)
+
+
+def page_count_mode(count_mode: Optional[CountModeEnum], cursor: Optional[str]) -> Optional[CountModeEnum]:
+    """游標分頁未指定 count_mode 時 totalItems 使用估計值：游標分頁不需要精確總數，不為每一頁重新計數"""
+    if cursor is not None and count_mode is None:
+        return CountModeEnum.estimate
+    return count_mode
+
+
+def list_page(
+    request: Request,
+    db: Session,
+    model: Type[ModelType],
+    *,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    count_mode: Optional[CountModeEnum] = None,
+    order_by=None,
+    sort_column=None,
+    options: Sequence = (),
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+    **filters: Any,
+) -> Tuple[List[ModelType], int, Optional[str]]:
+    """
+    列表路由的分頁，回傳 (資料列, totalItems, next 連結)：
+    - cursor 為 None：OFFSET 分頁（order_by 同 get_multi），totalItems 依 count_mode 計算
+    - 帶入 cursor：依 sort_column、id 游標分頁（同 get_multi_by_cursor），忽略 offset；totalItems 見 page_count_mode
+    """
+    if cursor is None:
+        rows = get_multi(
+            db, model, skip=offset, limit=limit, order_by=order_by, options=options, area=area, search=search, updated_since=updated_since, **filters
+        )
+    else:
+        rows, next_cursor = get_multi_by_cursor(
+            db, model, cursor=cursor, limit=limit, sort_column=sort_column, options=options, area=area, search=search, updated_since=updated_since, **filters
+        )
+    total = count(db, model, count_mode=page_count_mode(count_mode, cursor), area=area, search=search, updated_since=updated_since, **filters)
+    if cursor is None:
+        return rows, total, build_next_link(request, limit=limit, offset=offset, total=total)
+    return rows, total, build_cursor_link(request, limit=limit, cursor=next_cursor)
+
+
 def create(db: Session, model: Type[ModelType], obj_in: CreateSchemaType) -> ModelType:
     """
     建立一般資料列：
@@ -106,6 +599,7 @@ def create(db: Session, model: Type[ModelType], obj_in: CreateSchemaType) -> Mod
     db_obj = model(**data)
     db.add(db_obj)
     db.commit()
+    invalidate_caches(model)
     db.refresh(db_obj)
     return db_obj
 
@@ -121,6 +615,7 @@ def create_with_input(db: Session, model: Type[ModelType], obj_in: CreateSchemaT
     db_obj = model(**payload, **extra)
     db.add(db_obj)
     db.commit()
+    invalidate_caches(model)
     db.refresh(db_obj)
     return db_obj
 
@@ -139,10 +634,59 @@ def update(db: Session, db_obj: ModelType, obj_in: UpdateSchemaType) -> ModelTyp
         setattr(db_obj, field, value)
     db.add(db_obj)
     db.commit()
+    invalidate_caches(type(db_obj))
     db.refresh(db_obj)
     return db_obj
 
 
+def bulk_insert(db: Session, model: Type[ModelType], rows: List[dict]) -> List[object]:
+    """
+    批次新增（不 commit）：以一個 INSERT ... RETURNING（executemany）寫入所有資料列，
+    回傳與 rows 同順序的 model 物件。整批失敗（例如某筆違反外鍵 / 唯一限制）時改為逐筆 SAVEPOINT 重試，
+    失敗的位置放 SQLAlchemyError，其餘照常寫入。
+    """
+    if not rows:
+        return []
+    stmt = sa_insert(model).returning(model, sort_by_parameter_order=True)
+    try:
+        with db.begin_nested():
+            return list(db.scalars(stmt, rows))
+    except SQLAlchemyError:
+        pass
+    results: List[object] = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                results.append(db.scalars(sa_insert(model).returning(model), [row]).one())
+        except SQLAlchemyError as exc:
+            results.append(exc)
+    return results
+
+
+def bulk_update(db: Session, model: Type[ModelType], rows: List[dict]) -> List[Optional[SQLAlchemyError]]:
+    """
+    依主鍵批次更新（不 commit）：rows 為 {"id": ..., 欄位: 新值}，以 executemany UPDATE 寫入。
+    整批失敗時改為逐筆 SAVEPOINT 重試；回傳與 rows 同順序的結果（成功為 None，失敗為 SQLAlchemyError）。
+    """
+    if not rows:
+        return []
+    try:
+        with db.begin_nested():
+            db.execute(sa_update(model), rows)
+        return [None] * len(rows)
+    except SQLAlchemyError:
+        pass
+    results: List[Optional[SQLAlchemyError]] = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(sa_update(model), [row])
+            results.append(None)
+        except SQLAlchemyError as exc:
+            results.append(exc)
+    return results
+
+
 # =====================
 # for supply
 # =====================
@@ -208,6 +752,7 @@ def create_supply_with_items(db: Session, obj_in: SupplyCreate) -> models.Supply
 
         # 3) 提交交易
         db.commit()
+        invalidate_caches(models.Supply, models.SupplyItem)
 
         # 4) 重新載入，帶出關聯
         db.refresh(db_supply)
@@ -233,6 +778,68 @@ def create_supply_with_items(db: Session, obj_in: SupplyCreate) -> models.Supply
         raise HTTPException(status_code=500, detail=f"建立供應單時發生未預期錯誤: {str(e)}")
 
 
+def _increment_received_counts(db: Session, supply_id: str, item_counts: Dict[str, int]) -> set:
+    """
+    以單一 UPDATE ... FROM (VALUES ...) RETURNING 累加 received_count，回傳實際更新的 supply_item_id。
+    加總在資料庫端計算且只更新不超過 total_number 的項目：同一筆資料列的並行更新由列鎖排隊，
+    後到的交易以最新的 received_count 重新判斷條件，不會遺失累加也不會超收。
+    供應單的 remaining_count 由 supply_items 的 trigger 以差額更新，並行更新不同項目也不會互相覆蓋。
+    未回傳的 id 為不存在、不屬於此供應單或超過 total_number，由呼叫端決定如何回報並 rollback。
+    """
+    # 先依 id 順序鎖定要更新的資料列：UPDATE ... FROM 的鎖定順序取決於執行計畫（例如依資料列的實體位置掃描），
+    # 項目有重疊的並行批次若以不同順序鎖定會 deadlock
+    db.execute(
+        select(SupplyItem.id)
+        .where(SupplyItem.id.in_(list(item_counts)), SupplyItem.supply_id == supply_id)
+        .order_by(SupplyItem.id)
+        .with_for_update()
+    )
+    increments = values(column("id", String), column("inc", Integer), name="increments").data(
+        sorted(item_counts.items())
+    )
+    received = func.coalesce(SupplyItem.received_count, 0)
+    stmt = (
+        sa_update(SupplyItem)
+        .where(
+            SupplyItem.id == increments.c.id,
+            SupplyItem.supply_id == supply_id,
+            received + increments.c.inc <= SupplyItem.total_number,
+        )
+        .values(received_count=received + increments.c.inc)
+        .returning(SupplyItem.id)
+        .execution_options(synchronize_session=False)
+    )
+    return set(db.scalars(stmt))
+
+
+def _received_count_conflicts(
+    db: Session, supply_id: str, item_counts: Dict[str, int], updated_ids: set
+) -> Tuple[list, list]:
+    """未被更新的項目 -> (找不到的 id, 超過 total_number 的項目明細)"""
+    rejected = [item_id for item_id in item_counts if item_id not in updated_ids]
+    rows = {
+        row.id: row
+        for row in db.execute(
+            select(SupplyItem.id, SupplyItem.received_count, SupplyItem.total_number).where(
+                SupplyItem.id.in_(rejected), SupplyItem.supply_id == supply_id
+            )
+        )
+    }
+    missing = [item_id for item_id in rejected if item_id not in rows]
+    conflicts = [
+        {
+            "id": item_id,
+            "count": item_counts[item_id],
+            "received_count": rows[item_id].received_count or 0,
+            "total_number": rows[item_id].total_number,
+            "remaining": rows[item_id].total_number - (rows[item_id].received_count or 0),
+        }
+        for item_id in rejected
+        if item_id in rows
+    ]
+    return missing, conflicts
+
+
 def distribute_items(db: Session, supply_id: str, items_to_distribute: List[SupplyItemDistribution]) -> Optional[List[models.SupplyItem]]:
     """
     批次更新指定 supply_id 底下多筆 SupplyItem 的 received_count。
@@ -240,48 +847,26 @@ def distribute_items(db: Session, supply_id: str, items_to_distribute: List[Supp
     整個交易會被回滾以確保資料一致性。
     """
     try:
-        item_ids_to_update = {item.id for item in items_to_distribute}
-        if not item_ids_to_update:
-            return []
-
-        db_items = (
-            db.query(models.SupplyItem)
-            .filter(
-                models.SupplyItem.supply_id == supply_id,
-                models.SupplyItem.id.in_(item_ids_to_update),
-            )
-            .with_for_update()
-            .all()
-        )
-
-        if len(db_items) != len(item_ids_to_update):
-            db.rollback()
-            return None
-
-        items_map = {str(item.id): item for item in db_items}
-
+        item_counts: Dict[str, int] = {}
         for item_update_request in items_to_distribute:
-            db_item = items_map.get(str(item_update_request.id))
-            if not db_item:
-                db.rollback()
-                return None
-
-            current_received = db_item.received_count or 0
-
             if item_update_request.count is None or item_update_request.count < 0:
-                db.rollback()
-                return None
-
-            new_received_count = current_received + item_update_request.count
-
-            if new_received_count > db_item.total_number:
-                db.rollback()
                 return None
+            item_id = str(item_update_request.id)
+            item_counts[item_id] = item_counts.get(item_id, 0) + item_update_request.count
+        if not item_counts:
+            return []
 
-            db_item.received_count = new_received_count
+        if _increment_received_counts(db, supply_id, item_counts) != set(item_counts):
+            db.rollback()
+            return None
 
+        # 物資項目沒有 updated_at，更新父層 Supply 的 updated_at 讓 /supplies 的 ETag 跟著變動
+        db.query(models.Supply).filter(models.Supply.id == supply_id).update(
+            {models.Supply.updated_at: datetime.now(timezone.utc)}, synchronize_session=False
+        )
         db.commit()
-        return db_items
+        invalidate_caches(models.Supply, models.SupplyItem)
+        return list(db.scalars(select(SupplyItem).where(SupplyItem.id.in_(list(item_counts)))))
 
     except SQLAlchemyError:
         db.rollback()
@@ -289,22 +874,13 @@ def distribute_items(db: Session, supply_id: str, items_to_distribute: List[Supp
 
 
 def get_full_supply(db: Session, query) -> models.Supply:
-    not_fulfilled_exists = exists().where(
-        and_(
-            models.SupplyItem.supply_id == models.Supply.id,
-            models.SupplyItem.received_count < models.SupplyItem.total_number
-        )
-    )
-    return query.filter(not_fulfilled_exists)
+    """只保留尚有物資未收滿的供應單（is_fulfilled 由 supply_items 的 trigger 維護，可走索引）"""
+    return query.filter(~models.Supply.is_fulfilled)
 
 
 def is_completed_supply(supply: models.Supply) -> bool:
     """Check whether the supply is completed"""
-    is_compelete = True
-    for item in supply.supplies:
-        if item.total_number != item.received_count:
-            is_compelete = False
-    return is_compelete
+    return bool(supply.is_fulfilled)
 
 
 def supply_merge_item_counts(data: List[Dict[str, int]]) -> Dict[str, int]:
@@ -357,45 +933,26 @@ def supply_batch_increment_received(db: Session, supply_id: str, item_counts: Di
             detail="沒有可更新的項目"
         )
 
-    # 查詢該供應單底下的 items
-    items = list(
-        db.scalars(
-            select(SupplyItem).where(
-                SupplyItem.id.in_(item_ids),
-                SupplyItem.supply_id == supply_id
-            )
-        )
-    )
-
-    # 驗證缺漏
-    found_ids = set()
-    for it in items:
-        found_ids.add(it.id)
-    missing_ids = []
-    for iid in item_ids:
-        if iid not in found_ids:
-            missing_ids.append(iid)
-    if len(missing_ids) > 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"以下 supply_item_id 未找到或不屬於 Supply {supply_id}: {missing_ids}"
-        )
-
-    # 交易更新（保持簡潔結構）
+    # 交易更新：單一 UPDATE 累加，任一項目失敗則整批 rollback
     try:
-        for it in items:
-            inc = item_counts[it.id]
-            current = it.received_count if it.received_count is not None else 0
-            it.received_count = current + inc
+        updated_ids = _increment_received_counts(db, supply_id, item_counts)
+        if updated_ids != set(item_counts):
+            missing_ids, conflicts = _received_count_conflicts(db, supply_id, item_counts, updated_ids)
+            db.rollback()
+            if missing_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"以下 supply_item_id 未找到或不屬於 Supply {supply_id}: {missing_ids}"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "received_count 不可超過 total_number", "conflicts": conflicts},
+            )
 
-        # 更新父層 Supply 的 updated_at
+        # 更新父層 Supply 的 updated_at（remaining_count 由 trigger 更新）
         supply.updated_at = datetime.now(timezone.utc)
-
-        db.add_all(items)
-        db.add(supply)
-        db.flush()
-        db.refresh(supply)
         db.commit()
+        invalidate_caches(Supply, SupplyItem)
     except HTTPException:
         db.rollback()
         raise
@@ -406,3 +963,111 @@ def supply_batch_increment_received(db: Session, supply_id: str, item_counts: Di
             detail="批次更新失敗，請稍後重試"
         )
     return supply
+
+
+# =====================
+# 異動紀錄（/changes）
+# =====================
+
+# 同步進度：最後一筆已讀紀錄的 (txid, id, changed_at)
+ChangePosition = Tuple[int, int, datetime]
+
+
+def _visible_changes():
+    """已結束的交易寫入的紀錄；進行中交易之後才 commit 的紀錄，其 txid 一定不小於目前 snapshot 的 xmin"""
+    return models.ChangeLog.txid < func.txid_snapshot_xmin(func.txid_current_snapshot())
+
+
+def parse_change_resources(resource: Optional[str]) -> List[str]:
+    """resource= 查詢參數（逗號分隔的資源類型）；未帶入時回傳空 list（全部），包含未知的類型時回 400"""
+    resources = [name.strip() for name in resource.split(",") if name.strip()] if resource else []
+    unknown = set(resources) - set(models.CHANGE_LOG_TABLES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown resource: {', '.join(sorted(unknown))}")
+    return resources
+
+
+def encode_change_position(position: ChangePosition) -> str:
+    return encode_cursor(list(position))
+
+
+def decode_change_position(since: str) -> ChangePosition:
+    """解碼 /changes 的 since；格式不符時回傳 400"""
+    try:
+        padded = since + "=" * (-len(since) % 4)
+        txid, change_id, changed_at = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(txid), int(change_id), datetime.fromisoformat(changed_at)
+    except (ValueError, TypeError, UnicodeEncodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid since")
+
+
+def latest_change_position(db: Session) -> ChangePosition:
+    """目前的同步進度：之後才結束的交易所寫入的紀錄都在此位置之後"""
+    xmin, last_id = db.execute(
+        select(func.txid_snapshot_xmin(func.txid_current_snapshot()) - 1, func.coalesce(func.max(models.ChangeLog.id), 0))
+    ).one()
+    return xmin, last_id, datetime.now(timezone.utc)
+
+
+def change_position(change: models.ChangeLog) -> ChangePosition:
+    return change.txid, change.id, change.changed_at
+
+
+def is_change_position_pruned(db: Session, position: ChangePosition) -> bool:
+    """
+    position 之後的紀錄是否可能已被清除（scripts/prune_change_log.py）：
+    position 早於保留期限，且紀錄中已沒有 position 之前（含）的資料
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+    changed_at = position[2] if position[2].tzinfo is not None else position[2].replace(tzinfo=timezone.utc)
+    if changed_at >= cutoff:
+        return False
+    log = models.ChangeLog
+    stmt = select(log.id).filter(tuple_(log.txid, log.id) <= tuple_(position[0], position[1])).limit(1)
+    return db.scalar(stmt) is None
+
+
+def changes_select(
+    position: Optional[ChangePosition], limit: int, resources: Sequence[str] = (), visible_only: bool = True
+):
+    """
+    position 之後的異動紀錄，依 (txid, id) 由舊到新；多取一筆供判斷是否還有下一頁。
+    position 為 None 時從保留中最舊的紀錄開始。
+    visible_only=False 時也包含 txid 不小於 xmin、已 commit 的紀錄（/events 補送用，之後的異動另由推播送出）。
+    """
+    log = models.ChangeLog
+    stmt = select(log)
+    if visible_only:
+        stmt = stmt.filter(_visible_changes())
+    if resources:
+        stmt = stmt.filter(log.resource.in_(resources))
+    if position is not None:
+        stmt = stmt.filter(tuple_(log.txid, log.id) > tuple_(position[0], position[1]))
+    return stmt.order_by(log.txid, log.id).limit(limit + 1)
+
+
+def get_changes(
+    db: Session, position: Optional[ChangePosition], limit: int, resources: Sequence[str] = ()
+) -> List[models.ChangeLog]:
+    return list(db.scalars(changes_select(position, limit, resources)))
+
+
+def completed_human_resource_ids(db: Session, changes: Sequence[models.ChangeLog]) -> set:
+    """與人力需求列表相同：已完成的需求不公開 id"""
+    ids = {change.resource_id for change in changes if change.resource == "human_resources"}
+    if not ids:
+        return set()
+    hr = models.HumanResource
+    return set(db.scalars(select(hr.id).where(hr.id.in_(ids), hr.status == "completed")))
+
+
+def public_change_id(change: models.ChangeLog, masked: set) -> str:
+    return "" if change.resource == "human_resources" and change.resource_id in masked else change.resource_id
+
+
+def prune_change_log(db: Session, retention_days: int) -> int:
+    """刪除超過保留期限的異動紀錄，回傳刪除筆數"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    result = db.execute(models.ChangeLog.__table__.delete().where(models.ChangeLog.changed_at < cutoff))
+    db.commit()
+    return result.rowcount
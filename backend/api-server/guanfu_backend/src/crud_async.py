@@ -0,0 +1,165 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud
+from .crud import ModelType, apply_cursor, apply_validators, cursor_page, query_string_key, resolve_count_mode
+from .database import SyncSessionAdapter
+from .geo import Area
+from .search import Search
+from .enum_serializer import CountModeEnum, normalize_filters_dict
+
+# async 路由使用的 session：AsyncSession 或包裝同步 Session 的 SyncSessionAdapter
+AsyncDB = Union[AsyncSession, SyncSessionAdapter]
+
+
+async def get_by_id(db: AsyncDB, model: Type[ModelType], id: Any, options: Sequence = ()) -> Optional[ModelType]:
+    """
+    crud.get_by_id 的 async 版本；options 例如 selectinload(...)，
+    AsyncSession 不支援 lazy load，回應需要的關聯必須在這裡預先載入。
+    """
+    stmt = select(model).filter(model.id == id).options(*options).limit(1)
+    return (await db.scalars(stmt)).first()
+
+
+async def get_multi(
+    db: AsyncDB,
+    model: Type[ModelType],
+    skip: int = 0,
+    limit: int = 100,
+    order_by=None,
+    options: Sequence = (),
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+    **filters: Any,
+) -> List[ModelType]:
+    """crud.get_multi 的 async 版本"""
+    stmt = crud.filtered_select(model, filters, area, search, updated_since).options(*options)
+    rank = search.rank(model) if search is not None else None
+    if rank is not None:
+        stmt = stmt.order_by(rank.desc())
+    if area is not None and area.near is not None:
+        stmt = stmt.order_by(area.distance(model))
+    if order_by is not None:
+        stmt = stmt.order_by(order_by)
+    return list((await db.scalars(stmt.offset(skip).limit(limit))).all())
+
+
+async def get_multi_by_cursor(
+    db: AsyncDB,
+    model: Type[ModelType],
+    cursor: str,
+    limit: int = 100,
+    sort_column=None,
+    descending: bool = True,
+    options: Sequence = (),
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+    **filters: Any,
+) -> Tuple[List[ModelType], Optional[str]]:
+    """crud.get_multi_by_cursor 的 async 版本"""
+    stmt = crud.filtered_select(model, filters, area, search, updated_since).options(*options)
+    stmt = apply_cursor(stmt, model, cursor=cursor, limit=limit, sort_column=sort_column, descending=descending)
+    rows = list((await db.scalars(stmt)).all())
+    return cursor_page(rows, limit=limit, sort_column=sort_column)
+
+
+async def _exact_count(db: AsyncDB, stmt) -> int:
+    count_stmt = select(func.count()).select_from(stmt.order_by(None).subquery())
+    return (await db.scalar(count_stmt)) or 0
+
+
+async def count_query(
+    db: AsyncDB,
+    stmt,
+    model: Type[ModelType],
+    count_mode: Optional[CountModeEnum] = None,
+    cache_key: Optional[Dict[str, Any]] = None,
+) -> int:
+    """
+    crud.count_query 的 async 版本，stmt 為 select()；
+    cached 模式與同步版本共用同一份快取。
+    """
+    mode = resolve_count_mode(model, count_mode)
+    filters_key = cache_key or {}
+
+    if mode == CountModeEnum.estimate:
+        if not filters_key:
+            estimate = await db.run_sync(crud.estimate_table_rows, model)
+            if estimate is not None:
+                return estimate
+            return await _exact_count(db, stmt)
+        return await db.run_sync(crud.estimate_query_rows, stmt)
+
+    if mode == CountModeEnum.cached:
+        cached = crud.get_cached_count(model, filters_key)
+        if cached is not None:
+            return cached
+        total = await _exact_count(db, stmt)
+        crud.set_cached_count(model, filters_key, total)
+        return total
+
+    return await _exact_count(db, stmt)
+
+
+async def count(
+    db: AsyncDB,
+    model: Type[ModelType],
+    count_mode: Optional[CountModeEnum] = None,
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+    **filters,
+) -> int:
+    """crud.count 的 async 版本"""
+    cache_key = {**(normalize_filters_dict(filters) if filters else {}), **crud.updated_since_cache_key(updated_since)}
+    if area is not None:
+        cache_key = {**cache_key, **area.cache_key()}
+    if search is not None:
+        cache_key = {**cache_key, **search.cache_key()}
+    stmt = crud.filtered_select(model, filters, area, search, updated_since)
+    return await count_query(db, stmt, model, count_mode=count_mode, cache_key=cache_key)
+
+
+async def list_page(
+    request: Request,
+    db: AsyncDB,
+    model: Type[ModelType],
+    *,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    count_mode: Optional[CountModeEnum] = None,
+    order_by=None,
+    sort_column=None,
+    options: Sequence = (),
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    updated_since: Optional[datetime] = None,
+    **filters: Any,
+) -> Tuple[List[ModelType], int, Optional[str]]:
+    """crud.list_page 的 async 版本"""
+    if cursor is None:
+        rows = await get_multi(
+            db, model, skip=offset, limit=limit, order_by=order_by, options=options, area=area, search=search, updated_since=updated_since, **filters
+        )
+    else:
+        rows, next_cursor = await get_multi_by_cursor(
+            db, model, cursor=cursor, limit=limit, sort_column=sort_column, options=options, area=area, search=search, updated_since=updated_since, **filters
+        )
+    total = await count(db, model, count_mode=crud.page_count_mode(count_mode, cursor), area=area, search=search, updated_since=updated_since, **filters)
+    if cursor is None:
+        return rows, total, crud.build_next_link(request, limit=limit, offset=offset, total=total)
+    return rows, total, crud.build_cursor_link(request, limit=limit, cursor=next_cursor)
+
+
+async def check_collection_not_modified(request: Request, response: Response, db: AsyncDB, model: Type[ModelType]) -> None:
+    """crud.check_collection_not_modified 的 async 版本"""
+    state = tuple((await db.execute(crud.collection_state_select(model))).one())
+    parts = (model.__tablename__, state, query_string_key(request))
+    apply_validators(request, response, parts, None, allow_if_modified_since=False)
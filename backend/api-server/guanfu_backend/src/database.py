@@ -1,6 +1,10 @@
-from typing import Generator
-from sqlalchemy import create_engine, URL
+import os
+from typing import AsyncGenerator, Generator, Union
+from fastapi import Request
+from sqlalchemy import create_engine, make_url, URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from starlette.concurrency import run_in_threadpool
 
 from .config import settings
 
@@ -12,6 +16,30 @@ DB_NAME = settings.DB_NAME
 INSTANCE_CONNECTION_NAME = settings.INSTANCE_CONNECTION_NAME
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
+
+def engine_pool_kwargs() -> dict:
+    """連線池設定，sync / async engine 共用"""
+    return {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def psycopg2_connect_args() -> dict:
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def asyncpg_connect_args() -> dict:
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        return {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+    return {}
+
+
 # 依環境切換 Engine
 # if ENVIRONMENT in ("dev", "prod"): # We don't use cloudrun now, default in else
 if ENVIRONMENT in ("cloudrun"):
@@ -25,9 +53,8 @@ if ENVIRONMENT in ("cloudrun"):
             database=DB_NAME,
             query={"host": unix_socket_path},  # Postgres 用 host 指向 socket 路徑
         ),
-        pool_pre_ping=True,
-        pool_size=5,
-        max_overflow=10,
+        connect_args=psycopg2_connect_args(),
+        **engine_pool_kwargs(),
     )
 else:
     # 本機或一般 TCP：優先使用完整 DATABASE_URL
@@ -42,17 +69,74 @@ else:
                 port=5432,
                 database=DB_NAME,
             ),
-            pool_pre_ping=True,
+            connect_args=psycopg2_connect_args(),
+            **engine_pool_kwargs(),
         )
     else:
         engine = create_engine(
             SQLALCHEMY_DATABASE_URL,
-            pool_pre_ping=True,
+            connect_args=psycopg2_connect_args(),
+            **engine_pool_kwargs(),
         )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 唯讀副本（read replica）：有設定 DATABASE_READ_URL 才建立，否則讀取也走主庫
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(
+        settings.DATABASE_READ_URL,
+        connect_args=psycopg2_connect_args(),
+        **engine_pool_kwargs(),
+    )
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+def _create_async_engine(url: URL):
+    # 沿用 sync engine 的連線位置，只替換 driver
+    return create_async_engine(
+        url.set(drivername="postgresql+asyncpg"),
+        connect_args=asyncpg_connect_args(),
+        **engine_pool_kwargs(),
+    )
+
+
+# Async Engine（asyncpg）
+if settings.DB_ASYNC_ENABLED:
+    async_engine = _create_async_engine(engine.url)
+    async_read_engine = (
+        _create_async_engine(make_url(settings.DATABASE_READ_URL))
+        if settings.DATABASE_READ_URL
+        else async_engine
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_read_engine, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_engine = None
+    async_read_engine = None
+    AsyncSessionLocal = None
+    AsyncReadSessionLocal = None
+
+
+def _reset_pools_after_fork() -> None:
+    """
+    fork 出來的子程序（例如 gunicorn preload_app 的 worker）不可沿用父程序的連線 socket。
+    close=False：只丟棄繼承來的連線、不對它們送出關閉，避免影響父程序仍在使用的連線。
+    """
+    for sync_engine in {engine, read_engine}:
+        sync_engine.dispose(close=False)
+    for an_async_engine in {async_engine, async_read_engine} - {None}:
+        an_async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
 
 def init_db():
     # 在這裡導入所有定義了 Base 的 model，這樣它們才會被正確認識
@@ -68,3 +152,90 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+# =====================
+# 讀寫分離
+# =====================
+# 寫入成功後在 client 設定短暫的 cookie，期間內的讀取改走主庫，
+# 避免 replica 尚未同步時讀不到自己剛寫入的資料（read-your-writes）。
+READ_PRIMARY_COOKIE = "gf_read_primary"
+
+
+def use_read_replica(request: Request) -> bool:
+    return (
+        read_engine is not engine
+        and READ_PRIMARY_COOKIE not in request.cookies
+        and not getattr(request.state, "read_primary", False)
+    )
+
+
+def read_from_primary(request: Request) -> None:
+    """此請求的 GET 路由改讀主庫（例如結果要存入回應快取時，不能存入 replica 尚未同步的資料）"""
+    request.state.read_primary = True
+
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """
+    GET 路由使用的 DB session：有設定 DATABASE_READ_URL 時讀取 replica，
+    但 client 剛寫入過（帶有 sticky cookie）時仍讀取主庫。
+    """
+    db = ReadSessionLocal() if use_read_replica(request) else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class SyncSessionAdapter:
+    """
+    以 AsyncSession 的介面包裝同步 Session，每個查詢丟到 threadpool 執行。
+    DB_ASYNC_ENABLED 關閉時，async 路由透過它使用原本的 psycopg2 engine。
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def get_async_db() -> AsyncGenerator[Union[AsyncSession, SyncSessionAdapter], None]:
+    """
+    async 路由使用的 DB session：
+    - DB_ASYNC_ENABLED=true：asyncpg AsyncSession，等待 DB 時不佔用 threadpool
+    - 否則：包裝同步 Session 的 SyncSessionAdapter
+    """
+    if AsyncSessionLocal is not None:
+        db = AsyncSessionLocal()
+    else:
+        db = SyncSessionAdapter(SessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[Union[AsyncSession, SyncSessionAdapter], None]:
+    """get_read_db 的 async 版本"""
+    replica = use_read_replica(request)
+    if AsyncSessionLocal is not None:
+        db = AsyncReadSessionLocal() if replica else AsyncSessionLocal()
+    else:
+        db = SyncSessionAdapter(ReadSessionLocal() if replica else SessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
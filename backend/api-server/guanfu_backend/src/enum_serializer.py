@@ -45,6 +45,12 @@ def normalize_filters_dict(filters: Dict[str, Any]) -> Dict[str, Any]:
     return normalized
 
 
+class CountModeEnum(enum.Enum):
+    exact = "exact"  # 每次 SELECT count(*)
+    cached = "cached"  # 依過濾條件快取，寫入時失效
+    estimate = "estimate"  # 使用 planner 估計值
+
+
 class ShelterStatusEnum(enum.Enum):
     open = "open"
     full = "full"
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set
+
+import orjson
+from fastapi import HTTPException
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from . import crud
+from .config import settings
+from .database import SessionLocal, engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# 資源異動推播：GET /events（Server-Sent Events）
+# 各資料表的 trigger（models.CHANGE_LOG_DDL）在寫入 change_log 時同時 pg_notify(CHANNEL)，
+# 每個 worker process 只用一條資料庫連線 LISTEN，再由 EventHub 轉送給該 worker 上所有的 SSE 連線。
+# 每則通知只編碼一次，相同篩選條件的訂閱者共用同一份 bytes。
+# 每則訊息的 id 是 /changes 的 since 格式：重新連線時以 Last-Event-ID 補送斷線期間的異動，
+# 也可以直接改用 /changes?since=<id> 接續。
+# ===================================================================
+
+CHANNEL = "gf_changes"
+
+# 佇列中的特殊訊息：要求用戶端以 /changes 補上漏掉的異動後重新連線
+_RESYNC = b'event: resync\ndata: {}\n\n'
+_HEARTBEAT = b": ping\n\n"
+
+
+def _event(event_id: Optional[str], version: int, resource: str, resource_id: str, action: str) -> bytes:
+    data = orjson.dumps({"version": version, "resource": resource, "id": resource_id, "action": action})
+    id_line = f"id: {event_id}\n".encode() if event_id else b""
+    return id_line + b"data: " + data + b"\n\n"
+
+
+def _notification_event(change: dict) -> bytes:
+    """
+    trigger 的通知轉成 SSE 訊息；id 為 (xmin, 0, changed_at)：txid 小於 xmin 的交易在寫入前都已結束、
+    其通知已先送出，因此從這個位置接續不會漏掉紀錄（可能重複收到少數已收過的異動）
+    """
+    event_id = None
+    if change.get("xmin") is not None and change.get("changed_at"):
+        event_id = crud.encode_change_position((change["xmin"], 0, datetime.fromisoformat(change["changed_at"])))
+    return _event(event_id, change.get("version"), change.get("resource"), change.get("id"), change.get("action"))
+
+
+class Subscription:
+    def __init__(self, resources: FrozenSet[str]):
+        self.resources = resources
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def push(self, chunk: bytes) -> bool:
+        """放入佇列；佇列已滿（用戶端讀取太慢）時回傳 False"""
+        try:
+            self.queue.put_nowait(chunk)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close_with_resync(self) -> None:
+        """清空佇列並放入 resync，串流送出後結束"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_RESYNC)
+
+
+class EventHub:
+    """
+    一條 LISTEN 連線對多個 SSE 訂閱者的轉送中心；第一個訂閱者出現時才建立連線。
+    連線中斷時自動重連，並通知所有訂閱者 resync（中斷期間的通知無法補送）。
+    """
+
+    def __init__(self):
+        # 篩選條件（資源類型集合）-> 訂閱者
+        self._groups: Dict[FrozenSet[str], Set[Subscription]] = {}
+        self._count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._listening = asyncio.Event()
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._count
+
+    def subscribe(self, resources: Iterable[str]) -> Subscription:
+        if self._count >= settings.EVENTS_MAX_SUBSCRIBERS:
+            raise HTTPException(status_code=503, detail="Too many event subscribers, retry later")
+        subscription = Subscription(frozenset(resources))
+        self._groups.setdefault(subscription.resources, set()).add(subscription)
+        self._count += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        group = self._groups.get(subscription.resources)
+        if group is None or subscription not in group:
+            return
+        group.discard(subscription)
+        if not group:
+            del self._groups[subscription.resources]
+        self._count -= 1
+
+    async def wait_listening(self, timeout: float) -> bool:
+        """等到 LISTEN 連線建立（補送前確認之後的異動都會收到通知）；逾時回傳 False"""
+        try:
+            await asyncio.wait_for(self._listening.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def publish(self, payloads: List[str]) -> None:
+        """將一批通知（trigger 的 JSON payload）轉送給訂閱者"""
+        events = []
+        for payload in payloads:
+            try:
+                change = orjson.loads(payload)
+            except orjson.JSONDecodeError:
+                logger.warning("ignored malformed %s payload: %r", CHANNEL, payload)
+                continue
+            events.append((change.get("resource"), _notification_event(change)))
+        if not events:
+            return
+        overflowed = []
+        for resources, subscriptions in self._groups.items():
+            chunk = b"".join(data for resource, data in events if not resources or resource in resources)
+            if not chunk:
+                continue
+            for subscription in subscriptions:
+                if not subscription.push(chunk):
+                    overflowed.append(subscription)
+        for subscription in overflowed:
+            self.unsubscribe(subscription)
+            subscription.close_with_resync()
+            metrics.inc("events_dropped_subscribers_total")
+
+    def _resync_all(self) -> None:
+        for subscriptions in list(self._groups.values()):
+            for subscription in list(subscriptions):
+                self.unsubscribe(subscription)
+                subscription.close_with_resync()
+
+    @staticmethod
+    def _connect():
+        # 從連線池取出後脫離，池會另外補連線；沿用 engine 的連線設定（含 Cloud SQL socket）
+        connection = engine.raw_connection()
+        connection.detach()
+        dbapi_connection = connection.dbapi_connection
+        dbapi_connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return dbapi_connection
+
+    async def _listen(self) -> None:
+        loop = asyncio.get_running_loop()
+        delay = 1
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                connection = await loop.run_in_executor(None, self._connect)
+                if connected_before:
+                    self._resync_all()
+                connected_before = True
+                delay = 1
+                self._listening.set()
+                readable = asyncio.Event()
+                fd = connection.fileno()
+                loop.add_reader(fd, readable.set)
+                try:
+                    while True:
+                        await readable.wait()
+                        readable.clear()
+                        connection.poll()
+                        if connection.notifies:
+                            payloads = [notify.payload for notify in connection.notifies]
+                            connection.notifies.clear()
+                            self.publish(payloads)
+                finally:
+                    loop.remove_reader(fd)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("event listener connection failed, reconnecting in %ss", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                self._listening.clear()
+                if connection is not None and not connection.closed:
+                    connection.close()
+
+
+hub = EventHub()
+metrics.register_gauge("events_subscribers", lambda: hub.subscriber_count)
+
+
+def replay(last_event_id: str, resources: Sequence[str]) -> Optional[bytes]:
+    """
+    Last-Event-ID 之後已 commit 的異動（在訂閱之後呼叫，與推播重疊的部分會重複送出）；
+    id 格式不符、已超過保留期限或超過 EVENTS_REPLAY_LIMIT 筆時回傳 None，由用戶端以 /changes 補上。
+    只有最後一則帶 id（目前位置），中途斷線時用戶端會以原本的 Last-Event-ID 重新補送。
+    """
+    try:
+        position = crud.decode_change_position(last_event_id)
+    except HTTPException:
+        return None
+    # 從主資料庫讀取：replica 可能尚未同步斷線期間的紀錄
+    with SessionLocal() as db:
+        if crud.is_change_position_pruned(db, position):
+            return None
+        latest = crud.latest_change_position(db)
+        changes = list(db.scalars(crud.changes_select(position, settings.EVENTS_REPLAY_LIMIT, resources, visible_only=False)))
+        if len(changes) > settings.EVENTS_REPLAY_LIMIT:
+            return None
+        masked = crud.completed_human_resource_ids(db, changes)
+    last_id = crud.encode_change_position(latest)
+    return b"".join(
+        _event(last_id if i == len(changes) - 1 else None, change.id, change.resource, crud.public_change_id(change, masked), change.action)
+        for i, change in enumerate(changes)
+    )
+
+
+async def stream(subscription: Subscription, replayed: bytes = b"") -> AsyncIterator[bytes]:
+    """SSE 回應內容（replayed 為 Last-Event-ID 補送的訊息）；用戶端斷線時（generator 被取消）取消訂閱"""
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n".encode()
+        if replayed:
+            yield replayed
+        while True:
+            try:
+                chunk = await asyncio.wait_for(subscription.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                chunk = _HEARTBEAT
+            yield chunk
+            if chunk is _RESYNC:
+                return
+    finally:
+        hub.unsubscribe(subscription)
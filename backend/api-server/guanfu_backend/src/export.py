@@ -0,0 +1,114 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, Callable, Iterator, List, Literal, Optional, Sequence, Type
+
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from . import crud, serializers
+from .config import settings
+from .database import ReadSessionLocal, SessionLocal, use_read_replica
+from .geo import Area
+from .search import Search
+
+# ===================================================================
+# 整表匯出：GET /{resource}/export?format=ndjson|csv
+# 以 server-side cursor（yield_per）分批讀取、邊讀邊輸出，記憶體用量與資料表大小無關；
+# 不計算 totalItems、不使用 OFFSET。依 (updated_at, id) 由舊到新輸出，
+# client 可記下最後一筆的 updated_at，下次以 updated_since= 只取之後異動的資料。
+# ===================================================================
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _csv_value(value: Any) -> Any:
+    """巢狀欄位（座標、陣列、物資項目）以 JSON 字串放在同一格"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode()
+    return value
+
+
+def _encode(rows: List[dict], fmt: ExportFormat, columns: Sequence[str]) -> bytes:
+    if fmt == "ndjson":
+        return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(row.get(name)) for name in columns] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _header(fmt: ExportFormat, columns: Sequence[str]) -> bytes:
+    if fmt == "ndjson":
+        return b""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _stream(
+    session_factory,
+    stmt,
+    fmt: ExportFormat,
+    serialize: Callable[[Any], dict],
+    columns: Sequence[str],
+    transform: Optional[Callable[[Any], Any]],
+) -> Iterator[bytes]:
+    # 回應在路由結束後才開始輸出，session 由 generator 自己開關，不依賴路由的 DB dependency
+    db = session_factory()
+    try:
+        yield _header(fmt, columns)
+        batch: List[dict] = []
+        result = db.scalars(stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        for row in result:
+            batch.append(serialize(transform(row) if transform is not None else row))
+            if len(batch) >= settings.EXPORT_BATCH_SIZE:
+                yield _encode(batch, fmt, columns)
+                batch = []
+        if batch:
+            yield _encode(batch, fmt, columns)
+    finally:
+        db.close()
+
+
+def export_response(
+    request: Request,
+    model: Type[Any],
+    schema: Type[BaseModel],
+    fmt: ExportFormat,
+    updated_since: Optional[datetime] = None,
+    area: Optional[Area] = None,
+    search: Optional[Search] = None,
+    options: Sequence = (),
+    transform: Optional[Callable[[Any], Any]] = None,
+    **filters: Any,
+) -> StreamingResponse:
+    """
+    以串流回應匯出符合篩選條件的所有資料列；filters、area、search 與列表相同，
+    每一列的內容與單筆 / 列表回應相同（schema）。transform 在序列化前套用於每一列（例如遮罩 id）。
+    """
+    stmt = crud.filtered_select(model, filters, area, search, updated_since)
+    sort_columns = [model.updated_at, model.id] if "updated_at" in model.__table__.c else [model.id]
+    stmt = stmt.options(*options).order_by(*(column.asc() for column in sort_columns))
+    session_factory = ReadSessionLocal if use_read_replica(request) else SessionLocal
+    columns = tuple(schema.model_fields)
+    extension = "ndjson" if fmt == "ndjson" else "csv"
+    return StreamingResponse(
+        _stream(session_factory, stmt, fmt, serializers.serializer_for(schema), columns, transform),
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{model.__tablename__}.{extension}"',
+            "Cache-Control": "no-store",
+        },
+    )
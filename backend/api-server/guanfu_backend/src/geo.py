@@ -0,0 +1,118 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Type
+
+from fastapi import HTTPException, Query
+from sqlalchemy import func
+
+from .config import settings
+
+# ===================================================================
+# 地理查詢：bbox= / near=&radius=
+# 以 generated column geo_lat / geo_lng 與 point(geo_lng, geo_lat) 的 GiST 索引
+# （models.geo_column / geo_point_index）先以矩形篩選，再以 haversine 計算實際距離。
+# 只用到 PostgreSQL 內建的 point / box，不需要 PostGIS。
+# ===================================================================
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+@dataclass(frozen=True)
+class Area:
+    """列表的地理篩選條件；bbox 為 (min_lng, min_lat, max_lng, max_lat)，near 為 (lat, lng)"""
+
+    bbox: Optional[Tuple[float, float, float, float]] = None
+    near: Optional[Tuple[float, float]] = None
+    radius: Optional[float] = None
+
+    def criteria(self, model: Type[Any]) -> list:
+        clauses = []
+        if self.bbox is not None:
+            clauses.append(_within_box(model, *self.bbox))
+        if self.near is not None:
+            lat, lng = self.near
+            # 先以外接矩形走 GiST 索引，再過濾實際距離
+            clauses.append(_within_box(model, *radius_box(lat, lng, self.radius)))
+            clauses.append(self.distance(model) <= self.radius)
+        return clauses
+
+    def distance(self, model: Type[Any]):
+        """與 near 的 haversine 距離（公尺）"""
+        lat, lng = self.near
+        return haversine_sql(model.geo_lat, model.geo_lng, lat, lng)
+
+    def cache_key(self) -> Dict[str, Any]:
+        """併入 count 快取 key，不同範圍的 totalItems 分開快取"""
+        key = {}
+        if self.bbox is not None:
+            key["bbox"] = self.bbox
+        if self.near is not None:
+            key["near"] = (self.near, self.radius)
+        return key
+
+
+def _within_box(model: Type[Any], min_lng: float, min_lat: float, max_lng: float, max_lat: float):
+    # 運算式需與 geo_point_index 相同才會使用索引
+    point = func.point(model.geo_lng, model.geo_lat)
+    return point.op("<@")(func.box(func.point(min_lng, min_lat), func.point(max_lng, max_lat)))
+
+
+def radius_box(lat: float, lng: float, radius: float) -> Tuple[float, float, float, float]:
+    """以 (lat, lng) 為中心、半徑 radius 公尺的外接矩形 (min_lng, min_lat, max_lng, max_lat)"""
+    dlat = radius / METERS_PER_DEGREE_LAT
+    dlng = radius / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lng - dlng, max(lat - dlat, -90.0), lng + dlng, min(lat + dlat, 90.0)
+
+
+def haversine_sql(lat_column, lng_column, lat: float, lng: float):
+    half_dlat = func.radians(lat_column - lat) / 2
+    half_dlng = func.radians(lng_column - lng) / 2
+    a = func.power(func.sin(half_dlat), 2) + math.cos(math.radians(lat)) * func.cos(
+        func.radians(lat_column)
+    ) * func.power(func.sin(half_dlng), 2)
+    return 2 * EARTH_RADIUS_METERS * func.asin(func.sqrt(a))
+
+
+def _parse_numbers(raw: str, name: str, count: int) -> Tuple[float, ...]:
+    try:
+        values = tuple(float(v) for v in raw.split(","))
+    except ValueError:
+        values = ()
+    if len(values) != count or not all(math.isfinite(v) for v in values):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return values
+
+
+def area_query(
+    bbox: Optional[str] = Query(
+        None, description="矩形範圍 min_lng,min_lat,max_lng,max_lat，例如 121.3,23.9,121.5,24.1"
+    ),
+    near: Optional[str] = Query(
+        None, description="中心點 lat,lng；只回傳 radius 範圍內的資料，依距離由近到遠排序（cursor 分頁時仍依游標排序）"
+    ),
+    radius: Optional[float] = Query(
+        None, gt=0, le=settings.GEO_MAX_RADIUS_METERS, description="搭配 near 的半徑（公尺）"
+    ),
+) -> Optional[Area]:
+    """列表路由共用的地理篩選參數（以 Depends 使用）；未帶入任何條件時回傳 None"""
+    if bbox is None and near is None:
+        if radius is not None:
+            raise HTTPException(status_code=400, detail="radius requires near")
+        return None
+    box = None
+    if bbox is not None:
+        box = _parse_numbers(bbox, "bbox", 4)
+        min_lng, min_lat, max_lng, max_lat = box
+        if min_lng > max_lng or min_lat > max_lat:
+            raise HTTPException(status_code=400, detail="Invalid bbox")
+    center = None
+    if near is not None:
+        center = _parse_numbers(near, "near", 2)
+        if not (-90 <= center[0] <= 90 and -180 <= center[1] <= 180):
+            raise HTTPException(status_code=400, detail="Invalid near")
+    return Area(
+        bbox=box,
+        near=center,
+        radius=(radius or settings.GEO_DEFAULT_RADIUS_METERS) if center is not None else None,
+    )
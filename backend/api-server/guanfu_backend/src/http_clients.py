@@ -0,0 +1,65 @@
+import logging
+from typing import Dict
+
+import httpx
+
+from .config import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# 對外 HTTP 請求共用的 httpx.AsyncClient：每個對象（LINE、Discord）一個連線池，
+# 在 main.lifespan 啟動時建立、關閉時釋放，請求之間沿用 keep-alive 連線（可用時走 HTTP/2），
+# 不必每次重新建立 TCP + TLS 連線。lifespan 之外（scripts）使用時於第一次取用時建立。
+# ===================================================================
+
+LINE = "line"
+DISCORD = "discord"
+NAMES = (LINE, DISCORD)
+
+
+class HTTPClients:
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def open(self) -> None:
+        for name in NAMES:
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name)
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    @staticmethod
+    def _create(name: str) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            http2=settings.HTTP_CLIENT_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_SECONDS,
+            ),
+            retries=settings.HTTP_CLIENT_RETRIES,
+        )
+
+        async def count_response(response: httpx.Response) -> None:
+            metrics.inc("http_client_requests_total", client=name, status=str(response.status_code))
+
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(
+                settings.HTTP_CLIENT_TIMEOUT_SECONDS, connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS
+            ),
+            event_hooks={"response": [count_response]},
+        )
+
+
+clients = HTTPClients()
@@ -9,10 +9,13 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
-from . import database
+from . import database, events, http_clients, response_cache
 from .config import settings
+from .services import discord_webhook
 from .routers import (
     accommodations,
+    changes,
+    events as events_router,
     human_resources,
     medical_stations,
     mental_health_resources,
@@ -29,6 +32,7 @@ from .routers import (
     volunteer_organizations,
     water_refill_stations,
     line,
+    metrics,
 )
 
 
@@ -38,7 +42,13 @@ async def lifespan(app: FastAPI):
     # Startup:
     # Create database tables to prevent "relation does not exist" errors
     database.init_db()
+    http_clients.clients.open()
+    discord_webhook.dispatcher.start()
     yield
+    # Shutdown:
+    await events.hub.stop()
+    await discord_webhook.dispatcher.stop()
+    await http_clients.clients.aclose()
 
 
 # --- 根據環境動態設定 Swagger UI 的伺服器 URL ---
@@ -76,6 +86,34 @@ app = FastAPI(
 )
 
 
+@app.middleware("http")
+async def cache_public_lists(request: Request, call_next):
+    """公開列表的回應快取，見 response_cache.handle"""
+    return await response_cache.handle(request, call_next)
+
+
+@app.middleware("http")
+async def read_after_write_sticky(request: Request, call_next):
+    """
+    寫入成功後設定 sticky cookie，READ_AFTER_WRITE_STICKY_SECONDS 秒內
+    該 client 的 GET 改讀主庫（見 database.get_read_db）。未設定 replica 時不作用。
+    """
+    response = await call_next(request)
+    if (
+        database.read_engine is not database.engine
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        response.set_cookie(
+            database.READ_PRIMARY_COOKIE,
+            "1",
+            max_age=settings.READ_AFTER_WRITE_STICKY_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
 # ===================================================================
 # 全域異常處理器 (Global Exception Handlers)
 # ===================================================================
@@ -156,4 +194,7 @@ app.include_router(water_refill_stations.router)
 app.include_router(supplies.router)
 app.include_router(supply_items.router)
 app.include_router(supply_providers.router)
+app.include_router(changes.router)
+app.include_router(events_router.router)
 app.include_router(line.router)
+app.include_router(metrics.router)
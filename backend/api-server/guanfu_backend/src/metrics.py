@@ -0,0 +1,38 @@
+import threading
+from typing import Callable, Dict, Tuple
+
+
+class Metrics:
+    """
+    簡易的 process 內指標：
+    - counter：只增不減的累計值（例如快取命中次數）
+    - gauge：讀取當下數值的 callback（例如佇列長度）
+    以 Prometheus text format 輸出，供 GET /metrics 使用。
+    每個 worker process 各自計數。
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def register_gauge(self, name: str, fn: Callable[[], float], **labels: str) -> None:
+        self._gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+        gauges = [(key, fn()) for key, fn in sorted(self._gauges.items(), key=lambda item: item[0])]
+        for (name, labels), value in counters + gauges:
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_str}}} {value:g}" if label_str else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -1,10 +1,11 @@
 import uuid
 import time
 from sqlalchemy import (
-    Column, String, DateTime, Integer, Boolean, Text, BigInteger, ForeignKey, text, ARRAY
+    DDL, Column, String, DateTime, Integer, Boolean, Text, BigInteger, ForeignKey, text, ARRAY, Float, Computed, Index,
+    event,
 )
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -19,6 +20,78 @@ def current_timestamp_int():
     return time.time()
 
 
+def geo_column(*paths: str) -> Column:
+    """
+    由 coordinates JSONB 產生的經緯度欄位（generated column，資料庫自動維護）。
+    paths 為 JSONB 路徑，依序取第一個是數字的值；都不是數字時為 NULL。
+    """
+    values = ", ".join(
+        f"CASE WHEN jsonb_typeof(coordinates #> '{path}') = 'number' "
+        f"THEN (coordinates #>> '{path}')::double precision END"
+        for path in paths
+    )
+    return Column(Float, Computed(f"COALESCE({values})", persisted=True))
+
+
+def geo_point_index(table_name: str) -> Index:
+    """point(geo_lng, geo_lat) 的 GiST 索引，供 bbox / 半徑查詢（src/geo.py）使用"""
+    return Index(f"ix_{table_name}_geo_point", text("point(geo_lng, geo_lat)"), postgresql_using="gist")
+
+
+# 關鍵字搜尋（src/search.py）使用的資料庫函式：以空白、標點斷詞後取單字與相鄰兩字 (bigram)。
+# generated column 需要 IMMUTABLE 函式，且要在建立資料表前就存在；migration 中有相同的定義。
+SEARCH_FUNCTIONS_DDL = """
+CREATE OR REPLACE FUNCTION gf_search_vector(doc text) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT array_to_tsvector(coalesce(array_agg(DISTINCT tok), '{}'))
+    FROM regexp_split_to_table(lower(coalesce(doc, '')), '[[:space:][:punct:]]+') AS word,
+         generate_series(1, char_length(word)) AS i,
+         LATERAL (VALUES (substr(word, i, 1)), (substr(word, i, 2))) AS t(tok)
+    WHERE word <> ''
+$$;
+
+CREATE OR REPLACE FUNCTION gf_search_query(q text) RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT string_agg(quote_literal(tok), ' & ')::tsquery
+    FROM (
+        SELECT DISTINCT CASE WHEN char_length(word) = 1 THEN word ELSE substr(word, i, 2) END AS tok
+        FROM regexp_split_to_table(lower(coalesce(q, '')), '[[:space:][:punct:]]+') AS word,
+             generate_series(1, greatest(char_length(word) - 1, 1)) AS i
+        WHERE word <> ''
+    ) t
+$$;
+"""
+event.listen(Base.metadata, "before_create", DDL(SEARCH_FUNCTIONS_DDL))
+
+
+def search_column(*columns: str):
+    """
+    由文字欄位產生的搜尋用 tsvector（generated column）；deferred，一般查詢不會載入。
+    被索引的欄位記在 info，供 search.Search 以 ILIKE 複核。
+    """
+    document = " || ' ' || ".join(f"coalesce({name}, '')" for name in columns)
+    return deferred(
+        Column(TSVECTOR, Computed(f"gf_search_vector({document})", persisted=True), info={"search_columns": columns})
+    )
+
+
+def search_index(table_name: str) -> Index:
+    """search_vector 的 GIN 索引"""
+    return Index(f"ix_{table_name}_search_vector", "search_vector", postgresql_using="gin")
+
+
+def list_indexes(table_name: str, *filter_columns: str, sort_column: str = "updated_at") -> tuple:
+    """
+    列表查詢用的複合索引，欄位順序對應 crud.apply_cursor 的排序鍵 (sort_column, id)：
+    - (sort_column, id)：未篩選時的排序與游標分頁
+    - 每個篩選欄位一個 (filter, sort_column, id)：等值篩選 + 排序只需掃描索引的一段
+    """
+    return (
+        Index(f"ix_{table_name}_{sort_column}", sort_column, "id"),
+        *(Index(f"ix_{table_name}_{column}_{sort_column}", column, sort_column, "id") for column in filter_columns),
+    )
+
+
 # ===================================================================
 # 資料表模型定義
 # ===================================================================
@@ -41,6 +114,7 @@ class VolunteerOrganization(Base):
 
 class Shelter(Base):
     __tablename__ = "shelters"
+    __table_args__ = (geo_point_index("shelters"), *list_indexes("shelters", "status"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -56,11 +130,14 @@ class Shelter(Base):
     contact_person = Column(String)
     notes = Column(Text)
     coordinates = Column(JSONB)
+    geo_lat = geo_column("{lat}")
+    geo_lng = geo_column("{lng}")
     opening_hours = Column(String)
 
 
 class MedicalStation(Base):
     __tablename__ = "medical_stations"
+    __table_args__ = (geo_point_index("medical_stations"), *list_indexes("medical_stations", "status", "station_type"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -77,6 +154,8 @@ class MedicalStation(Base):
     medical_staff = Column(Integer)
     daily_capacity = Column(Integer)
     coordinates = Column(JSONB)
+    geo_lat = geo_column("{lat}")
+    geo_lng = geo_column("{lng}")
     affiliated_organization = Column(String)
     notes = Column(Text)
     link = Column(String)
@@ -84,6 +163,7 @@ class MedicalStation(Base):
 
 class MentalHealthResource(Base):
     __tablename__ = "mental_health_resources"
+    __table_args__ = (geo_point_index("mental_health_resources"), *list_indexes("mental_health_resources", "status"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -101,6 +181,8 @@ class MentalHealthResource(Base):
     languages = Column(ARRAY(Text), nullable=True)
     location = Column(String)
     coordinates = Column(JSONB)
+    geo_lat = geo_column("{lat}")
+    geo_lng = geo_column("{lng}")
     capacity = Column(Integer)
     waiting_time = Column(String)
     notes = Column(Text)
@@ -108,6 +190,7 @@ class MentalHealthResource(Base):
 
 class Accommodation(Base):
     __tablename__ = "accommodations"
+    __table_args__ = (geo_point_index("accommodations"), *list_indexes("accommodations", "status", "township"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -122,6 +205,8 @@ class Accommodation(Base):
     restrictions = Column(String)
     room_info = Column(String)
     coordinates = Column(JSONB)
+    geo_lat = geo_column("{lat}")
+    geo_lng = geo_column("{lng}")
     info_source = Column(String)
     notes = Column(Text)
     capacity = Column(Integer)
@@ -132,6 +217,7 @@ class Accommodation(Base):
 
 class ShowerStation(Base):
     __tablename__ = "shower_stations"
+    __table_args__ = (geo_point_index("shower_stations"), *list_indexes("shower_stations", "status"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -144,6 +230,8 @@ class ShowerStation(Base):
     status = Column(String, nullable=False)
     requires_appointment = Column(Boolean, nullable=False)
     coordinates = Column(JSONB)
+    geo_lat = geo_column("{lat}")
+    geo_lng = geo_column("{lng}")
     phone = Column(String)
     gender_schedule = Column(JSONB)
     capacity = Column(Integer)
@@ -157,6 +245,7 @@ class ShowerStation(Base):
 
 class WaterRefillStation(Base):
     __tablename__ = "water_refill_stations"
+    __table_args__ = (geo_point_index("water_refill_stations"), *list_indexes("water_refill_stations", "status"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -168,6 +257,8 @@ class WaterRefillStation(Base):
     status = Column(String, nullable=False)
     accessibility = Column(Boolean, nullable=False)
     coordinates = Column(JSONB)
+    geo_lat = geo_column("{lat}")
+    geo_lng = geo_column("{lng}")
     phone = Column(String)
     container_required = Column(String)
     daily_capacity = Column(Integer)
@@ -180,6 +271,7 @@ class WaterRefillStation(Base):
 
 class Restroom(Base):
     __tablename__ = "restrooms"
+    __table_args__ = (geo_point_index("restrooms"), *list_indexes("restrooms", "status"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -192,6 +284,8 @@ class Restroom(Base):
     has_lighting = Column(Boolean, nullable=False)
     status = Column(String, nullable=False)
     coordinates = Column(JSONB)
+    geo_lat = geo_column("{lat}")
+    geo_lng = geo_column("{lng}")
     phone = Column(String)
     male_units = Column(DateTime(timezone=True), nullable=False)
     female_units = Column(DateTime(timezone=True), nullable=False)
@@ -207,6 +301,10 @@ class Restroom(Base):
 
 class HumanResource(Base):
     __tablename__ = "human_resources"
+    __table_args__ = (
+        search_index("human_resources"),
+        *list_indexes("human_resources", "status", "role_status", sort_column="created_at"),
+    )
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -232,16 +330,19 @@ class HumanResource(Base):
     assignment_timestamp = Column(BigInteger)
     assignment_count = Column(Integer)
     assignment_notes = Column(Text)
+    search_vector = search_column("role_name", "role_type", "assignment_notes")
     pii_date = Column(BigInteger, nullable=False, default=current_timestamp_int)
     valid_pin = Column(String)
 
 
 class Supply(Base):
     __tablename__ = "supplies"
+    __table_args__ = (search_index("supplies"), *list_indexes("supplies", "is_fulfilled"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
     name = Column(String)
+    search_vector = search_column("name")
     address = Column(String)
     phone = Column(String)
     notes = Column(Text)
@@ -249,22 +350,83 @@ class Supply(Base):
     pii_date = Column(BigInteger, nullable=False, default=current_timestamp_int)
     valid_pin = Column(String)
     spam_warn = Column(Boolean)
+    # 尚未收到的物資總數；由 supply_items 的 trigger（SUPPLY_REMAINING_DDL）維護，程式不直接寫入
+    remaining_count = Column(Integer, nullable=False, server_default="0")
+    is_fulfilled = Column(Boolean, Computed("remaining_count = 0", persisted=True))
 
 
 class SupplyItem(Base):
     __tablename__ = "supply_items"
+    __table_args__ = (
+        search_index("supply_items"),
+        # 供應單的物資項目（selectinload / embed）與 ?supply_id= 篩選
+        Index("ix_supply_items_supply_id", "supply_id"),
+    )
     id = Column(String, primary_key=True, default=generate_uuid_str)
     supply_id = Column(String, ForeignKey("supplies.id"), nullable=False)
     total_number = Column(Integer, nullable=False)
     tag = Column(String, nullable=False)
     name = Column(String)
+    search_vector = search_column("name")
     received_count = Column(Integer)
     unit = Column(String)
     supply = relationship("Supply", back_populates="supplies")
 
 
+# 物資項目新增 / 刪除 / 數量變動時，以差額更新所屬供應單的 remaining_count（is_fulfilled 隨之更新），
+# 所有寫入路徑（API、批次更新、ETL 腳本）都會一致；migration 中有相同的定義。
+# 不重新 SELECT sum(...)：READ COMMITTED 下該子查詢使用語句開始時的 snapshot，兩個交易同時更新
+# 同一供應單的不同項目時，後者等到供應單的列鎖後仍會以舊的加總覆蓋前者；
+# remaining_count + 差額則會在取得列鎖後以最新的資料列重新計算。
+SUPPLY_REMAINING_DDL = """
+CREATE OR REPLACE FUNCTION gf_supply_item_remaining(total_number integer, received_count integer) RETURNS integer
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT greatest(coalesce(total_number, 0) - coalesce(received_count, 0), 0)
+$$;
+
+CREATE OR REPLACE FUNCTION gf_supply_items_remaining_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    old_remaining integer := 0;
+    new_remaining integer := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_remaining := gf_supply_item_remaining(OLD.total_number, OLD.received_count);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_remaining := gf_supply_item_remaining(NEW.total_number, NEW.received_count);
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND NEW.supply_id IS NOT DISTINCT FROM OLD.supply_id THEN
+        IF new_remaining <> old_remaining THEN
+            UPDATE supplies SET remaining_count = remaining_count + new_remaining - old_remaining
+            WHERE id = NEW.supply_id;
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND old_remaining <> 0 THEN
+        UPDATE supplies SET remaining_count = remaining_count - old_remaining WHERE id = OLD.supply_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND new_remaining <> 0 THEN
+        UPDATE supplies SET remaining_count = remaining_count + new_remaining WHERE id = NEW.supply_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP FUNCTION IF EXISTS gf_refresh_supply_remaining(varchar);
+
+DROP TRIGGER IF EXISTS supply_items_remaining ON supply_items;
+CREATE TRIGGER supply_items_remaining
+    AFTER INSERT OR DELETE OR UPDATE OF supply_id, total_number, received_count ON supply_items
+    FOR EACH ROW EXECUTE FUNCTION gf_supply_items_remaining_trigger();
+"""
+event.listen(SupplyItem.__table__, "after_create", DDL(SUPPLY_REMAINING_DDL))
+
+
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = list_indexes("reports", "status")
     id = Column(String, primary_key=True, default=generate_uuid_str)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
@@ -278,6 +440,7 @@ class Report(Base):
 
 class SupplyProvider(Base):
     __tablename__ = "supply_providers"
+    __table_args__ = list_indexes("supply_providers", "supply_item_id")
     id = Column(String, primary_key=True, default=generate_uuid_str)
     name = Column(String, nullable=False)
     phone = Column(String, nullable=False)
@@ -308,6 +471,9 @@ class LineUser(Base):
     refresh_token = Column(Text)
     id_token = Column(Text)
     token_expires_at = Column(DateTime)
+    # token 的 SHA-256（hex），供 verify_user_token 以索引查詢；與 token 一起寫入（line_auth.set_user_tokens）
+    access_token_hash = Column(String(64), index=True)
+    id_token_hash = Column(String(64), index=True)
 
     # 管理欄位
     channel_id = Column(String)
@@ -329,11 +495,16 @@ class LineSessionState(Base):
 
 class Place(Base):
     __tablename__ = "places"
+    __table_args__ = (geo_point_index("places"), search_index("places"), *list_indexes("places", "status", "type"))
     id = Column(String, primary_key=True, default=generate_uuid_str)
     name = Column(String, nullable=False)
     address = Column(String, nullable=False, server_default="")
     address_description = Column(String, server_default="")
+    search_vector = search_column("name", "address")
     coordinates = Column(JSONB, nullable=False)
+    # GeoJSON：Point 取該點，Polygon / LineString 取第一個頂點
+    geo_lat = geo_column("{coordinates,1}", "{coordinates,0,1}")
+    geo_lng = geo_column("{coordinates,0}", "{coordinates,0,0}")
     type = Column(String, nullable=False)
     sub_type = Column(String, server_default="")
     info_sources = Column(ARRAY(Text), nullable=True)
@@ -354,6 +525,7 @@ class Place(Base):
 
 class RequirementsHr(Base):
     __tablename__ = "requirements_hr"
+    __table_args__ = list_indexes("requirements_hr", "place_id")
     id = Column(String, primary_key=True, default=generate_uuid_str)
     place_id = Column(String, ForeignKey("places.id"), nullable=False)
     required_type = Column(String, nullable=False)
@@ -367,6 +539,7 @@ class RequirementsHr(Base):
 
 class RequirementsSupplies(Base):
     __tablename__ = "requirements_supplies"
+    __table_args__ = list_indexes("requirements_supplies", "place_id")
     id = Column(String, primary_key=True, default=generate_uuid_str)
     place_id = Column(String, ForeignKey("places.id"), nullable=False)
     required_type = Column(String, nullable=False)
@@ -376,3 +549,89 @@ class RequirementsSupplies(Base):
     received_count = Column(Integer, nullable=False, server_default="0")
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now())
+
+
+# ===================================================================
+# 異動紀錄（GET /changes）
+# ===================================================================
+
+class ChangeLog(Base):
+    """
+    資源的新增 / 修改 / 刪除紀錄，由各資料表的 trigger（CHANGE_LOG_DDL）寫入，程式不直接寫入。
+    txid 為寫入的交易編號；/changes 依 (txid, id) 排序，只回傳已結束的交易，不會因 commit 順序與 id 順序不同而漏掉紀錄。
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_txid_id", "txid", "id"),
+        Index("ix_change_log_resource_txid_id", "resource", "txid", "id"),
+    )
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    resource = Column(String, nullable=False)
+    resource_id = Column(String, nullable=False)
+    action = Column(String, nullable=False)  # insert / update / delete
+    txid = Column(BigInteger, nullable=False, server_default=text("txid_current()"))
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
+
+
+# 記錄異動的資料表（/changes?resource= 可用的值）
+CHANGE_LOG_TABLES = (
+    "accommodations",
+    "human_resources",
+    "medical_stations",
+    "mental_health_resources",
+    "places",
+    "reports",
+    "requirements_hr",
+    "requirements_supplies",
+    "restrooms",
+    "shelters",
+    "shower_stations",
+    "supplies",
+    "supply_items",
+    "supply_providers",
+    "volunteer_organizations",
+    "water_refill_stations",
+)
+
+# 所有寫入路徑（API、批次更新、ETL 腳本、supply_items 的 remaining_count trigger）都會留下紀錄，
+# 並以 NOTIFY 通知 /events；migration 中有相同的定義。
+CHANGE_LOG_DDL = """
+CREATE OR REPLACE FUNCTION gf_change_log_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    row_id varchar;
+    public_id varchar;
+    change_id bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+    ELSE
+        row_id := NEW.id;
+    END IF;
+    INSERT INTO change_log (resource, resource_id, action)
+        VALUES (TG_TABLE_NAME, row_id, lower(TG_OP)) RETURNING id INTO change_id;
+    -- 推播給 /events（src/events.py）；與人力需求列表相同，已完成的需求不公開 id
+    public_id := row_id;
+    IF TG_TABLE_NAME = 'human_resources' AND TG_OP <> 'DELETE' THEN
+        IF NEW.status = 'completed' THEN
+            public_id := '';
+        END IF;
+    END IF;
+    -- xmin、changed_at：SSE 的 id（/changes 的 since），txid 小於 xmin 的交易在此之前都已結束、已推播
+    PERFORM pg_notify('gf_changes', json_build_object(
+        'version', change_id, 'resource', TG_TABLE_NAME, 'id', public_id, 'action', lower(TG_OP),
+        'xmin', txid_snapshot_xmin(txid_current_snapshot()), 'changed_at', now()
+    )::text);
+    RETURN NULL;
+END
+$$;
+""" + "".join(
+    f"""
+DROP TRIGGER IF EXISTS {table}_change_log ON {table};
+CREATE TRIGGER {table}_change_log
+    AFTER INSERT OR UPDATE OR DELETE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION gf_change_log_trigger();
+"""
+    for table in CHANGE_LOG_TABLES
+)
+event.listen(Base.metadata, "after_create", DDL(CHANGE_LOG_DDL))
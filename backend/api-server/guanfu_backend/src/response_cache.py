@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+import redis
+import redis.asyncio as redis_asyncio
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .cache import TTLCache
+from .config import settings
+from .database import READ_PRIMARY_COOKIE, read_from_primary
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 快取的公開列表路徑 -> 影響該回應內容的資料表
+CACHED_LIST_PATHS: Dict[str, Tuple[str, ...]] = {
+    f"/{table}": (table,)
+    for table in (
+        "accommodations",
+        "human_resources",
+        "medical_stations",
+        "mental_health_resources",
+        "places",
+        "reports",
+        "requirements_hr",
+        "requirements_supplies",
+        "restrooms",
+        "shelters",
+        "shower_stations",
+        "supply_items",
+        "supply_providers",
+        "volunteer_organizations",
+        "water_refill_stations",
+    )
+}
+CACHED_LIST_PATHS["/supplies"] = ("supplies", "supply_items")  # 供應單回應內含物資項目
+CACHED_LIST_PATHS["/supply_items"] = ("supply_items", "supplies")  # embed=all 時內含所屬供應單
+
+_memory = TTLCache(maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+# 每張資料表的版本號；寫入時遞增，快取 key 含版本號，舊資料自然不再命中
+_local_versions: Dict[str, int] = {}
+
+# 有設定 REDIS_URL 時：版本號存在 Redis（跨 worker / 跨機器同步失效），回應也存一份在 Redis
+_redis = redis.Redis.from_url(settings.REDIS_URL) if settings.REDIS_URL else None
+_redis_async = redis_asyncio.Redis.from_url(settings.REDIS_URL) if settings.REDIS_URL else None
+
+# async 路由中排程的 Redis 版本遞增（保留參照，避免 task 被回收）
+_pending_bumps: Set[asyncio.Task] = set()
+
+_VERSION_KEY = "gf:rc:ver:{}"
+_BODY_KEY = "gf:rc:body:{}"
+# 隨快取內容一起保存的回應標頭（含 ETag / Last-Modified，命中時仍可回 304）
+_STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control")
+
+
+def invalidate(*tables: str) -> None:
+    """寫入資料後呼叫，讓與這些資料表相關的列表快取失效"""
+    for table in tables:
+        _local_versions[table] = _local_versions.get(table, 0) + 1
+    if _redis is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is None:
+        # 同步路由（threadpool）或腳本：直接以同步 client 遞增
+        _bump_versions(tables)
+    else:
+        # 在 async 路由中被呼叫：改用 redis.asyncio，不阻塞 event loop
+        task = loop.create_task(_bump_versions_async(tables))
+        _pending_bumps.add(task)
+        task.add_done_callback(_pending_bumps.discard)
+
+
+def _bump_versions(tables: Tuple[str, ...]) -> None:
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        for table in tables:
+            pipe.incr(_VERSION_KEY.format(table))
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("response cache: failed to bump versions in Redis for %s", tables, exc_info=True)
+
+
+async def _bump_versions_async(tables: Tuple[str, ...]) -> None:
+    try:
+        pipe = _redis_async.pipeline(transaction=False)
+        for table in tables:
+            pipe.incr(_VERSION_KEY.format(table))
+        await pipe.execute()
+    except redis.RedisError:
+        logger.warning("response cache: failed to bump versions in Redis for %s", tables, exc_info=True)
+
+
+async def _get_versions(tables: Tuple[str, ...]) -> Optional[Tuple[int, ...]]:
+    if _redis_async is None:
+        return tuple(_local_versions.get(t, 0) for t in tables)
+    try:
+        values = await _redis_async.mget([_VERSION_KEY.format(t) for t in tables])
+    except redis.RedisError:
+        # 無法確認版本時不使用快取，避免回傳其他 worker 已失效的資料
+        logger.warning("response cache: failed to read versions from Redis", exc_info=True)
+        return None
+    return tuple(int(v or 0) for v in values)
+
+
+def _cache_key(request: Request, versions: Tuple[int, ...]) -> str:
+    query = urlencode(sorted(request.query_params.multi_items()))
+    raw = f"{request.url.path}?{query}|{versions}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+async def _redis_get(key: str) -> Optional[Tuple[Dict[str, str], bytes]]:
+    try:
+        raw = await _redis_async.get(_BODY_KEY.format(key))
+    except redis.RedisError:
+        logger.warning("response cache: Redis get failed", exc_info=True)
+        return None
+    if raw is None:
+        return None
+    headers, _, body = raw.partition(b"\n")
+    return json.loads(headers), body
+
+
+async def _redis_set(key: str, headers: Dict[str, str], body: bytes) -> None:
+    try:
+        await _redis_async.set(
+            _BODY_KEY.format(key),
+            json.dumps(headers).encode("utf-8") + b"\n" + body,
+            ex=settings.RESPONSE_CACHE_TTL_SECONDS,
+        )
+    except redis.RedisError:
+        logger.warning("response cache: Redis set failed", exc_info=True)
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """If-None-Match 是否包含 etag（忽略 W/ 弱比對前綴）"""
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    return header.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+def enabled() -> bool:
+    """沒有 Redis 時版本號只存在各 worker 的記憶體，多個 worker 時其他 worker 的寫入無法讓快取失效，因此不啟用"""
+    return settings.RESPONSE_CACHE_ENABLED and (bool(settings.REDIS_URL) or settings.single_worker)
+
+
+def _record(result: str) -> None:
+    metrics.inc("response_cache_requests_total", result=result)
+
+
+async def handle(request: Request, call_next) -> Response:
+    """
+    公開列表的回應快取（在 main.py 註冊為 http middleware）：
+    - key 為 路徑 + 排序後的查詢參數 + 相關資料表版本號
+    - 先查記憶體（LRU + TTL），再查 Redis；皆未命中才執行路由並回寫
+    - 帶有 read-after-write sticky cookie 的 client 一律略過快取
+    - 未命中時路由改讀主庫：版本號在寫入 commit 後才遞增，replica 可能尚未同步，不能把舊資料存在新版本號下
+    回應加上 X-Cache: HIT / MISS / BYPASS；命中且 If-None-Match 符合時回 304。
+    """
+    tables = CACHED_LIST_PATHS.get(request.url.path)
+    if not enabled() or request.method != "GET" or tables is None:
+        return await call_next(request)
+
+    versions = None if READ_PRIMARY_COOKIE in request.cookies else await _get_versions(tables)
+    if versions is None:
+        _record("bypass")
+        response = await call_next(request)
+        response.headers["X-Cache"] = "BYPASS"
+        return response
+
+    key = _cache_key(request, versions)
+    entry = _memory.get(key)
+    if entry is not None:
+        _record("hit_memory")
+    elif _redis_async is not None:
+        entry = await _redis_get(key)
+        if entry is not None:
+            _record("hit_redis")
+            _memory.set(key, entry)
+    if entry is not None:
+        headers, body = entry
+        if etag_matches(request, headers.get("etag")):
+            return Response(status_code=304, headers={**headers, "X-Cache": "HIT"})
+        return Response(content=body, headers={**headers, "X-Cache": "HIT"})
+
+    _record("miss")
+    read_from_primary(request)
+    response = await call_next(request)
+    if response.status_code != 200:
+        response.headers["X-Cache"] = "MISS"
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    stored_headers = {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers}
+    _memory.set(key, (stored_headers, body))
+    if _redis_async is not None:
+        await _redis_set(key, stored_headers, body)
+    headers = dict(response.headers)
+    headers["X-Cache"] = "MISS"
+    return Response(content=body, status_code=response.status_code, headers=headers)
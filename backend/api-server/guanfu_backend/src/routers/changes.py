@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from .. import crud, schemas
+from ..database import get_read_db
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["異動紀錄（Changes）"],
+)
+
+
+@router.get("", response_model=schemas.ChangeFeed, summary="取得資源異動紀錄")
+def list_changes(
+        since: Optional[str] = Query(
+            None, description="上次回應的 next_since；未帶入時從保留中最舊的紀錄開始，latest 表示從現在開始"
+        ),
+        resource: Optional[str] = Query(
+            None, description="只取指定資源類型的異動（逗號分隔），例如 human_resources,supplies"
+        ),
+        limit: int = Query(500, ge=1, le=1000),
+        db: Session = Depends(get_read_db)
+):
+    """
+    取得 since 之後各資源的新增 / 修改 / 刪除紀錄（依發生順序），供同步用戶端只抓取差異：
+
+    1. 以 since=latest 取得目前位置，再以 /{resource}/export 取得完整資料
+    2. 之後定期以 next_since 取得異動，依 action 重新抓取（insert / update）或移除（delete）該筆資料；has_more 為 true 時立即再取一次
+
+    同一筆資料可能出現多次；進度落後超過保留天數（CHANGE_LOG_RETENTION_DAYS）時回傳 410，需回到步驟 1 重新同步。
+    """
+    resources = crud.parse_change_resources(resource)
+
+    if since == "latest":
+        position = crud.latest_change_position(db)
+        return {"member": [], "next_since": crud.encode_change_position(position), "has_more": False}
+
+    position = crud.decode_change_position(since) if since else None
+    if position is not None and crud.is_change_position_pruned(db, position):
+        raise HTTPException(
+            status_code=410,
+            detail={
+                "message": "異動紀錄已超過保留期限，請以 /{resource}/export 重新同步",
+                "latest": crud.encode_change_position(crud.latest_change_position(db)),
+            },
+        )
+
+    # 先取得目前位置再查詢：沒有新紀錄時 next_since 前進到這個位置（兩者之間確定沒有符合條件的紀錄），
+    # 沒有異動或以 resource= 篩選的用戶端，since 的時間才不會停在舊紀錄而在超過保留期限後誤收 410
+    latest = crud.latest_change_position(db)
+    changes = crud.get_changes(db, position, limit, resources)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    masked = crud.completed_human_resource_ids(db, changes)
+    if changes:
+        position = crud.change_position(changes[-1])
+    elif position is None or latest[:2] > position[:2]:
+        position = latest
+    return {
+        "member": [
+            {
+                "version": change.id,
+                "resource": change.resource,
+                "id": crud.public_change_id(change, masked),
+                "action": change.action,
+                "changed_at": int(change.changed_at.timestamp()),
+            }
+            for change in changes
+        ],
+        "next_since": crud.encode_change_position(position),
+        "has_more": has_more,
+    }
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from .. import crud, events
+
+router = APIRouter(
+    prefix="/events",
+    tags=["異動紀錄（Changes）"],
+)
+
+
+@router.get("", summary="訂閱資源異動（Server-Sent Events）", response_class=StreamingResponse)
+async def stream_events(
+        resource: Optional[str] = Query(
+            None, description="只接收指定資源類型的異動（逗號分隔），例如 places,supplies,human_resources；未帶入時接收全部"
+        ),
+        last_event_id: Optional[str] = Header(
+            None, alias="Last-Event-ID", description="最後收到的訊息 id；瀏覽器的 EventSource 重新連線時自動帶入"
+        ),
+):
+    """
+    以 Server-Sent Events 即時推送資源的新增 / 修改 / 刪除：
+    每則訊息的 data 為 {"version", "resource", "id", "action"}，格式同 /changes 的 member（不含 changed_at）。
+
+    - 訊息的 id 可作為 /changes 的 since，從 SSE 改用 /changes 時不需重新同步
+    - 帶入 Last-Event-ID（EventSource 重新連線時自動帶入）時先補送該 id 之後的異動；同一筆異動可能重複收到
+    - 收到 event: resync（無法補送、用戶端讀取太慢或伺服器重新連線資料庫）時連線會結束，
+      請以 /changes?since=<最後收到的 id> 補上後重新連線
+    - 每 EVENTS_HEARTBEAT_SECONDS 秒送出一行註解維持連線
+    """
+    resources = crud.parse_change_resources(resource)
+    subscription = events.hub.subscribe(resources)
+    replayed = b""
+    if last_event_id:
+        try:
+            # 先開始接收推播再查詢，補送與推播之間不會有空隙
+            listening = await events.hub.wait_listening(timeout=5)
+            chunk = await run_in_threadpool(events.replay, last_event_id, resources) if listening else None
+        except BaseException:
+            events.hub.unsubscribe(subscription)
+            raise
+        if chunk is None:
+            events.hub.unsubscribe(subscription)
+            subscription.close_with_resync()
+        else:
+            replayed = chunk
+    return StreamingResponse(
+        events.stream(subscription, replayed),
+        media_type="text/event-stream",
+        # X-Accel-Buffering：避免 nginx 緩衝整個回應
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
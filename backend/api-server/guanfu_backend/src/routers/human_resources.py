@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
-from sqlalchemy import or_
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import Optional, Literal
-import asyncio
+from typing import Any, Dict, List, Literal, Optional
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import bulk, crud, crud_async, export, models, schemas, search, serializers
+from ..crud_async import AsyncDB
+from ..database import get_db, get_async_read_db
 from ..enum_serializer import (
+    CountModeEnum,
     HumanResourceRoleStatusEnum,
     HumanResourceRoleTypeEnum,
     HumanResourceStatusEnum,
@@ -25,24 +27,48 @@ router = APIRouter(
 @router.get(
     "", response_model=schemas.HumanResourceCollection, summary="取得人力需求清單"
 )
-def list_human_resources(
+async def list_human_resources(
     request: Request,
+    response: Response,
     status: Optional[HumanResourceStatusEnum] = Query(None),
-    q_role: Optional[str] = Query(None),
+    q_role: Optional[str] = Query(
+        None, description="關鍵字搜尋職務名稱、類型與備註；逗號分隔多個關鍵字，任一符合即可"
+    ),
     role_status: Optional[HumanResourceRoleStatusEnum] = Query(None),
     role_type: Optional[HumanResourceRoleTypeEnum] = Query(None),
+    updated_since: Optional[datetime] = Query(
+        None,
+        description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取",
+    ),
     limit: int = Query(20, ge=1, le=200),
     offset: int = Query(0, ge=0),
     order_by_time: Optional[Literal["asc", "desc"]] = Query(
         None, description="時間排序方式：asc 或 desc"
     ),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"
+    ),
+    count_mode: Optional[CountModeEnum] = Query(
+        None,
+        description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate",
+    ),
+    fields: Optional[str] = Query(
+        None, description="只回傳指定欄位（逗號分隔），例如 id,org,role_name,status"
+    ),
+    db: AsyncDB = Depends(get_async_read_db),
 ):
     """
     取得人力需求清單 (分頁)
 
     - order_by: 指定時間排序方式，可選 "asc" (由舊到新) 或 "desc" (由新到舊)
+    - q_role: 關鍵字搜尋 (role_name / role_type / assignment_notes)；未指定 order_by_time 時依相關度由高到低排序
+    - cursor: 帶入時改用游標分頁（依 created_at、id 排序，方向同 order_by_time，預設由新到舊），忽略 offset
+    - fields: 只查詢、回傳指定欄位
     """
+    selected = serializers.parse_fields(schemas.HumanResource, fields)
+    # status 用於遮罩已完成需求的 id，created_at 用於游標分頁
+    columns = crud.projected_columns(models.HumanResource, selected, "id", "status", "created_at")
+    options = crud.load_only_columns(models.HumanResource, columns)
     filters = {
         "status": status,
         "role_status": role_status,
@@ -50,41 +76,102 @@ def list_human_resources(
     }
 
     normalized_filters = crud.normalize_filters_dict(filters)
-    query = db.query(models.HumanResource)
+    query = select(models.HumanResource).filter(*crud.updated_since_criteria(models.HumanResource, updated_since))
     if normalized_filters:
         query = query.filter_by(**normalized_filters)
 
-    if q_role:
-        keywords = [kw.strip() for kw in q_role.split(",") if kw.strip()]
-        if keywords:
-            keyword_clauses = []
-            for kw in keywords:
-                pattern = f"%{kw}%"
-                keyword_clauses.append(
-                    or_(
-                        models.HumanResource.assignment_notes.ilike(pattern),
-                        models.HumanResource.role_name.ilike(pattern),
-                        models.HumanResource.role_type.ilike(pattern),
-                    )
-                )
-            query = query.filter(or_(*keyword_clauses))
-
-    if order_by_time == "asc":
-        query = query.order_by(models.HumanResource.created_at.asc())
-    elif order_by_time == "desc":
-        query = query.order_by(models.HumanResource.created_at.desc())
-
-    total = query.count()
-    resources = query.offset(offset).limit(limit).all()
-    resources = crud.mask_id_if_field_equals(resources, "status", "completed")
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {
-        "member": resources,
-        "totalItems": total,
-        "limit": limit,
-        "offset": offset,
-        "next": next_link,
-    }
+    keywords = search.from_query(q_role)
+    rank = None
+    if keywords is not None:
+        query = query.filter(*keywords.criteria(models.HumanResource))
+        rank = keywords.rank(models.HumanResource)
+
+    await crud_async.check_collection_not_modified(request, response, db, models.HumanResource)
+    count_key = {**normalized_filters, **crud.updated_since_cache_key(updated_since)}
+    if keywords is not None:
+        count_key.update(keywords.cache_key())
+    total = await crud_async.count_query(
+        db, query, models.HumanResource, count_mode=crud.page_count_mode(count_mode, cursor), cache_key=count_key
+    )
+    if cursor is None:
+        if order_by_time == "asc":
+            query = query.order_by(models.HumanResource.created_at.asc())
+        elif order_by_time == "desc":
+            query = query.order_by(models.HumanResource.created_at.desc())
+        elif rank is not None:
+            query = query.order_by(rank.desc())
+        resources = (await db.scalars(query.options(*options).offset(offset).limit(limit))).all()
+        next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
+    else:
+        sort_column = models.HumanResource.created_at
+        query = crud.apply_cursor(
+            query,
+            models.HumanResource,
+            cursor=cursor,
+            limit=limit,
+            sort_column=sort_column,
+            descending=order_by_time != "asc",
+        )
+        resources, next_cursor = crud.cursor_page(
+            (await db.scalars(query.options(*options))).all(), limit=limit, sort_column=sort_column
+        )
+        next_link = crud.build_cursor_link(request, limit=limit, cursor=next_cursor)
+    resources = crud.mask_id_if_field_equals(resources, "status", "completed", keys=columns)
+    return serializers.fast_response(
+        schemas.HumanResourceCollection,
+        {
+            "member": resources,
+            "totalItems": total,
+            "limit": limit,
+            "offset": offset,
+            "next": next_link,
+        },
+        response,
+        selected,
+    )
+
+
+def _check_create(db: Session, resource_in: schemas.HumanResourceCreate) -> None:
+    """建立前的檢核（單筆與批次共用）"""
+    if resource_in.headcount_got > resource_in.headcount_need:
+        raise HTTPException(
+            status_code=400,
+            detail="headcount_got must be less than or equal to headcount_need.",
+        )
+
+
+def _check_patch(db: Session, resource_in: schemas.HumanResourcePatch, db_resource: models.HumanResource) -> None:
+    """更新前的檢核（單筆與批次共用）"""
+    # if db_resource.valid_pin and db_resource.valid_pin != resource_in.valid_pin:
+    #     raise HTTPException(status_code=400, detail="The PIN you entered is incorrect.")
+    if db_resource.status == HumanResourceRoleStatusEnum.completed.value:
+        raise HTTPException(status_code=400, detail="Completed data cannot be edited.")
+
+    # 人數供給>需求防呆
+    if resource_in.headcount_need is not None or resource_in.headcount_got is not None:
+        if (
+            resource_in.headcount_need == resource_in.headcount_got
+            and resource_in.status == HumanResourceRoleStatusEnum.completed.value
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail="headcount_need and headcount_got are locked because their values are equal; updates are not allowed.",
+            )
+        headcount_need = (
+            resource_in.headcount_need
+            if resource_in.headcount_need is not None
+            else db_resource.headcount_need
+        )
+        headcount_got = (
+            resource_in.headcount_got
+            if resource_in.headcount_got is not None
+            else db_resource.headcount_got
+        )
+        if headcount_got > headcount_need:
+            raise HTTPException(
+                status_code=400,
+                detail="headcount_got must be less than or equal to headcount_need.",
+            )
 
 
 @router.post(
@@ -99,34 +186,106 @@ async def create_human_resource(
     """
     建立人力需求/角色
     """
-    if resource_in.headcount_got > resource_in.headcount_need:
-        raise HTTPException(
-            status_code=400,
-            detail="headcount_got must be less than or equal to headcount_need.",
-        )
+    _check_create(db, resource_in)
 
     created_resource = crud.create_with_input(
         db, models.HumanResource, obj_in=resource_in, valid_pin=generate_pin()
     )
 
-    # Send notification to Discord in the background
+    # Send notification to Discord in the background (queued, see DiscordDispatcher)
     message_content = "新的志工人力需求已建立 ✨"
     embed_data = resource_in.model_dump(mode="json")
-    asyncio.create_task(
-        send_discord_message(content=message_content, embed_data=embed_data)
-    )
+    send_discord_message(content=message_content, embed_data=embed_data)
 
     return created_resource
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立人力需求",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_human_resources(
+    items: List[Dict[str, Any]] = Body(...),
+    db: Session = Depends(get_db),
+):
+    """
+    批次建立人力需求/角色：每筆格式同 POST /human_resources，單筆失敗不影響其他筆，各筆結果見 results
+    （data 含各筆的 valid_pin）；Discord 只發一則彙總通知
+    """
+    result, created = bulk.create_many(
+        db,
+        models.HumanResource,
+        items,
+        schemas.HumanResourceCreate,
+        schemas.HumanResourceWithPin,
+        validate=_check_create,
+        extra=lambda: {"valid_pin": generate_pin()},
+    )
+    if created:
+        send_discord_message(content=f"批次建立了 {len(created)} 筆志工人力需求 ✨")
+    return result
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新人力需求",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_human_resources(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新人力需求/角色：每筆為 {"id": ..., 其餘欄位同 PATCH /human_resources/{id}}
+    """
+    return bulk.patch_many(
+        db, models.HumanResource, items, schemas.HumanResourcePatch, schemas.HumanResource, validate=_check_patch
+    )[0]
+
+
+def _mask_completed(row: models.HumanResource) -> dict:
+    """與列表相同：已完成的需求不公開 id"""
+    return crud.mask_id_if_field_equals([row], "status", "completed")[0]
+
+
+@router.get("/export", summary="匯出人力需求（NDJSON / CSV）")
+def export_human_resources(
+    request: Request,
+    fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+    updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+    status: Optional[HumanResourceStatusEnum] = Query(None),
+    q_role: Optional[str] = Query(
+        None, description="關鍵字搜尋職務名稱、類型與備註；逗號分隔多個關鍵字，任一符合即可"
+    ),
+    role_status: Optional[HumanResourceRoleStatusEnum] = Query(None),
+    role_type: Optional[HumanResourceRoleTypeEnum] = Query(None),
+):
+    """
+    以串流匯出所有符合條件的人力需求（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.HumanResource,
+        schemas.HumanResource,
+        fmt,
+        updated_since,
+        search=search.from_query(q_role),
+        transform=_mask_completed,
+        status=status,
+        role_status=role_status,
+        role_type=role_type,
+    )
+
+
 @router.get("/{id}", response_model=schemas.HumanResource, summary="取得特定人力需求")
-def get_human_resource(id: str, db: Session = Depends(get_db)):
+async def get_human_resource(id: str, request: Request, response: Response, db: AsyncDB = Depends(get_async_read_db)):
     """
     取得單一人力需求/角色
     """
-    db_resource = crud.get_by_id(db, models.HumanResource, id)
+    db_resource = await crud_async.get_by_id(db, models.HumanResource, id)
     if db_resource is None:
         raise HTTPException(status_code=404, detail="Human Resource not found")
+    crud.check_not_modified(request, response, db_resource)
     return db_resource
 
 
@@ -145,34 +304,5 @@ def patch_human_resource(
     db_resource = crud.get_by_id(db, models.HumanResource, id)
     if db_resource is None:
         raise HTTPException(status_code=404, detail="Human Resource not found")
-    # if db_resource.valid_pin and db_resource.valid_pin != resource_in.valid_pin:
-    #     raise HTTPException(status_code=400, detail="The PIN you entered is incorrect.")
-    if db_resource.status == HumanResourceRoleStatusEnum.completed.value:
-        raise HTTPException(status_code=400, detail="Completed data cannot be edited.")
-
-    # 人數供給>需求防呆
-    if resource_in.headcount_need is not None or resource_in.headcount_got is not None:
-        if (
-            resource_in.headcount_need == resource_in.headcount_got
-            and resource_in.status == HumanResourceRoleStatusEnum.completed.value
-        ):
-            raise HTTPException(
-                status_code=400,
-                detail="headcount_need and headcount_got are locked because their values are equal; updates are not allowed.",
-            )
-        headcount_need = (
-            resource_in.headcount_need
-            if resource_in.headcount_need is not None
-            else db_resource.headcount_need
-        )
-        headcount_got = (
-            resource_in.headcount_got
-            if resource_in.headcount_got is not None
-            else db_resource.headcount_got
-        )
-        if headcount_got > headcount_need:
-            raise HTTPException(
-                status_code=400,
-                detail="headcount_got must be less than or equal to headcount_need.",
-            )
+    _check_patch(db, resource_in, db_resource)
     return crud.update(db, db_obj=db_resource, obj_in=resource_in)
@@ -4,27 +4,26 @@ from fastapi.responses import RedirectResponse, JSONResponse
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..schemas import LineTokenResponse, LineUserInfoResponse
+from ..schemas import LineTokenResponse
 from ..services.line_auth import (
     build_authorize_url,
     exchange_token_authorization_code,
     exchange_token_refresh,
     revoke_token,
-    userinfo_from_id_token,
 )
 
 router = APIRouter(prefix="/line", tags=["OAuth2 (LINE)"], include_in_schema=False)
 
 
 @router.get("/authorize", summary="取得LINE 授權入口")
-def authorize(
+async def authorize(
         redirect_uri: str = Query(..., description="LINE OAuth 回呼 URL"),
         prompt: Optional[str] = Query(default=None),
         response_mode: Optional[str] = Query(default=None),
         disable_auto_login: Optional[bool] = Query(default=None),
         db: Session = Depends(get_db),
 ):
-    url = build_authorize_url(
+    url = await build_authorize_url(
         db,
         redirect_uri=redirect_uri,
         prompt=prompt,
@@ -66,6 +65,6 @@ async def token(
 
 
 @router.post("/revoke", summary="撤銷token")
-async def revoke(access_token: str = Form(...)):
-    ok = await revoke_token(access_token)
+async def revoke(access_token: str = Form(...), db: Session = Depends(get_db)):
+    ok = await revoke_token(db, access_token)
     return {"revoked": ok}
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional
-from .. import crud, models, schemas
-from ..database import get_db
+from typing import Any, Dict, List, Optional
+from .. import bulk, crud, export, geo, models, schemas, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
-from ..enum_serializer import MedicalStationTypeEnum, MedicalStationStatusEnum
+from ..enum_serializer import CountModeEnum, MedicalStationTypeEnum, MedicalStationStatusEnum
 
 router = APIRouter(
     prefix="/medical_stations",
@@ -16,20 +17,29 @@ router = APIRouter(
 @router.get("", response_model=schemas.MedicalStationCollection, summary="取得醫療站清單")
 def list_medical_stations(
         request: Request,
+        response: Response,
         status: Optional[MedicalStationStatusEnum] = Query(None),
         station_type: Optional[MedicalStationTypeEnum] = Query(None),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得醫療站清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
+    帶入 bbox 或 near（+ radius）時只回傳該範圍內的資料；有 near 時依距離由近到遠排序。
     """
     filters = {"status": status, "station_type": station_type}
-    stations = crud.get_multi(db, models.MedicalStation, skip=offset, limit=limit, **filters)
-    total = crud.count(db, models.MedicalStation, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": stations, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    crud.check_collection_not_modified(request, response, db, models.MedicalStation)
+    stations, total, next_link = crud.list_page(
+        request, db, models.MedicalStation, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, sort_column=models.MedicalStation.updated_at, area=area, updated_since=updated_since, **filters
+    )
+    return serializers.fast_response(schemas.MedicalStationCollection, {"member": stations, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
 
 
 @router.post("", response_model=schemas.MedicalStation, status_code=201, summary="建立醫療站")
@@ -42,14 +52,65 @@ def create_medical_station(
     return crud.create(db, models.MedicalStation, obj_in=station_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立醫療站",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_medical_stations(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立醫療站：每筆格式同 POST /medical_stations，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(db, models.MedicalStation, items, schemas.MedicalStationCreate, schemas.MedicalStation)[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新醫療站",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_medical_stations(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新醫療站：每筆為 {"id": ..., 其餘欄位同 PATCH /medical_stations/{id}}
+    """
+    return bulk.patch_many(db, models.MedicalStation, items, schemas.MedicalStationPatch, schemas.MedicalStation)[0]
+
+
+@router.get("/export", summary="匯出醫療站（NDJSON / CSV）")
+def export_medical_stations(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        status: Optional[MedicalStationStatusEnum] = Query(None),
+        station_type: Optional[MedicalStationTypeEnum] = Query(None),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+):
+    """
+    以串流匯出所有符合條件的醫療站（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.MedicalStation,
+        schemas.MedicalStation,
+        fmt,
+        updated_since,
+        area=area,
+        status=status,
+        station_type=station_type,
+    )
+
+
 @router.get("/{id}", response_model=schemas.MedicalStation, summary="取得特定醫療站")
-def get_medical_station(id: str, db: Session = Depends(get_db)):
+def get_medical_station(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一醫療站
     """
     db_station = crud.get_by_id(db, models.MedicalStation, id)
     if db_station is None:
         raise HTTPException(status_code=404, detail="Medical Station not found")
+    crud.check_not_modified(request, response, db_station)
     return db_station
 
 
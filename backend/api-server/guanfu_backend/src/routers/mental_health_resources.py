@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional
-from .. import crud, models, schemas
-from ..database import get_db
+from typing import Any, Dict, List, Optional
+from .. import bulk, crud, export, geo, models, schemas, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
-from ..enum_serializer import MentalHealthDurationEnum, MentalHealthFormatEnum, MentalHealthResourceStatusEnum
+from ..enum_serializer import CountModeEnum, MentalHealthDurationEnum, MentalHealthFormatEnum, MentalHealthResourceStatusEnum
 
 router = APIRouter(
     prefix="/mental_health_resources",
@@ -16,25 +17,34 @@ router = APIRouter(
 @router.get("", response_model=schemas.MentalHealthResourceCollection, summary="取得心理健康資源清單")
 def list_mental_health_resources(
         request: Request,
+        response: Response,
         status: Optional[MentalHealthResourceStatusEnum] = Query(None),
         duration_type: Optional[MentalHealthDurationEnum] = Query(None),
         service_format: Optional[MentalHealthFormatEnum] = Query(None),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得心理健康資源清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
+    帶入 bbox 或 near（+ radius）時只回傳該範圍內的資料；有 near 時依距離由近到遠排序。
     """
     filters = {
         "status": status,
         "duration_type": duration_type,
         "service_format": service_format,
     }
-    resources = crud.get_multi(db, models.MentalHealthResource, skip=offset, limit=limit, **filters)
-    total = crud.count(db, models.MentalHealthResource, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": resources, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    crud.check_collection_not_modified(request, response, db, models.MentalHealthResource)
+    resources, total, next_link = crud.list_page(
+        request, db, models.MentalHealthResource, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, sort_column=models.MentalHealthResource.updated_at, area=area, updated_since=updated_since, **filters
+    )
+    return serializers.fast_response(schemas.MentalHealthResourceCollection, {"member": resources, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
 
 
 @router.post("", response_model=schemas.MentalHealthResource, status_code=201, summary="建立心理健康資源")
@@ -47,14 +57,67 @@ def create_mental_health_resource(
     return crud.create(db, models.MentalHealthResource, obj_in=resource_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立心理健康資源",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_mental_health_resources(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立心理健康資源：每筆格式同 POST /mental_health_resources，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(db, models.MentalHealthResource, items, schemas.MentalHealthResourceCreate, schemas.MentalHealthResource)[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新心理健康資源",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_mental_health_resources(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新心理健康資源：每筆為 {"id": ..., 其餘欄位同 PATCH /mental_health_resources/{id}}
+    """
+    return bulk.patch_many(db, models.MentalHealthResource, items, schemas.MentalHealthResourcePatch, schemas.MentalHealthResource)[0]
+
+
+@router.get("/export", summary="匯出心理健康資源（NDJSON / CSV）")
+def export_mental_health_resources(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        status: Optional[MentalHealthResourceStatusEnum] = Query(None),
+        duration_type: Optional[MentalHealthDurationEnum] = Query(None),
+        service_format: Optional[MentalHealthFormatEnum] = Query(None),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+):
+    """
+    以串流匯出所有符合條件的心理健康資源（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.MentalHealthResource,
+        schemas.MentalHealthResource,
+        fmt,
+        updated_since,
+        area=area,
+        status=status,
+        duration_type=duration_type,
+        service_format=service_format,
+    )
+
+
 @router.get("/{id}", response_model=schemas.MentalHealthResource, summary="取得特定心理健康資源")
-def get_mental_health_resource(id: str, db: Session = Depends(get_db)):
+def get_mental_health_resource(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一心理健康資源
     """
     db_resource = crud.get_by_id(db, models.MentalHealthResource, id)
     if db_resource is None:
         raise HTTPException(status_code=404, detail="Mental Health Resource not found")
+    crud.check_not_modified(request, response, db_resource)
     return db_resource
 
 
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Security
+from fastapi.responses import PlainTextResponse
+
+from ..api_key import require_modify_api_key
+from ..metrics import metrics
+
+router = APIRouter(tags=["監控（Metrics）"], include_in_schema=False)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Security(require_modify_api_key)])
+def get_metrics():
+    """
+    目前 worker process 的指標（Prometheus text format）
+
+    需要 API Key 權限（X-Api-Key 或 Authorization: Bearer，Prometheus 以 scrape 設定的 authorization 帶入）
+    """
+    return metrics.render()
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional
-from .. import crud, models, schemas
-from ..database import get_db
+from typing import Any, Dict, List, Optional
+from .. import bulk, crud, crud_async, export, geo, models, schemas, search, serializers, tiles
+from ..crud_async import AsyncDB
+from ..database import READ_PRIMARY_COOKIE, get_db, get_async_db, get_async_read_db
 from ..api_key import require_modify_api_key
+from ..enum_serializer import CountModeEnum
 from ..schemas import PlaceStatusEnum, PlaceTypeEnum
 
 router = APIRouter(
@@ -14,13 +17,20 @@ router = APIRouter(
 
 
 @router.get("", response_model=schemas.PlaceCollection, summary="取得場所清單")
-def list_places(
+async def list_places(
         request: Request,
+        response: Response,
         status: Optional[PlaceStatusEnum] = Query(None),
         type: Optional[PlaceTypeEnum] = Query(None),
+        q: Optional[str] = Query(None, description="關鍵字搜尋名稱、地址；逗號分隔多個關鍵字，任一符合即可"),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        fields: Optional[str] = Query(None, description="只回傳指定欄位（逗號分隔），例如 id,name,coordinates,type,status"),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+        db: AsyncDB = Depends(get_async_read_db)
 ):
     """
     取得場所清單 (分頁)
@@ -28,12 +38,55 @@ def list_places(
     支援過濾條件：
     - status: 場所狀態 (開放/暫停/關閉)
     - type: 場所類型 (醫療/加水/廁所/洗澡/避難/住宿/物資/心理援助)
+    - q: 關鍵字（名稱、地址），依相關度由高到低排序
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
+    帶入 fields 時只查詢、回傳這些欄位（例如地圖標記只需要 id,name,coordinates,type,status）。
+    帶入 bbox 或 near（+ radius）時只回傳該範圍內的資料；有 near 時依距離由近到遠排序。
     """
     filters = {"status": status, "type": type}
-    places = crud.get_multi(db, models.Place, skip=offset, limit=limit, order_by=models.Place.updated_at.desc(), **filters)
-    total = crud.count(db, models.Place, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": places, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    keywords = search.from_query(q)
+    selected = serializers.parse_fields(schemas.Place, fields)
+    options = crud.load_only_columns(models.Place, crud.projected_columns(models.Place, selected, "id", "updated_at"))
+    await crud_async.check_collection_not_modified(request, response, db, models.Place)
+    places, total, next_link = await crud_async.list_page(
+        request, db, models.Place, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, order_by=models.Place.updated_at.desc(), sort_column=models.Place.updated_at, options=options, area=area, search=keywords, updated_since=updated_since, **filters
+    )
+    return serializers.fast_response(schemas.PlaceCollection, {"member": places, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response, selected)
+
+
+@router.get(
+    "/tiles/{z}/{x}/{y}",
+    summary="取得場所地圖圖磚（GeoJSON 聚合點）",
+    responses={200: {"content": {tiles.MEDIA_TYPE: {}}, "description": "GeoJSON FeatureCollection"}},
+)
+async def get_place_tile(
+        z: int,
+        x: int,
+        y: int,
+        request: Request,
+        status: Optional[PlaceStatusEnum] = Query(None),
+        type: Optional[PlaceTypeEnum] = Query(None),
+        db: AsyncDB = Depends(get_async_db)
+):
+    """
+    取得 Web Mercator (XYZ) 圖磚 z/x/y 內的場所，回傳 GeoJSON FeatureCollection
+
+    圖磚切成格子，同一格內相同 type / status 的場所合併為一個點：
+    - properties.count: 該點代表的場所數量
+    - count 為 1 時另含 id、name
+    - 座標為該群場所的平均位置
+
+    支援過濾條件：status、type
+    """
+    if not tiles.is_valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail="Invalid tile")
+    # 從主資料庫查詢：快取在寫入後立即失效，若從 replica 查詢，下一次未命中可能把尚未同步的結果存進快取
+    # 剛寫入過的 client 直接查詢，不使用（也不回寫）圖磚快取
+    use_cache = READ_PRIMARY_COOKIE not in request.cookies
+    body, hit = await tiles.get_tile(db, z, x, y, use_cache=use_cache, status=status, type=type)
+    x_cache = "BYPASS" if not use_cache else "HIT" if hit else "MISS"
+    return Response(content=body, media_type=tiles.MEDIA_TYPE, headers={"X-Cache": x_cache})
 
 
 @router.post(
@@ -60,17 +113,83 @@ def create_place(
 
     需要 API Key 權限
     """
-    return crud.create(db, models.Place, obj_in=place_in)
+    db_place = crud.create(db, models.Place, obj_in=place_in)
+    tiles.invalidate_points((db_place.geo_lat, db_place.geo_lng))
+    return db_place
+
+
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立場所",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_places(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立場所：每筆格式同 POST /places，單筆失敗不影響其他筆，各筆結果見 results
+
+    需要 API Key 權限
+    """
+    result, created = bulk.create_many(db, models.Place, items, schemas.PlaceCreate, schemas.Place)
+    tiles.invalidate_points(*((place.geo_lat, place.geo_lng) for place in created))
+    return result
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新場所",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_places(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新場所：每筆為 {"id": ..., 其餘欄位同 PATCH /places/{id}}
+
+    需要 API Key 權限
+    """
+    result, changes = bulk.patch_many(db, models.Place, items, schemas.PlacePatch, schemas.Place)
+    tiles.invalidate_points(
+        *((old["geo_lat"], old["geo_lng"]) for old, _ in changes),
+        *((place.geo_lat, place.geo_lng) for _, place in changes),
+    )
+    return result
+
+
+@router.get("/export", summary="匯出場所（NDJSON / CSV）")
+def export_places(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        status: Optional[PlaceStatusEnum] = Query(None),
+        type: Optional[PlaceTypeEnum] = Query(None),
+        q: Optional[str] = Query(None, description="關鍵字搜尋名稱、地址；逗號分隔多個關鍵字，任一符合即可"),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+):
+    """
+    以串流匯出所有符合條件的場所（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.Place,
+        schemas.Place,
+        fmt,
+        updated_since,
+        area=area,
+        search=search.from_query(q),
+        status=status,
+        type=type,
+    )
 
 
 @router.get("/{id}", response_model=schemas.Place, summary="取得特定場所")
-def get_place(id: str, db: Session = Depends(get_db)):
+async def get_place(id: str, request: Request, response: Response, db: AsyncDB = Depends(get_async_read_db)):
     """
     取得單一場所詳細資訊
     """
-    db_place = crud.get_by_id(db, models.Place, id)
+    db_place = await crud_async.get_by_id(db, models.Place, id)
     if db_place is None:
         raise HTTPException(status_code=404, detail="Place not found")
+    crud.check_not_modified(request, response, db_place)
     return db_place
 
 
@@ -91,4 +210,8 @@ def patch_place(
     db_place = crud.get_by_id(db, models.Place, id)
     if db_place is None:
         raise HTTPException(status_code=404, detail="Place not found")
-    return crud.update(db, db_obj=db_place, obj_in=place_in)
+    old_point = (db_place.geo_lat, db_place.geo_lng)
+    db_place = crud.update(db, db_obj=db_place, obj_in=place_in)
+    # 座標、type、status 都可能改變：舊位置與新位置所在的圖磚都要失效
+    tiles.invalidate_points(old_point, (db_place.geo_lat, db_place.geo_lng))
+    return db_place
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional
-from .. import crud, models, schemas
-from ..database import get_db
+from typing import Any, Dict, List, Optional
+from .. import bulk, crud, export, models, schemas, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
+from ..enum_serializer import CountModeEnum
 
 router = APIRouter(
     prefix="/reports",
@@ -15,19 +17,26 @@ router = APIRouter(
 @router.get("", response_model=schemas.ReportCollection, summary="取得回報事件清單")
 def list_reports(
         request: Request,
+        response: Response,
         status: Optional[str] = Query(None),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得回報事件清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
     """
     filters = {"status": status}
-    reports = crud.get_multi(db, models.Report, skip=offset, limit=limit, **filters)
-    total = crud.count(db, models.Report, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": reports, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    crud.check_collection_not_modified(request, response, db, models.Report)
+    reports, total, next_link = crud.list_page(
+        request, db, models.Report, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, sort_column=models.Report.updated_at, updated_since=updated_since, **filters
+    )
+    return serializers.fast_response(schemas.ReportCollection, {"member": reports, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
 
 
 @router.post("", response_model=schemas.Report, status_code=201, summary="建立回報事件")
@@ -40,14 +49,54 @@ def create_report(
     return crud.create(db, models.Report, obj_in=report_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立回報事件",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_reports(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立回報事件：每筆格式同 POST /reports，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(db, models.Report, items, schemas.ReportCreate, schemas.Report)[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新回報事件",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_reports(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新回報事件：每筆為 {"id": ..., 其餘欄位同 PATCH /reports/{id}}
+    """
+    return bulk.patch_many(db, models.Report, items, schemas.ReportPatch, schemas.Report)[0]
+
+
+@router.get("/export", summary="匯出回報事件（NDJSON / CSV）")
+def export_reports(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        status: Optional[str] = Query(None),
+):
+    """
+    以串流匯出所有符合條件的回報事件（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(request, models.Report, schemas.Report, fmt, updated_since, status=status)
+
+
 @router.get("/{id}", response_model=schemas.Report, summary="取得特定回報事件")
-def get_report(id: str, db: Session = Depends(get_db)):
+def get_report(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一回報事件
     """
     db_report = crud.get_by_id(db, models.Report, id)
     if db_report is None:
         raise HTTPException(status_code=404, detail="Report not found")
+    crud.check_not_modified(request, response, db_report)
     return db_report
 
 
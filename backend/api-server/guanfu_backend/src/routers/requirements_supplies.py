@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional
-from .. import crud, models, schemas
-from ..database import get_db
+from typing import Any, Dict, List, Optional, Union
+from .. import bulk, crud, export, models, schemas, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
+from ..enum_serializer import CountModeEnum
 from ..schemas import RequirementsSuppliesTypeEnum
 
 router = APIRouter(
@@ -16,11 +18,15 @@ router = APIRouter(
 @router.get("", response_model=schemas.RequirementsSuppliesCollection, summary="取得物資需求清單")
 def list_requirements_supplies(
         request: Request,
+        response: Response,
         place_id: Optional[str] = Query(None, description="篩選特定場所的物資需求"),
         required_type: Optional[RequirementsSuppliesTypeEnum] = Query(None, description="篩選特定類型的物資需求"),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得物資需求清單 (分頁)
@@ -28,19 +34,25 @@ def list_requirements_supplies(
     支援過濾條件：
     - place_id: 場所 ID
     - required_type: 需求類型
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
     """
     filters = {"place_id": place_id, "required_type": required_type}
-    requirements = crud.get_multi(
-        db,
-        models.RequirementsSupplies,
-        skip=offset,
-        limit=limit,
-        order_by=models.RequirementsSupplies.updated_at.desc(),
-        **filters
+    crud.check_collection_not_modified(request, response, db, models.RequirementsSupplies)
+    requirements, total, next_link = crud.list_page(
+        request, db, models.RequirementsSupplies, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, order_by=models.RequirementsSupplies.updated_at.desc(), sort_column=models.RequirementsSupplies.updated_at, updated_since=updated_since, **filters
     )
-    total = crud.count(db, models.RequirementsSupplies, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": requirements, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    return serializers.fast_response(schemas.RequirementsSuppliesCollection, {"member": requirements, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
+
+
+def _check_place(
+        db: Session,
+        requirement_in: Union[schemas.RequirementsSuppliesCreate, schemas.RequirementsSuppliesPatch],
+        db_requirement: Optional[models.RequirementsSupplies] = None,
+) -> None:
+    """place_id 有帶入時須為存在的場所（建立 / 更新、單筆 / 批次共用）"""
+    if requirement_in.place_id is not None and not crud.get_by_id(db, models.Place, requirement_in.place_id):
+        raise HTTPException(status_code=404, detail=f"Place with id {requirement_in.place_id} not found")
 
 
 @router.post(
@@ -68,22 +80,75 @@ def create_requirement_supply(
 
     需要 API Key 權限
     """
-    # Verify that the place_id exists
-    place = crud.get_by_id(db, models.Place, requirement_in.place_id)
-    if not place:
-        raise HTTPException(status_code=404, detail=f"Place with id {requirement_in.place_id} not found")
-
+    _check_place(db, requirement_in)
     return crud.create(db, models.RequirementsSupplies, obj_in=requirement_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立物資需求",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_requirements_supplies(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立物資需求：每筆格式同 POST /requirements_supplies，單筆失敗不影響其他筆，各筆結果見 results
+
+    需要 API Key 權限
+    """
+    return bulk.create_many(
+        db, models.RequirementsSupplies, items, schemas.RequirementsSuppliesCreate, schemas.RequirementsSupplies, validate=_check_place
+    )[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新物資需求",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_requirements_supplies(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新物資需求：每筆為 {"id": ..., 其餘欄位同 PATCH /requirements_supplies/{id}}
+
+    需要 API Key 權限
+    """
+    return bulk.patch_many(
+        db, models.RequirementsSupplies, items, schemas.RequirementsSuppliesPatch, schemas.RequirementsSupplies, validate=_check_place
+    )[0]
+
+
+@router.get("/export", summary="匯出物資需求（NDJSON / CSV）")
+def export_requirements_supplies(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        place_id: Optional[str] = Query(None, description="篩選特定場所的物資需求"),
+        required_type: Optional[RequirementsSuppliesTypeEnum] = Query(None, description="篩選特定類型的物資需求"),
+):
+    """
+    以串流匯出所有符合條件的物資需求（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.RequirementsSupplies,
+        schemas.RequirementsSupplies,
+        fmt,
+        updated_since,
+        place_id=place_id,
+        required_type=required_type,
+    )
+
+
 @router.get("/{id}", response_model=schemas.RequirementsSupplies, summary="取得特定物資需求")
-def get_requirement_supply(id: str, db: Session = Depends(get_db)):
+def get_requirement_supply(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一物資需求詳細資訊
     """
     db_requirement = crud.get_by_id(db, models.RequirementsSupplies, id)
     if db_requirement is None:
         raise HTTPException(status_code=404, detail="Requirement Supply not found")
+    crud.check_not_modified(request, response, db_requirement)
     return db_requirement
 
 
@@ -105,12 +170,7 @@ def patch_requirement_supply(
     if db_requirement is None:
         raise HTTPException(status_code=404, detail="Requirement Supply not found")
 
-    # If place_id is being updated, verify it exists
-    if requirement_in.place_id is not None:
-        place = crud.get_by_id(db, models.Place, requirement_in.place_id)
-        if not place:
-            raise HTTPException(status_code=404, detail=f"Place with id {requirement_in.place_id} not found")
-
+    _check_place(db, requirement_in)
     return crud.update(db, db_obj=db_requirement, obj_in=requirement_in)
 
 
@@ -132,4 +192,5 @@ def delete_requirement_supply(id: str, db: Session = Depends(get_db)):
 
     db.delete(db_requirement)
     db.commit()
+    crud.invalidate_caches(models.RequirementsSupplies)
     return None
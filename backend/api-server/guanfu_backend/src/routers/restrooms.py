@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional
-from .. import crud, models, schemas
-from ..database import get_db
+from typing import Any, Dict, List, Optional
+from .. import bulk, crud, export, geo, models, schemas, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
-from ..enum_serializer import RestroomFacilityTypeEnum, RestroomStatusEnum
+from ..enum_serializer import CountModeEnum, RestroomFacilityTypeEnum, RestroomStatusEnum
 
 router = APIRouter(
     prefix="/restrooms",
@@ -16,17 +17,25 @@ router = APIRouter(
 @router.get("", response_model=schemas.RestroomCollection, summary="取得廁所點清單")
 def list_restrooms(
         request: Request,
+        response: Response,
         status: Optional[RestroomStatusEnum] = Query(None),
         facility_type: Optional[RestroomFacilityTypeEnum] = Query(None),
         is_free: Optional[bool] = Query(None),
         has_water: Optional[bool] = Query(None),
         has_lighting: Optional[bool] = Query(None),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得廁所點清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
+    帶入 bbox 或 near（+ radius）時只回傳該範圍內的資料；有 near 時依距離由近到遠排序。
     """
     filters = {
         "status": status,
@@ -35,10 +44,11 @@ def list_restrooms(
         "has_water": has_water,
         "has_lighting": has_lighting,
     }
-    restrooms = crud.get_multi(db, models.Restroom, skip=offset, limit=limit, **filters)
-    total = crud.count(db, models.Restroom, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": restrooms, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    crud.check_collection_not_modified(request, response, db, models.Restroom)
+    restrooms, total, next_link = crud.list_page(
+        request, db, models.Restroom, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, sort_column=models.Restroom.updated_at, area=area, updated_since=updated_since, **filters
+    )
+    return serializers.fast_response(schemas.RestroomCollection, {"member": restrooms, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
 
 
 @router.post("", response_model=schemas.Restroom, status_code=201, summary="建立廁所點")
@@ -51,14 +61,71 @@ def create_restroom(
     return crud.create(db, models.Restroom, obj_in=restroom_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立廁所點",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_restrooms(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立廁所點：每筆格式同 POST /restrooms，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(db, models.Restroom, items, schemas.RestroomCreate, schemas.Restroom)[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新廁所點",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_restrooms(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新廁所點：每筆為 {"id": ..., 其餘欄位同 PATCH /restrooms/{id}}
+    """
+    return bulk.patch_many(db, models.Restroom, items, schemas.RestroomPatch, schemas.Restroom)[0]
+
+
+@router.get("/export", summary="匯出廁所點（NDJSON / CSV）")
+def export_restrooms(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        status: Optional[RestroomStatusEnum] = Query(None),
+        facility_type: Optional[RestroomFacilityTypeEnum] = Query(None),
+        is_free: Optional[bool] = Query(None),
+        has_water: Optional[bool] = Query(None),
+        has_lighting: Optional[bool] = Query(None),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+):
+    """
+    以串流匯出所有符合條件的廁所點（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.Restroom,
+        schemas.Restroom,
+        fmt,
+        updated_since,
+        area=area,
+        status=status,
+        facility_type=facility_type,
+        is_free=is_free,
+        has_water=has_water,
+        has_lighting=has_lighting,
+    )
+
+
 @router.get("/{id}", response_model=schemas.Restroom, summary="取得特定廁所點")
-def get_restroom(id: str, db: Session = Depends(get_db)):
+def get_restroom(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一廁所點
     """
     db_restroom = crud.get_by_id(db, models.Restroom, id)
     if db_restroom is None:
         raise HTTPException(status_code=404, detail="Restroom not found")
+    crud.check_not_modified(request, response, db_restroom)
     return db_restroom
 
 
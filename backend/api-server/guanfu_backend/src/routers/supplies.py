@@ -1,17 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy import desc
-from sqlalchemy.orm import Session, joinedload
-from typing import Optional, List, Literal
-import asyncio
+from sqlalchemy.orm import Session, selectinload
+from typing import Any, Dict, List, Optional
 
-from .. import crud, models, schemas
+from .. import bulk, crud, crud_async, export, models, schemas, search, serializers
 from ..crud import (
-    get_full_supply,
     supply_merge_item_counts,
     supply_batch_increment_received,
 )
-from ..database import get_db
+from ..crud_async import AsyncDB
+from ..database import get_db, get_async_read_db
 from ..api_key import require_modify_api_key
+from ..enum_serializer import CountModeEnum
 from ..services.discord_webhook import send_discord_message
 
 router = APIRouter(
@@ -22,42 +23,66 @@ router = APIRouter(
 
 
 @router.get("", response_model=schemas.SupplyCollection, summary="取得供應單清單")
-def list_supplies(
+async def list_supplies(
     request: Request,
+    response: Response,
     embed: Optional[str] = Query(None, enum=["all"]),
+    is_fulfilled: Optional[bool] = Query(
+        None, description="false：只列出還有物資未收滿的供應單；true：只列出已全部收滿的供應單"
+    ),
+    q: Optional[str] = Query(
+        None, description="關鍵字搜尋供應單名稱與物資項目名稱；逗號分隔多個關鍵字，任一符合即可"
+    ),
+    updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"
+    ),
+    count_mode: Optional[CountModeEnum] = Query(
+        None,
+        description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate",
+    ),
+    fields: Optional[str] = Query(
+        None, description="只回傳指定欄位（逗號分隔），例如 id,name,address；不含 supplies 時不載入物資項目"
+    ),
+    db: AsyncDB = Depends(get_async_read_db),
 ):
     """
     取得供應單清單 (分頁)
 
     - order_by: 指定時間排序方式，可選 "asc" (由舊到新) 或 "desc" (由新到舊)，預設為 desc (最新的在前)
+    - cursor: 帶入時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset
+    - embed: 保留相容；物資項目一律隨清單回傳
+    - fields: 只查詢、回傳指定欄位
+    - q: 供應單名稱或任一物資項目名稱符合即可，依供應單名稱的相關度由高到低排序
+    - is_fulfilled: 依是否已全部收滿篩選
     """
     order_by = desc(models.Supply.updated_at)
-
-    supplies = crud.get_multi(
-        db, model=models.Supply, skip=offset, limit=limit, order_by=order_by
+    filters = {"is_fulfilled": is_fulfilled}
+    keywords = search.from_query(q, related=(models.SupplyItem, "supply_id"))
+    selected = serializers.parse_fields(schemas.Supply, fields)
+    options = crud.load_only_columns(models.Supply, crud.projected_columns(models.Supply, selected, "id", "updated_at"))
+    # 回應包含 supplies 物資項目時以 selectinload 預先載入（async session 不支援 lazy load）
+    if selected is None or "supplies" in selected:
+        options.append(selectinload(models.Supply.supplies))
+    await crud_async.check_collection_not_modified(request, response, db, models.Supply)
+
+    supplies, total, next_link = await crud_async.list_page(
+        request, db, models.Supply, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, order_by=order_by, sort_column=models.Supply.updated_at, options=options, search=keywords, updated_since=updated_since, **filters
+    )
+    return serializers.fast_response(
+        schemas.SupplyCollection,
+        {
+            "member": supplies,
+            "totalItems": total,
+            "limit": limit,
+            "offset": offset,
+            "next": next_link,
+        },
+        response,
+        selected,
     )
-
-    if embed == "all":
-        supplies = (
-            db.query(models.Supply)
-            .options(joinedload(models.Supply.supplies))
-            .filter(models.Supply.id.in_([s.id for s in supplies]))
-            .all()
-        )
-
-    # 使用 crud.count 取得總數
-    total = crud.count(db, model=models.Supply)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {
-        "member": supplies,
-        "totalItems": total,
-        "limit": limit,
-        "offset": offset,
-        "next": next_link,
-    }
 
 
 @router.post(
@@ -70,16 +95,39 @@ async def create_supply(supply_in: schemas.SupplyCreate, db: Session = Depends(g
     # This requires custom logic in crud.py to handle the nested `supplies` object
     created_supply = crud.create_supply_with_items(db, obj_in=supply_in)
 
-    # Send Discord notification in background
+    # Send Discord notification in background (queued, see DiscordDispatcher)
     message_content = "新的物資供應已建立 📦"
     embed_data = supply_in.model_dump(mode="json")
-    asyncio.create_task(
-        send_discord_message(content=message_content, embed_data=embed_data)
-    )
+    send_discord_message(content=message_content, embed_data=embed_data)
 
     return created_supply
 
 
+def _check_patch(db: Session, supply_in: schemas.SupplyPatch, db_supply: models.Supply) -> None:
+    """更新前的檢核（單筆與批次共用）"""
+    if crud.is_completed_supply(db_supply):
+        raise HTTPException(
+            status_code=400, detail="Completed supply orders cannot be edited."
+        )
+
+    # PIN 檢核
+    # if db_supply.valid_pin and db_supply.valid_pin != supply_in.valid_pin:
+    #     raise HTTPException(status_code=400, detail="The PIN you entered is incorrect.")
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新供應單",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_supplies(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新供應單：每筆為 {"id": ..., 其餘欄位同 PATCH /supplies/{id}}，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.patch_many(db, models.Supply, items, schemas.SupplyPatch, schemas.Supply, validate=_check_patch)[0]
+
+
 # 在 patch_supply 禁止更新已全部到貨的供應單
 @router.patch(
     "/{id}",
@@ -92,32 +140,53 @@ def patch_supply(id: str, supply_in: schemas.SupplyPatch, db: Session = Depends(
     db_supply = crud.get_by_id(db, models.Supply, id)
     if db_supply is None:
         raise HTTPException(status_code=404, detail="Supply not found")
+    _check_patch(db, supply_in, db_supply)
+    return crud.update(db, db_obj=db_supply, obj_in=supply_in)
 
-    if crud.is_completed_supply(db_supply):
-        raise HTTPException(
-            status_code=400, detail="Completed supply orders cannot be edited."
-        )
-
-    # PIN 檢核
-    # if db_supply.valid_pin and db_supply.valid_pin != supply_in.valid_pin:
-    #     raise HTTPException(status_code=400, detail="The PIN you entered is incorrect.")
 
-    return crud.update(db, db_obj=db_supply, obj_in=supply_in)
+@router.get("/export", summary="匯出供應單（NDJSON / CSV）")
+def export_supplies(
+    request: Request,
+    fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+    updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+    is_fulfilled: Optional[bool] = Query(
+        None, description="false：只列出還有物資未收滿的供應單；true：只列出已全部收滿的供應單"
+    ),
+    q: Optional[str] = Query(
+        None, description="關鍵字搜尋供應單名稱與物資項目名稱；逗號分隔多個關鍵字，任一符合即可"
+    ),
+):
+    """
+    以串流匯出所有符合條件的供應單（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.Supply,
+        schemas.Supply,
+        fmt,
+        updated_since,
+        search=search.from_query(q, related=(models.SupplyItem, "supply_id")),
+        options=[selectinload(models.Supply.supplies)],
+        is_fulfilled=is_fulfilled,
+    )
 
 
 @router.get("/{id}", response_model=schemas.Supply, summary="取得特定供應單")
-def get_supply(id: str, db: Session = Depends(get_db)):
+async def get_supply(
+    id: str,
+    request: Request,
+    response: Response,
+    db: AsyncDB = Depends(get_async_read_db),
+):
     """
-    取得單一供應單 (包含其所有物資項目)
+    取得單一供應單 (包含其所有物資項目，以 selectinload 同一次請求載入)
     """
-    db_supply = (
-        db.query(models.Supply)
-        .options(joinedload(models.Supply.supplies))
-        .filter(models.Supply.id == id)
-        .first()
+    db_supply = await crud_async.get_by_id(
+        db, models.Supply, id, options=[selectinload(models.Supply.supplies)]
     )
     if db_supply is None:
         raise HTTPException(status_code=404, detail="Supply not found")
+    crud.check_not_modified(request, response, db_supply)
     return db_supply
 
 
@@ -130,6 +199,7 @@ def update_supply(
     """
     將 payload.data 中的各項目依據 id 對應到 supply_item，
     執行 received_count += count 的批次更新，並回傳更新後的 Supply。
+    任一項目累加後會超過 total_number 時整批不更新，回傳 409 並在 detail.conflicts 列出各項目的剩餘數量。
     """
     merged = supply_merge_item_counts([item.model_dump() for item in supply_item_in])
     updated_supply = supply_batch_increment_received(db, id, merged)
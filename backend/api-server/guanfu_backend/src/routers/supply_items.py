@@ -1,12 +1,13 @@
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
+from sqlalchemy.orm import Session, selectinload
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import bulk, crud, export, models, schemas, search, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
-from ..enum_serializer import SupplyItemTypeEnum
+from ..enum_serializer import CountModeEnum, SupplyItemTypeEnum
 
 router = APIRouter(
     prefix="/supply_items",
@@ -15,32 +16,48 @@ router = APIRouter(
 )
 
 
-@router.get("", response_model=schemas.SupplyItemCollection, summary="取得特定供應單物資項目清單")
+@router.get(
+    "",
+    response_model=Union[schemas.SupplyItemCollection, schemas.SupplyItemEmbedCollection],
+    summary="取得特定供應單物資項目清單",
+)
 def list_supply_items(
         request: Request,
+        response: Response,
         supply_id: Optional[str] = Query(None),
         tag: Optional[SupplyItemTypeEnum] = Query(None),
+        embed: Optional[str] = Query(None, enum=["all"], description="all：每筆附上所屬供應單（supply）"),
+        q: Optional[str] = Query(None, description="關鍵字搜尋物資名稱；逗號分隔多個關鍵字，任一符合即可"),
         limit: int = Query(100, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得物資項目清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 id 排序），忽略 offset。
+    embed=all 時以 selectinload 一次載入本頁所有物資項目的供應單（不會逐筆查詢）。
+    帶入 q 時只回傳名稱符合的物資項目，依相關度由高到低排序。
     """
     filters = {"supply_id": supply_id, "tag": tag.value if tag else None, }
-    items = crud.get_multi(db, models.SupplyItem, skip=offset, limit=limit, **filters)
-    total = crud.count(db, models.SupplyItem, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": items, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    keywords = search.from_query(q)
+    if embed == "all":
+        options = [selectinload(models.SupplyItem.supply)]
+        collection = schemas.SupplyItemEmbedCollection
+    else:
+        options = []
+        collection = schemas.SupplyItemCollection
+    crud.check_collection_not_modified(request, response, db, models.SupplyItem)
+    items, total, next_link = crud.list_page(
+        request, db, models.SupplyItem, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, options=options, search=keywords, **filters
+    )
+    return serializers.fast_response(collection, {"member": items, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
 
 
-@router.post("", response_model=schemas.SupplyItem, status_code=201, summary="建立特定供應單物資項目")
-def create_supply_item(
-        item_in: schemas.SupplyItemCreateWithPin, db: Session = Depends(get_db)
-):
-    """
-    建立物資項目
-    """
+def _check_create(db: Session, item_in: schemas.SupplyItemCreateWithPin) -> models.Supply:
+    """建立前的檢核（單筆與批次共用），回傳父層供應單"""
     # Check if parent supply_id exists
     parent_supply = crud.get_by_id(db, models.Supply, id=item_in.supply_id)
     if not parent_supply:
@@ -49,12 +66,88 @@ def create_supply_item(
         raise HTTPException(status_code=400, detail="The PIN you entered is incorrect.")
     if item_in.received_count > item_in.total_number:
         raise HTTPException(status_code=400, detail="Received_count must be less than or equal to total_number.")
+    return parent_supply
+
+
+def _check_patch(db: Session, item_in: schemas.SupplyItemPatch, db_supply_item: models.SupplyItem) -> None:
+    """更新前的檢核（單筆與批次共用）"""
+    if db_supply_item.supply.valid_pin and db_supply_item.supply.valid_pin != item_in.valid_pin:
+        raise HTTPException(status_code=400, detail="The PIN you entered is incorrect.")
+    # validate num
+    if item_in.total_number is not None or item_in.received_count is not None:
+        if db_supply_item.total_number == db_supply_item.received_count:
+            raise HTTPException(status_code=400, detail="Received_count and total_number are locked because their values are equal; updates are not allowed.")
+        total_number = item_in.total_number if item_in.total_number is not None else db_supply_item.total_number
+        received_count = item_in.received_count if item_in.received_count is not None else db_supply_item.received_count
+        if received_count > total_number:
+            raise HTTPException(status_code=400, detail="Received_count must be less than or equal to total_number.")
+
+
+def _touch_parent_supplies(db: Session, items: List[models.SupplyItem]) -> None:
+    """物資項目沒有 updated_at，更新父層 Supply 的 updated_at 讓 /supplies 的 ETag 跟著變動（同一個 commit）"""
+    db.query(models.Supply).filter(models.Supply.id.in_({item.supply_id for item in items})).update(
+        {models.Supply.updated_at: datetime.now(timezone.utc)}, synchronize_session=False
+    )
+
+
+@router.post("", response_model=schemas.SupplyItem, status_code=201, summary="建立特定供應單物資項目")
+def create_supply_item(
+        item_in: schemas.SupplyItemCreateWithPin, db: Session = Depends(get_db)
+):
+    """
+    建立物資項目
+    """
+    parent_supply = _check_create(db, item_in)
     # remove unused columns
     supply_item = item_in.model_dump()
     del supply_item["valid_pin"]
+    # 物資項目沒有 updated_at，更新父層 Supply 的 updated_at 讓 /supplies 的 ETag 跟著變動（同一個 commit）
+    parent_supply.updated_at = datetime.now(timezone.utc)
     return crud.create(db, models.SupplyItem, obj_in=schemas.SupplyItemCreate(**supply_item))
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立供應單物資項目",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_supply_items(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立物資項目：每筆格式同 POST /supply_items（含所屬供應單的 valid_pin），單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(
+        db,
+        models.SupplyItem,
+        items,
+        schemas.SupplyItemCreateWithPin,
+        schemas.SupplyItem,
+        validate=_check_create,
+        before_commit=_touch_parent_supplies,
+    )[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新供應單物資項目",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_supply_items(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新物資項目：每筆為 {"id": ..., 其餘欄位同 PATCH /supply_items/{id}}
+    """
+    return bulk.patch_many(
+        db,
+        models.SupplyItem,
+        items,
+        schemas.SupplyItemPatch,
+        schemas.SupplyItem,
+        validate=_check_patch,
+        before_commit=_touch_parent_supplies,
+    )[0]
+
+
 @router.patch(
     "/{id}",
     response_model=schemas.SupplyItem,
@@ -72,25 +165,43 @@ def patch_supply_item(
     db_supply_item = crud.get_by_id(db, models.SupplyItem, id=id)
     if not db_supply_item:
         raise HTTPException(status_code=404, detail="Supply Item not found.")
-    if db_supply_item.supply.valid_pin and db_supply_item.supply.valid_pin != item_in.valid_pin:
-        raise HTTPException(status_code=400, detail="The PIN you entered is incorrect.")
-    # validate num
-    if item_in.total_number is not None or item_in.received_count is not None:
-        if db_supply_item.total_number == db_supply_item.received_count:
-            raise HTTPException(status_code=400, detail="Received_count and total_number are locked because their values are equal; updates are not allowed.")
-        total_number = item_in.total_number if item_in.total_number is not None else db_supply_item.total_number
-        received_count = item_in.received_count if item_in.received_count is not None else db_supply_item.received_count
-        if received_count > total_number:
-            raise HTTPException(status_code=400, detail="Received_count must be less than or equal to total_number.")
+    _check_patch(db, item_in, db_supply_item)
+    db_supply_item.supply.updated_at = datetime.now(timezone.utc)
     return crud.update(db, db_obj=db_supply_item, obj_in=item_in)
 
 
+@router.get("/export", summary="匯出物資項目（NDJSON / CSV）")
+def export_supply_items(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        supply_id: Optional[str] = Query(None),
+        tag: Optional[SupplyItemTypeEnum] = Query(None),
+        q: Optional[str] = Query(None, description="關鍵字搜尋物資名稱；逗號分隔多個關鍵字，任一符合即可"),
+):
+    """
+    以串流匯出所有符合條件的物資項目（不分頁），篩選參數同列表；依 id 排序（此資料表沒有 updated_at，不支援 updated_since）
+    """
+    return export.export_response(
+        request,
+        models.SupplyItem,
+        schemas.SupplyItem,
+        fmt,
+        updated_since,
+        search=search.from_query(q),
+        supply_id=supply_id,
+        tag=tag,
+    )
+
+
 @router.get("/{id}", response_model=schemas.SupplyItem, summary="取得特定物資項目")
-def get_supply_item(id: str, db: Session = Depends(get_db)):
+def get_supply_item(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一物資項目
     """
     db_item = crud.get_by_id(db, models.SupplyItem, id)
     if db_item is None:
         raise HTTPException(status_code=404, detail="Supply Item not found")
+    # 物資項目沒有 updated_at；每次更新物資項目都會一併更新父層 Supply 的 updated_at
+    crud.check_not_modified(request, response, db_item, db_item.supply.updated_at)
     return db_item
@@ -1,10 +1,13 @@
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import bulk, crud, export, models, schemas, serializers
+from ..database import get_db, get_read_db
+from ..api_key import require_modify_api_key
+from ..enum_serializer import CountModeEnum
 from ..services.line_auth import verify_user_token
 
 router = APIRouter(
@@ -17,26 +20,45 @@ router = APIRouter(
 @router.get("", response_model=schemas.SupplyProviderCollection, summary="取得物資供應提供者清單")
 def list_supply_providers(
         request: Request,
+        response: Response,
         supply_item_id: Optional[str] = Query(None),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得物資供應提供者清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
     """
     filters = {"supply_item_id": supply_item_id}
-    providers = crud.get_multi(
-        db,
-        models.SupplyProvider,
-        skip=offset,
-        limit=limit,
-        order_by=models.SupplyProvider.updated_at.desc(),
-        **filters,
+    crud.check_collection_not_modified(request, response, db, models.SupplyProvider)
+    providers, total, next_link = crud.list_page(
+        request, db, models.SupplyProvider, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, order_by=models.SupplyProvider.updated_at.desc(), sort_column=models.SupplyProvider.updated_at, updated_since=updated_since, **filters
     )
-    total = crud.count(db, models.SupplyProvider, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": providers, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    return serializers.fast_response(schemas.SupplyProviderCollection, {"member": providers, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
+
+
+def _check_create(db: Session, provider_in: schemas.SupplyProviderCreate) -> None:
+    """建立前的檢核（單筆與批次共用）"""
+    # 和 go 同邏輯
+    if not crud.get_by_id(db, models.SupplyItem, provider_in.supply_item_id):
+        raise HTTPException(status_code=404, detail="Supply Item not found")
+
+
+def _check_patch(db: Session, provider_in: schemas.SupplyProviderPatch, db_provider: models.SupplyProvider) -> None:
+    """更新前的檢核（單筆與批次共用）"""
+    update_data = provider_in.model_dump(exclude_unset=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields provided")
+
+    new_supply_item_id = update_data.get("supply_item_id")
+    if new_supply_item_id is not None:
+        if not crud.get_by_id(db, models.SupplyItem, new_supply_item_id):
+            raise HTTPException(status_code=404, detail="Supply Item not found")
 
 
 @router.post(
@@ -53,13 +75,40 @@ def create_supply_provider(
     """
     建立物資供應提供者
     """
-    # 和 go 同邏輯
-    if not crud.get_by_id(db, models.SupplyItem, provider_in.supply_item_id):
-        raise HTTPException(status_code=404, detail="Supply Item not found")
-
+    _check_create(db, provider_in)
     return crud.create(db, models.SupplyProvider, obj_in=provider_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立物資供應提供者",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_supply_providers(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立物資供應提供者：每筆格式同 POST /supply_providers，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(
+        db, models.SupplyProvider, items, schemas.SupplyProviderCreate, schemas.SupplyProvider, validate=_check_create
+    )[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新物資供應提供者",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_supply_providers(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新物資供應提供者：每筆為 {"id": ..., 其餘欄位同 PATCH /supply_providers/{id}}
+    """
+    return bulk.patch_many(
+        db, models.SupplyProvider, items, schemas.SupplyProviderPatch, schemas.SupplyProvider, validate=_check_patch
+    )[0]
+
+
 @router.patch(
     "/{id}",
     response_model=schemas.SupplyProvider,
@@ -83,20 +132,37 @@ def patch_supply_provider(
     if db_provider is None:
         raise HTTPException(status_code=404, detail="Supply Provider not found")
 
-    new_supply_item_id = update_data.get("supply_item_id")
-    if new_supply_item_id is not None:
-        if not crud.get_by_id(db, models.SupplyItem, new_supply_item_id):
-            raise HTTPException(status_code=404, detail="Supply Item not found")
-
+    _check_patch(db, provider_in, db_provider)
     return crud.update(db, db_obj=db_provider, obj_in=provider_in)
 
 
+@router.get("/export", summary="匯出物資供應提供者（NDJSON / CSV）")
+def export_supply_providers(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        supply_item_id: Optional[str] = Query(None),
+):
+    """
+    以串流匯出所有符合條件的物資供應提供者（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.SupplyProvider,
+        schemas.SupplyProvider,
+        fmt,
+        updated_since,
+        supply_item_id=supply_item_id,
+    )
+
+
 @router.get("/{id}", response_model=schemas.SupplyProvider, summary="取得特定物資供應提供者")
-def get_supply_provider(id: str, db: Session = Depends(get_db)):
+def get_supply_provider(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一物資供應提供者
     """
     db_provider = crud.get_by_id(db, models.SupplyProvider, id)
     if db_provider is None:
         raise HTTPException(status_code=404, detail="Supply Provider not found")
+    crud.check_not_modified(request, response, db_provider)
     return db_provider
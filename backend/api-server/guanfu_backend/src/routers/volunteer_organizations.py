@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import bulk, crud, export, models, schemas, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
+from ..enum_serializer import CountModeEnum
 
 router = APIRouter(
     prefix="/volunteer_organizations",
@@ -15,17 +19,23 @@ router = APIRouter(
 @router.get("", response_model=schemas.VolunteerOrgCollection, summary="取得志工招募單位清單")
 def list_volunteer_orgs(
         request: Request,
+        response: Response,
         limit: int = Query(20, ge=1, le=200),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得志工招募單位清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 id 排序），忽略 offset。
     """
-    orgs = crud.get_multi(db, models.VolunteerOrganization, skip=offset, limit=limit)
-    total = crud.count(db, models.VolunteerOrganization)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": orgs, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    crud.check_collection_not_modified(request, response, db, models.VolunteerOrganization)
+    orgs, total, next_link = crud.list_page(
+        request, db, models.VolunteerOrganization, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode
+    )
+    return serializers.fast_response(schemas.VolunteerOrgCollection, {"member": orgs, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
 
 
 @router.post("", response_model=schemas.VolunteerOrganization, status_code=201, summary="建立志工招募單位")
@@ -38,14 +48,59 @@ def create_volunteer_org(
     return crud.create(db, models.VolunteerOrganization, obj_in=org_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立志工招募單位",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_volunteer_organizations(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立志工招募單位：每筆格式同 POST /volunteer_organizations，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(db, models.VolunteerOrganization, items, schemas.VolunteerOrgCreate, schemas.VolunteerOrganization)[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新志工招募單位",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_volunteer_organizations(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新志工招募單位：每筆為 {"id": ..., 其餘欄位同 PATCH /volunteer_organizations/{id}}
+    """
+    return bulk.patch_many(db, models.VolunteerOrganization, items, schemas.VolunteerOrgPatch, schemas.VolunteerOrganization)[0]
+
+
+@router.get("/export", summary="匯出志工招募單位（NDJSON / CSV）")
+def export_volunteer_organizations(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+):
+    """
+    以串流匯出所有符合條件的志工招募單位（不分頁），篩選參數同列表；依 id 排序（此資料表沒有 updated_at，不支援 updated_since）
+    """
+    return export.export_response(
+        request,
+        models.VolunteerOrganization,
+        schemas.VolunteerOrganization,
+        fmt,
+        updated_since,
+    )
+
+
 @router.get("/{id}", response_model=schemas.VolunteerOrganization, summary="取得特定志工招募單位")
-def get_volunteer_org(id: str, db: Session = Depends(get_db)):
+def get_volunteer_org(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一志工招募單位
     """
     db_org = crud.get_by_id(db, models.VolunteerOrganization, id)
     if db_org is None:
         raise HTTPException(status_code=404, detail="Volunteer Organization not found")
+    crud.check_not_modified(request, response, db_org, db_org.last_updated)
     return db_org
 
 
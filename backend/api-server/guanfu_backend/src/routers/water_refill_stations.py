@@ -1,11 +1,13 @@
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Security, Request
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import bulk, crud, export, geo, models, schemas, serializers
+from ..database import get_db, get_read_db
 from ..api_key import require_modify_api_key
+from ..enum_serializer import CountModeEnum
 
 router = APIRouter(
     prefix="/water_refill_stations",
@@ -17,16 +19,24 @@ router = APIRouter(
 @router.get("", response_model=schemas.WaterRefillStationCollection, summary="取得飲用水補給站清單")
 def list_water_refill_stations(
         request: Request,
+        response: Response,
         status: Optional[str] = Query(None),
         water_type: Optional[str] = Query(None),
         is_free: Optional[bool] = Query(None),
         accessibility: Optional[bool] = Query(None),
+        updated_since: Optional[datetime] = Query(None, description="只回傳此時間之後異動（updated_at >= updated_since）的資料，unix timestamp 或 ISO 8601；供同步用戶端增量抓取"),
         limit: int = Query(50, ge=1, le=500),
         offset: int = Query(0, ge=0),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="游標分頁；傳入空字串開始，之後沿用回應的 next 連結"),
+        count_mode: Optional[CountModeEnum] = Query(None, description="totalItems 計算方式：exact（精確）/ cached（短暫快取）/ estimate（估計值）；游標分頁時預設為 estimate"),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+        db: Session = Depends(get_read_db)
 ):
     """
     取得飲用水補給站清單 (分頁)
+
+    帶入 cursor 時改用游標分頁（依 updated_at、id 由新到舊），忽略 offset。
+    帶入 bbox 或 near（+ radius）時只回傳該範圍內的資料；有 near 時依距離由近到遠排序。
     """
     filters = {
         "status": status,
@@ -34,10 +44,11 @@ def list_water_refill_stations(
         "is_free": is_free,
         "accessibility": accessibility,
     }
-    stations = crud.get_multi(db, models.WaterRefillStation, skip=offset, limit=limit, **filters)
-    total = crud.count(db, models.WaterRefillStation, **filters)
-    next_link = crud.build_next_link(request, limit=limit, offset=offset, total=total)
-    return {"member": stations, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}
+    crud.check_collection_not_modified(request, response, db, models.WaterRefillStation)
+    stations, total, next_link = crud.list_page(
+        request, db, models.WaterRefillStation, limit=limit, offset=offset, cursor=cursor, count_mode=count_mode, sort_column=models.WaterRefillStation.updated_at, area=area, updated_since=updated_since, **filters
+    )
+    return serializers.fast_response(schemas.WaterRefillStationCollection, {"member": stations, "totalItems": total, "limit": limit, "offset": offset, "next": next_link}, response)
 
 
 @router.post("", response_model=schemas.WaterRefillStation, status_code=201, summary="建立飲用水補給站")
@@ -50,14 +61,69 @@ def create_water_refill_station(
     return crud.create(db, models.WaterRefillStation, obj_in=station_in)
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次建立飲用水補給站",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_create_water_refill_stations(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次建立飲用水補給站：每筆格式同 POST /water_refill_stations，單筆失敗不影響其他筆，各筆結果見 results
+    """
+    return bulk.create_many(db, models.WaterRefillStation, items, schemas.WaterRefillStationCreate, schemas.WaterRefillStation)[0]
+
+
+@router.patch(
+    "/bulk",
+    response_model=schemas.BulkResponse,
+    summary="批次更新飲用水補給站",
+    dependencies=[Security(require_modify_api_key)],
+)
+def bulk_patch_water_refill_stations(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    批次更新飲用水補給站：每筆為 {"id": ..., 其餘欄位同 PATCH /water_refill_stations/{id}}
+    """
+    return bulk.patch_many(db, models.WaterRefillStation, items, schemas.WaterRefillStationPatch, schemas.WaterRefillStation)[0]
+
+
+@router.get("/export", summary="匯出飲用水補給站（NDJSON / CSV）")
+def export_water_refill_stations(
+        request: Request,
+        fmt: export.ExportFormat = Query("ndjson", alias="format", description="ndjson：每行一筆 JSON；csv：第一列為欄位名稱"),
+        updated_since: Optional[datetime] = Query(None, description="只匯出 updated_at 不早於此時間的資料（ISO 8601 或 unix timestamp）"),
+        status: Optional[str] = Query(None),
+        water_type: Optional[str] = Query(None),
+        is_free: Optional[bool] = Query(None),
+        accessibility: Optional[bool] = Query(None),
+        area: Optional[geo.Area] = Depends(geo.area_query),
+):
+    """
+    以串流匯出所有符合條件的飲用水補給站（不分頁），篩選參數同列表；依 updated_at、id 由舊到新排序
+    """
+    return export.export_response(
+        request,
+        models.WaterRefillStation,
+        schemas.WaterRefillStation,
+        fmt,
+        updated_since,
+        area=area,
+        status=status,
+        water_type=water_type,
+        is_free=is_free,
+        accessibility=accessibility,
+    )
+
+
 @router.get("/{id}", response_model=schemas.WaterRefillStation, summary="取得特定飲用水補給站")
-def get_water_refill_station(id: str, db: Session = Depends(get_db)):
+def get_water_refill_station(id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     取得單一飲用水補給站
     """
     db_station = crud.get_by_id(db, models.WaterRefillStation, id)
     if db_station is None:
         raise HTTPException(status_code=404, detail="Water Refill Station not found")
+    crud.check_not_modified(request, response, db_station)
     return db_station
 
 
@@ -40,6 +40,34 @@ class CollectionBase(BaseModel):
     member: List[Any]
 
 
+class BulkItemResult(BaseModel):
+    index: int = Field(..., description="在請求陣列中的位置")
+    status: int = Field(..., description="該筆的 HTTP 狀態碼（201 / 200 或錯誤碼）")
+    id: Optional[str] = None
+    data: Optional[Dict[str, Any]] = Field(None, description="成功時為與單筆 API 相同格式的資料")
+    detail: Optional[Any] = Field(None, description="失敗原因")
+
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class ChangeEntry(BaseModel):
+    version: int = Field(..., description="異動紀錄編號")
+    resource: str = Field(..., description="資源類型，例如 human_resources、supplies")
+    id: str = Field(..., description="資源 id；已完成的人力需求為空字串（同列表）")
+    action: Literal["insert", "update", "delete"]
+    changed_at: int
+
+
+class ChangeFeed(BaseModel):
+    member: List[ChangeEntry]
+    next_since: str = Field(..., description="下次請求帶入的 since")
+    has_more: bool = Field(..., description="是否還有尚未取得的異動（有則立即以 next_since 再取一次）")
+
+
 # ===================================================================
 # 志工團體 (Volunteer Organizations)
 # ===================================================================
@@ -667,6 +695,8 @@ class SupplyPatch(BaseModel):
 class Supply(SupplyBase, BaseColumn):
     supplies: List[SupplyItem] = []
     spam_warn: Optional[bool] = None
+    remaining_count: Optional[int] = None  # 尚未收到的物資總數
+    is_fulfilled: Optional[bool] = None  # 所有物資項目皆已收滿
 
     class Config:
         from_attributes = True
@@ -680,6 +710,25 @@ class SupplyCollection(CollectionBase):
     member: List[Supply]
 
 
+class SupplySummary(SupplyBase, BaseColumn):
+    """物資項目 embed=all 時附帶的供應單資料（不含 supplies）"""
+
+    spam_warn: Optional[bool] = None
+    remaining_count: Optional[int] = None
+    is_fulfilled: Optional[bool] = None
+
+    class Config:
+        from_attributes = True
+
+
+class SupplyItemWithSupply(SupplyItem):
+    supply: Optional[SupplySummary] = None
+
+
+class SupplyItemEmbedCollection(CollectionBase):
+    member: List[SupplyItemWithSupply]
+
+
 SixDigitPin = Annotated[str, constr(pattern=r"^\d{6}$")]
 
 
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Type
+
+from sqlalchemy import and_, exists, func, or_, select
+
+# ===================================================================
+# 關鍵字搜尋：q= / q_role=
+# 中文沒有空白斷詞，改以「單字 + 相鄰兩字 (bigram)」作為 tsvector 的詞彙
+# （資料庫函式 gf_search_vector / gf_search_query，見 models.SEARCH_FUNCTIONS_DDL），
+# search_vector generated column 上建 GIN 索引；查詢時關鍵字的每個 bigram 都要出現，
+# 再以 ILIKE 複核（bigram 都出現不代表是連續子字串），依 ts_rank 排序相關度。
+# ===================================================================
+
+SEARCH_VECTOR = "search_vector"
+# models.search_column 把被索引的文字欄位記在 Column.info，供 ILIKE 複核使用
+SEARCH_COLUMNS_INFO = "search_columns"
+
+
+def parse_keywords(raw: Optional[str]) -> Tuple[str, ...]:
+    """逗號分隔的關鍵字，任一符合即可；去除空白與重複"""
+    if not raw:
+        return ()
+    return tuple(dict.fromkeys(kw.strip() for kw in raw.split(",") if kw.strip()))
+
+
+def _has_tokens(keyword: str) -> bool:
+    # gf_search_query 以空白與標點斷詞；只有標點的關鍵字沒有 bigram，只能以 ILIKE 比對
+    return any(ch.isalnum() for ch in keyword)
+
+
+def _like_pattern(keyword: str) -> str:
+    escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+@dataclass(frozen=True)
+class Search:
+    """
+    列表的關鍵字篩選條件；keywords 之間為 OR。
+    related 為 (子資料表 model, 外鍵欄位名稱)，例如 (SupplyItem, "supply_id")：本身或任一子資料列符合即可
+    """
+
+    keywords: Tuple[str, ...]
+    related: Optional[Tuple[Type[Any], str]] = None
+
+    def match(self, model: Type[Any]):
+        """model 的 search_vector 符合任一關鍵字（索引）且文字欄位確實包含該關鍵字（ILIKE 複核）"""
+        vector = getattr(model, SEARCH_VECTOR)
+        columns = [getattr(model, name) for name in model.__table__.c[SEARCH_VECTOR].info[SEARCH_COLUMNS_INFO]]
+        clauses = []
+        for keyword in self.keywords:
+            pattern = _like_pattern(keyword)
+            recheck = or_(*(column.ilike(pattern, escape="\\") for column in columns))
+            if _has_tokens(keyword):
+                clauses.append(and_(vector.op("@@")(func.gf_search_query(keyword)), recheck))
+            else:
+                clauses.append(recheck)
+        return or_(*clauses)
+
+    def criteria(self, model: Type[Any]) -> list:
+        clause = self.match(model)
+        if self.related is not None:
+            child, foreign_key = self.related
+            clause = or_(clause, exists(select(1).where(getattr(child, foreign_key) == model.id, self.match(child))))
+        return [clause]
+
+    def rank(self, model: Type[Any]):
+        """相關度（ts_rank，越大越相關）；沒有可索引的關鍵字時回傳 None"""
+        queries = [func.gf_search_query(kw) for kw in self.keywords if _has_tokens(kw)]
+        if not queries:
+            return None
+        query = queries[0]
+        for other in queries[1:]:
+            query = query.op("||")(other)
+        return func.ts_rank(getattr(model, SEARCH_VECTOR), query)
+
+    def cache_key(self) -> Dict[str, Any]:
+        """併入 count 快取 key"""
+        return {"q": self.keywords}
+
+
+def from_query(raw: Optional[str], related: Optional[Tuple[Type[Any], str]] = None) -> Optional[Search]:
+    """q= 查詢參數 -> Search；未帶入或只有空白時回傳 None"""
+    keywords = parse_keywords(raw)
+    return Search(keywords, related) if keywords else None
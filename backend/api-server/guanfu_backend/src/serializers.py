@@ -0,0 +1,232 @@
+import types
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from fastapi import HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+
+from .schemas import BaseColumn
+
+# ===================================================================
+# 快速 JSON 輸出：預先編譯每個 response schema 的 row -> dict 轉換，
+# 直接以 orjson 輸出，略過 FastAPI 對 response_model 的逐列驗證。
+# 輸出內容需與 response_model 的 JSON 完全相同（scripts/bench_serialization.py 驗證）。
+# ===================================================================
+
+Serializer = Callable[[Any], Any]
+
+_MISSING = object()
+_UTC8 = timezone(timedelta(hours=8))
+_SIMPLE_TYPES = (str, bool)
+# BaseColumn 上 created_at / updated_at 的 before validator，以 _epoch 取代
+_EPOCH_VALIDATOR = "_coerce_epoch"
+
+# (schema, 欄位子集) -> serializer
+_compiled: Dict[Tuple[Type[BaseModel], Optional[Tuple[str, ...]]], Serializer] = {}
+
+
+def _epoch(v):
+    """與 BaseColumn._coerce_epoch 相同：naive datetime 視為 UTC+8，轉成 unix timestamp"""
+    if isinstance(v, int):
+        return v
+    if isinstance(v, datetime) and v.tzinfo is None:
+        v = v.replace(tzinfo=_UTC8)
+    return int(v.timestamp())
+
+
+def _to_int(v):
+    return v if type(v) is int else int(v)
+
+
+def _to_float(v):
+    return v if type(v) is float else float(v)
+
+
+def _enum_value(v):
+    return v.value if isinstance(v, Enum) else v
+
+
+def _unwrap(annotation):
+    """去掉 Annotated[...]（NonNegativeInt、constr 等），回傳 (型別, 是否可為 None)"""
+    nullable = False
+    while True:
+        origin = get_origin(annotation)
+        if origin is Annotated:
+            annotation = get_args(annotation)[0]
+        elif origin in (Union, types.UnionType):
+            args = [a for a in get_args(annotation) if a is not type(None)]
+            if len(args) != 1:
+                return annotation, nullable
+            nullable = True
+            annotation = args[0]
+        else:
+            return annotation, nullable
+
+
+def _adapter_converter(annotation) -> Serializer:
+    """無法預先編譯的型別（Union、Tuple、datetime、Dict 等）交給 pydantic 處理"""
+    adapter = TypeAdapter(annotation)
+
+    def convert(v):
+        return adapter.dump_python(adapter.validate_python(v, from_attributes=True), mode="json")
+
+    return convert
+
+
+def _converter(annotation) -> Optional[Serializer]:
+    """回傳欄位值的轉換函式；None 表示原值即可直接輸出"""
+    tp, nullable = _unwrap(annotation)
+    if tp in _SIMPLE_TYPES:
+        convert = None
+    elif tp is int:
+        convert = _to_int
+    elif tp is float:
+        convert = _to_float
+    elif isinstance(tp, type) and issubclass(tp, Enum):
+        convert = _enum_value
+    elif isinstance(tp, type) and issubclass(tp, BaseModel):
+        convert = serializer_for(tp)
+    elif get_origin(tp) in (list, List) and len(get_args(tp)) == 1:
+        item = _converter(get_args(tp)[0])
+        if item is None:
+            convert = list
+        else:
+            def convert(v, item=item):
+                return [item(x) for x in v]
+    else:
+        return _adapter_converter(annotation)
+    if convert is None or not nullable:
+        return convert
+    return lambda v: None if v is None else convert(v)
+
+
+def _compile(
+    schema: Type[BaseModel],
+    fields: Optional[Tuple[str, ...]] = None,
+    overrides: Optional[Dict[str, Serializer]] = None,
+) -> Serializer:
+    decorators = schema.__pydantic_decorators__
+    epoch_fields = set()
+    precompiled = not (
+        decorators.model_validators
+        or decorators.field_serializers
+        or decorators.model_serializers
+        or decorators.computed_fields
+        or any(field.alias or field.serialization_alias for field in schema.model_fields.values())
+    )
+    for dec in decorators.field_validators.values():
+        if dec.cls_var_name == _EPOCH_VALIDATOR and issubclass(schema, BaseColumn):
+            epoch_fields.update(dec.info.fields)
+        elif dec.info.mode != "after":
+            # after validator 只做檢查、不改變值；其他模式可能改寫輸出，整列交給 pydantic
+            precompiled = False
+
+    if not precompiled:
+        include = set(fields) if fields is not None else None
+
+        def fallback(row):
+            return schema.model_validate(row, from_attributes=True).model_dump(mode="json", include=include)
+
+        return fallback
+
+    plan = []
+    overrides = overrides or {}
+    for name, field in schema.model_fields.items():
+        if fields is not None and name not in fields:
+            continue
+        if name in overrides:
+            convert = overrides[name]
+        else:
+            convert = _epoch if name in epoch_fields else _converter(field.annotation)
+        if field.default_factory is not None:
+            default = field.default_factory
+        elif field.default is PydanticUndefined:
+            default = None
+        else:
+            default = (lambda value: lambda: value)(field.default)
+        plan.append((name, convert, default))
+
+    def serialize(row):
+        # ORM 物件與 pydantic model 先查 __dict__（已載入的欄位），查不到再 getattr（lazy load / property）
+        obj = None if isinstance(row, dict) else row
+        data = row if obj is None else row.__dict__
+        out = {}
+        for name, convert, default in plan:
+            value = data.get(name, _MISSING)
+            if value is _MISSING and obj is not None:
+                value = getattr(obj, name, _MISSING)
+            if value is _MISSING:
+                out[name] = default() if default is not None else None
+            elif convert is None or value is None:
+                out[name] = value
+            else:
+                out[name] = convert(value)
+        return out
+
+    return serialize
+
+
+def serializer_for(schema: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None) -> Serializer:
+    """
+    取得（並快取）schema 對應的 row -> dict 轉換函式；row 可為 ORM 物件、dict 或 pydantic model。
+    fields 為輸出欄位子集（parse_fields 的回傳值），None 表示全部欄位。
+    """
+    key = (schema, fields)
+    serializer = _compiled.get(key)
+    if serializer is None:
+        serializer = _compiled[key] = _compile(schema, fields)
+    return serializer
+
+
+def _collection_serializer(schema: Type[BaseModel], fields: Optional[Tuple[str, ...]]) -> Serializer:
+    """列表回應（CollectionBase）的 serializer；fields 只套用在 member 的每一筆資料"""
+    if fields is None:
+        return serializer_for(schema)
+    key = (schema, ("member", fields))
+    serializer = _compiled.get(key)
+    if serializer is None:
+        item = serializer_for(member_schema(schema), fields)
+        serializer = _compiled[key] = _compile(schema, overrides={"member": lambda rows: [item(row) for row in rows]})
+    return serializer
+
+
+def member_schema(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """列表回應 schema 的單筆資料 schema，例如 PlaceCollection -> Place"""
+    return get_args(schema.model_fields["member"].annotation)[0]
+
+
+def parse_fields(schema: Type[BaseModel], fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    解析 fields= 查詢參數（逗號分隔的欄位名稱），依 schema 欄位順序回傳；
+    未帶入或為空字串時回傳 None（全部欄位），包含不存在的欄位時回 400。
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        return None
+    unknown = requested - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+def fast_response(
+    schema: Type[BaseModel],
+    content: Any,
+    response: Optional[Response] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> ORJSONResponse:
+    """
+    以預先編譯的 serializer + orjson 輸出回應，取代 response_model 的驗證與序列化；
+    路由的 response_model 仍保留，用於 OpenAPI 文件。
+    fields 只用於列表回應：member 的每一筆只輸出這些欄位。
+    """
+    out = ORJSONResponse(_collection_serializer(schema, fields)(content))
+    if response is not None:
+        # 路由直接回傳 Response 時，FastAPI 不會合併注入的 response 上的標頭（ETag 等）
+        out.raw_headers.extend(response.headers.raw)
+    return out
@@ -1,32 +1,213 @@
+import asyncio
 import httpx
+import logging
+from typing import List, Optional, Tuple
+from .. import http_clients
 from ..config import settings
+from ..metrics import metrics
 import json
 
+logger = logging.getLogger(__name__)
 
-async def send_discord_message(content: str, embed_data: dict | None = None):
-    """
-    Sends a message to a Discord webhook.
+# Discord webhook 單則訊息的限制
+MAX_EMBEDS = 10
+MAX_CONTENT_CHARS = 2000
+MAX_DESCRIPTION_CHARS = 4096
+MAX_TOTAL_EMBED_CHARS = 6000
 
-    Args:
-        content: The main text content of the message.
-        embed_data: Optional dictionary to be sent as a formatted JSON embed.
+Notification = Tuple[str, Optional[dict]]
+
+
+def _embed(embed_data: dict) -> dict:
+    description = f"```json\n{json.dumps(embed_data, indent=2, ensure_ascii=False)}\n```"
+    if len(description) > MAX_DESCRIPTION_CHARS:
+        description = description[:MAX_DESCRIPTION_CHARS - 5] + "\n…```"
+    return {
+        "description": description,
+        "color": 5814783,  # A nice blue color
+    }
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """429 回應要求的等待秒數（Retry-After header，或 body 的 retry_after）"""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        try:
+            value = response.json().get("retry_after")
+        except ValueError:
+            value = None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class DiscordDispatcher:
+    """
+    Discord 通知的背景發送：路由只呼叫 notify() 把通知放入佇列（不等待、不另外建立 task），
+    由單一背景 task 依序送出。佇列中累積的多則通知合併成一則 webhook 訊息（最多 10 個 embed），
+    遇到 429 依 Retry-After 等待後重送；佇列已滿時丟棄新的通知並計數。
+    在 main.lifespan 中 start()，關閉時 stop() 先送完佇列中的通知（最多 DISCORD_DRAIN_TIMEOUT_SECONDS）。
     """
-    if not settings.DISCORD_WEBHOOK_URL:
-        return
 
-    message = {"content": content}
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        # 上一批放不下、留到下一批的通知
+        self._carry: Optional[Notification] = None
+        self._closed = False
+
+    @property
+    def queue_depth(self) -> int:
+        if self._queue is None:
+            return 0
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=settings.DISCORD_QUEUE_SIZE)
+        self._carry = None
+        self._closed = False
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._closed = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.DISCORD_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Discord 通知未送完即關閉，捨棄 {self.queue_depth} 則")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
 
-    if embed_data:
-        message["embeds"] = [
-            {
-                "description": f"```json\n{json.dumps(embed_data, indent=2, ensure_ascii=False)}\n```",
-                "color": 5814783,  # A nice blue color
-            }
-        ]
+    def notify(self, content: str, embed_data: Optional[dict] = None) -> None:
+        """排入一則通知；可在 event loop 或 threadpool（同步路由）中呼叫"""
+        if not settings.DISCORD_WEBHOOK_URL:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if self._task is None and not self._closed and running_loop is not None:
+            # lifespan 之外（例如未以 with 啟動的 TestClient）在 event loop 中第一次使用時才啟動
+            self.start()
+        if self._task is None or self._closed:
+            metrics.inc("discord_notifications_dropped_total")
+            return
+        notification = (content, embed_data)
+        if running_loop is self._loop:
+            self._put(notification)
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._put, notification)
+            except RuntimeError:
+                metrics.inc("discord_notifications_dropped_total")
 
-    async with httpx.AsyncClient() as client:
+    def _put(self, notification: Notification) -> None:
         try:
-            await client.post(settings.DISCORD_WEBHOOK_URL, json=message)
-        except httpx.RequestError as e:
-            # In a real app, you'd want to log this error.
-            print(f"Error sending Discord webhook: {e}")
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            metrics.inc("discord_notifications_dropped_total")
+
+    def _next_batch(self, first: Notification) -> Tuple[List[Notification], dict]:
+        """從佇列取出可以合併成一則訊息的通知（不等待），回傳通知與 webhook payload"""
+        batch: List[Notification] = []
+        lines: List[str] = []
+        embeds: List[dict] = []
+        embed_chars = 0
+        notification: Optional[Notification] = first
+        while notification is not None:
+            content, embed_data = notification
+            embed = _embed(embed_data) if embed_data else None
+            size = len(embed["description"]) if embed else 0
+            content_chars = sum(len(line) + 1 for line in lines) + len(content)
+            if batch and (
+                    len(batch) >= MAX_EMBEDS
+                    or embed_chars + size > MAX_TOTAL_EMBED_CHARS
+                    or content_chars > MAX_CONTENT_CHARS
+            ):
+                self._carry = notification
+                break
+            batch.append(notification)
+            lines.append(content)
+            if embed:
+                embeds.append(embed)
+                embed_chars += size
+            notification = None if self._queue.empty() else self._queue.get_nowait()
+
+        message = {"content": "\n".join(lines)[:MAX_CONTENT_CHARS]}
+        if embeds:
+            message["embeds"] = embeds
+        return batch, message
+
+    async def _run(self) -> None:
+        while True:
+            if self._carry is not None:
+                first, self._carry = self._carry, None
+            else:
+                first = await self._queue.get()
+            batch, message = self._next_batch(first)
+            try:
+                await self._send(message, len(batch))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error sending Discord webhook")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send(self, message: dict, count: int) -> None:
+        client = http_clients.clients.get(http_clients.DISCORD)
+        delay = 1.0
+        for attempt in range(1, settings.DISCORD_MAX_ATTEMPTS + 1):
+            try:
+                response = await client.post(settings.DISCORD_WEBHOOK_URL, json=message)
+            except httpx.RequestError as e:
+                logger.warning(f"Error sending Discord webhook (attempt {attempt}): {e!r}")
+                wait = delay
+            else:
+                if response.is_success:
+                    metrics.inc("discord_notifications_sent_total", count)
+                    # 已用完目前的額度時先等到重置，避免下一則直接收到 429
+                    if response.headers.get("X-RateLimit-Remaining") == "0":
+                        try:
+                            await asyncio.sleep(float(response.headers.get("X-RateLimit-Reset-After", 0)))
+                        except ValueError:
+                            pass
+                    return
+                if response.status_code == 429:
+                    metrics.inc("discord_rate_limited_total")
+                    wait = _retry_after(response)
+                elif response.status_code >= 500:
+                    wait = delay
+                else:
+                    logger.error(f"Discord webhook rejected the message: {response.status_code} {response.text}")
+                    break
+            if attempt < settings.DISCORD_MAX_ATTEMPTS:
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, 30)
+        metrics.inc("discord_notifications_failed_total", count)
+
+
+dispatcher = DiscordDispatcher()
+metrics.register_gauge("discord_queue_depth", lambda: dispatcher.queue_depth)
+
+
+def send_discord_message(content: str, embed_data: dict | None = None) -> None:
+    """
+    Queues a message for the Discord webhook; it is sent in the background by the dispatcher.
+
+    Args:
+        content: The main text content of the message.
+        embed_data: Optional dictionary to be sent as a formatted JSON embed.
+    """
+    dispatcher.notify(content, embed_data)
@@ -1,11 +1,15 @@
+import asyncio
 import base64
 import hashlib
+import json
 import secrets
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Callable
 
 import httpx
+import jwt
 from urllib.parse import urlencode
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
@@ -13,20 +17,34 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from starlette import status
 
+from .. import http_clients
+from ..cache import TTLCache
 from ..config import settings
 from ..database import get_db
-from ..models import LineUser, LineSessionState
+from ..models import LineUser
+from .line_state_store import store as state_store, new_auth_state
 
 # LINE OAuth2 / OIDC endpoints
 AUTH_URL = "https://access.line.me/oauth2/v2.1/authorize"
 TOKEN_URL = "https://api.line.me/oauth2/v2.1/token"
 USERINFO_URL = "https://api.line.me/oauth2/v2.1/userinfo"
-VERIFY_URL = "https://api.line.me/oauth2/v2.1/verify"
 REVOKE_URL = "https://api.line.me/oauth2/v2.1/revoke"
+ID_TOKEN_ISSUER = "https://access.line.me"
+# ID Token 的 exp / iat 容許的時鐘誤差（秒）
+ID_TOKEN_LEEWAY_SECONDS = 60
+# 遇到未知 kid 時重新抓取 JWKS 的最短間隔（秒），避免偽造的 kid 讓每次登入都打 LINE
+JWKS_MIN_REFRESH_SECONDS = 60
 
 # Logger
 logger = logging.getLogger(__name__)
 
+# verify_user_token 的快取：token 的 SHA-256 -> 使用者快照（不屬於任何 session 的 LineUser）
+_token_cache = TTLCache(maxsize=settings.LINE_TOKEN_CACHE_MAX_ENTRIES, ttl=settings.LINE_TOKEN_CACHE_TTL_SECONDS)
+
+
+def _http() -> httpx.AsyncClient:
+    return http_clients.clients.get(http_clients.LINE)
+
 
 # ====== Utility functions ======
 
@@ -47,9 +65,137 @@ def _code_challenge_s256(code_verifier: str) -> str:
     return base64.urlsafe_b64encode(h).decode("utf-8").rstrip("=")
 
 
+def token_hash(token: str) -> str:
+    """token 的 SHA-256（hex），對應 LineUser.access_token_hash / id_token_hash"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _set_tokens(user: LineUser, access_token: Optional[str], id_token: Optional[str]) -> tuple:
+    """
+    更新使用者的 token 與 hash，回傳原本的 token；
+    commit 後以 _forget_tokens 清除其快取（commit 前清除可能被其他請求以舊資料重新放入）
+    """
+    previous = (user.access_token, user.id_token)
+    user.access_token = access_token
+    user.access_token_hash = token_hash(access_token) if access_token else None
+    user.id_token = id_token
+    user.id_token_hash = token_hash(id_token) if id_token else None
+    return previous
+
+
+def _forget_tokens(*tokens: Optional[str]) -> None:
+    for token in tokens:
+        if token:
+            _token_cache.pop(token_hash(token))
+
+
+# ====== ID Token (local verification) ======
+
+class _JwksCache:
+    """
+    LINE 的 ES256 公鑰（JWKS），快取 LINE_JWKS_TTL_SECONDS 後重新抓取；
+    遇到未知 kid（LINE 換發金鑰）時提前重抓。抓取失敗時沿用舊的公鑰。
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, object] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _stale(self, kid: Optional[str]) -> bool:
+        if self._fetched_at is None:
+            return True
+        age = time.monotonic() - self._fetched_at
+        if age > settings.LINE_JWKS_TTL_SECONDS:
+            return True
+        return kid not in self._keys and age > JWKS_MIN_REFRESH_SECONDS
+
+    async def _load(self) -> dict:
+        if settings.LINE_JWKS_FILE:
+            with open(settings.LINE_JWKS_FILE, encoding="utf-8") as f:
+                return json.load(f)
+        resp = await _http().get(settings.LINE_JWKS_URL, timeout=10)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def get_key(self, kid: Optional[str]):
+        if self._stale(kid):
+            async with self._lock:
+                # 等待鎖的期間可能已由其他請求更新
+                if self._stale(kid):
+                    try:
+                        jwks = await self._load()
+                        self._keys = {
+                            jwk["kid"]: jwt.PyJWK(jwk, algorithm="ES256").key
+                            for jwk in jwks.get("keys", [])
+                            if jwk.get("kid")
+                        }
+                    except (httpx.HTTPError, OSError, ValueError, KeyError, jwt.PyJWKError) as exc:
+                        logger.error(f"取得 LINE JWKS 失敗: {exc!r}")
+                        if not self._keys:
+                            raise HTTPException(status_code=503, detail="無法取得 ID Token 公鑰") from exc
+                    self._fetched_at = time.monotonic()
+        key = self._keys.get(kid)
+        if key is None:
+            raise HTTPException(status_code=400, detail="ID Token 驗證失敗")
+        return key
+
+    def clear(self) -> None:
+        self._keys = {}
+        self._fetched_at = None
+
+
+_jwks = _JwksCache()
+
+
+async def verify_id_token(id_token: str, nonce: Optional[str]) -> Dict:
+    """
+    在本地驗證 LINE ID Token（不呼叫 LINE 的 verify 端點）：簽章（HS256 以 channel secret、ES256 以 JWKS）、
+    iss、aud（channel ID）、exp 與 nonce，回傳 payload。
+    """
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=400, detail="ID Token 驗證失敗")
+
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        key = settings.LINE_CLIENT_SECRET
+    elif algorithm == "ES256":
+        key = await _jwks.get_key(header.get("kid"))
+    else:
+        raise HTTPException(status_code=400, detail="ID Token 驗證失敗")
+
+    try:
+        decoded = jwt.decode(
+            id_token,
+            key=key,
+            algorithms=[algorithm],
+            audience=str(settings.LINE_CLIENT_ID),
+            issuer=ID_TOKEN_ISSUER,
+            leeway=ID_TOKEN_LEEWAY_SECONDS,
+            options={"require": ["iss", "sub", "aud", "exp", "iat"]},
+        )
+    except jwt.InvalidTokenError as exc:
+        logger.error(f"ID Token 驗證失敗: {exc}")
+        raise HTTPException(status_code=400, detail="ID Token 驗證失敗")
+
+    if nonce is not None and decoded.get("nonce") != nonce:
+        raise HTTPException(status_code=400, detail="nonce 驗證失敗")
+    return decoded
+
+
+async def _fetch_userinfo(access_token: str) -> Dict:
+    resp = await _http().get(USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"}, timeout=10)
+    if resp.status_code != 200:
+        logger.warning(f"userinfo 取得失敗: {resp.text}")
+        return {}
+    return resp.json()
+
+
 # ====== Build Authorization URL ======
 
-def build_authorize_url(
+async def build_authorize_url(
         db: Session,
         redirect_uri: str,
         prompt: Optional[str] = None,
@@ -64,15 +210,7 @@ def build_authorize_url(
     code_verifier = _generate_code_verifier()
     code_challenge = _code_challenge_s256(code_verifier)
 
-    sess = LineSessionState(
-        state=state,
-        nonce=nonce,
-        code_verifier=code_verifier,
-        redirect_uri=redirect_uri,
-        expires_at=datetime.utcnow() + timedelta(minutes=10),
-    )
-    db.add(sess)
-    db.commit()
+    await state_store.put(db, new_auth_state(state, nonce, code_verifier, redirect_uri))
 
     params = {
         "response_type": "code",
@@ -101,67 +239,52 @@ async def exchange_token_authorization_code(db: Session, code: str, state: str)
     """
     授權碼換取 access_token / id_token，並驗證 ID Token + 更新使用者資料
     """
-    sess: Optional[LineSessionState] = db.query(LineSessionState).filter(LineSessionState.state == state).first()
-    if not sess or sess.consumed:
+    # 先只讀取；換取 token 成功後才刪除，LINE 暫時失敗時 state 仍可重試
+    sess = await state_store.get(db, state)
+    if not sess:
         raise HTTPException(status_code=400, detail="state 無效或已使用")
-    if sess.expires_at and sess.expires_at < datetime.utcnow():
+    if sess.expires_at < datetime.utcnow():
         raise HTTPException(status_code=400, detail="state 已過期")
 
-    async with httpx.AsyncClient(timeout=15) as client:
-        data = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": sess.redirect_uri,
-            "client_id": settings.LINE_CLIENT_ID,
-            "client_secret": settings.LINE_CLIENT_SECRET,
-            "code_verifier": sess.code_verifier,
-        }
-        token_resp = await client.post(TOKEN_URL, data=data)
-        if token_resp.status_code != 200:
-            logger.error(f"交換 token 失敗: {token_resp.text}")
-            raise HTTPException(status_code=token_resp.status_code, detail="交換 token 失敗")
-
-        token_json = token_resp.json()
-        access_token = token_json.get("access_token")
-        refresh_token = token_json.get("refresh_token")
-        id_token = token_json.get("id_token")
-        expires_in = token_json.get("expires_in", 0)
+    data = {
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": sess.redirect_uri,
+        "client_id": settings.LINE_CLIENT_ID,
+        "client_secret": settings.LINE_CLIENT_SECRET,
+        "code_verifier": sess.code_verifier,
+    }
+    token_resp = await _http().post(TOKEN_URL, data=data)
+    if token_resp.status_code != 200:
+        logger.error(f"交換 token 失敗: {token_resp.text}")
+        raise HTTPException(status_code=token_resp.status_code, detail="交換 token 失敗")
+
+    token_json = token_resp.json()
+    access_token = token_json.get("access_token")
+    refresh_token = token_json.get("refresh_token")
+    id_token = token_json.get("id_token")
+    expires_in = token_json.get("expires_in", 0)
 
     if not access_token or not id_token:
         raise HTTPException(status_code=400, detail="缺少 access_token 或 id_token")
 
-    # ====== 使用 LINE verify endpoint 驗證 ID Token ======
-    async with httpx.AsyncClient(timeout=10) as client:
-        verify_data = {
-            "id_token": id_token,
-            "client_id": settings.LINE_CLIENT_ID,
-        }
-        verify_resp = await client.post(VERIFY_URL, data=verify_data)
-        if verify_resp.status_code != 200:
-            logger.error(f"ID Token 驗證失敗: {verify_resp.text}")
-            raise HTTPException(status_code=400, detail="ID Token 驗證失敗")
-
-        decoded = verify_resp.json()
-        logger.info(f"ID Token 驗證成功: {decoded}")
+    # ====== 本地驗證 ID Token（含 nonce） ======
+    decoded = await verify_id_token(id_token, sess.nonce)
 
-    # 驗證 nonce
-    if decoded.get("nonce") != sess.nonce:
-        raise HTTPException(status_code=400, detail="nonce 驗證失敗")
+    # 刪除 state（原子操作）；同時到達的回呼只有一個能繼續完成登入
+    if not await state_store.consume(db, state):
+        raise HTTPException(status_code=400, detail="state 無效或已使用")
 
     line_user_id = decoded.get("sub")
     email = decoded.get("email")
     display_name = decoded.get("name")
     picture_url = decoded.get("picture")
 
-    # ====== 從 userinfo 端點取更多資料 ======
-    async with httpx.AsyncClient(timeout=10) as client:
-        prof_resp = await client.get(USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"})
-        if prof_resp.status_code == 200:
-            prof = prof_resp.json()
-            display_name = prof.get("name", display_name)
-            picture_url = prof.get("picture", picture_url)
-        else:
-            logger.warning(f"userinfo 取得失敗: {prof_resp.text}")
+    # ====== ID Token 缺少名稱 / 頭像時才向 userinfo 端點補取 ======
+    if display_name is None or picture_url is None:
+        prof = await _fetch_userinfo(access_token)
+        display_name = prof.get("name", display_name)
+        picture_url = prof.get("picture", picture_url)
 
     now = datetime.utcnow()
     expires_at = now + timedelta(seconds=int(expires_in)) if expires_in else None
@@ -176,12 +299,11 @@ async def exchange_token_authorization_code(db: Session, code: str, state: str)
             email_granted=bool(email),
             scopes=settings.LINE_SCOPES,
             last_login_at=now,
-            access_token=access_token,
             refresh_token=refresh_token,
-            id_token=id_token,
             token_expires_at=expires_at,
             channel_id=str(settings.LINE_CLIENT_ID),
         )
+        previous_tokens = _set_tokens(user, access_token, id_token)
         db.add(user)
     else:
         user.display_name = display_name
@@ -189,13 +311,12 @@ async def exchange_token_authorization_code(db: Session, code: str, state: str)
         user.email = email
         user.email_granted = bool(email)
         user.last_login_at = now
-        user.access_token = access_token
+        previous_tokens = _set_tokens(user, access_token, id_token)
         user.refresh_token = refresh_token
-        user.id_token = id_token
         user.token_expires_at = expires_at
 
-    sess.consumed = True
     db.commit()
+    _forget_tokens(*previous_tokens)
     db.refresh(user)
 
     return {
@@ -214,18 +335,17 @@ async def exchange_token_refresh(db: Session, refresh_token: str) -> Dict:
     """
     依 LINE 規範，用 refresh_token 交換新 access_token。
     """
-    async with httpx.AsyncClient(timeout=15) as client:
-        data = {
-            "grant_type": "refresh_token",
-            "refresh_token": refresh_token,
-            "client_id": settings.LINE_CLIENT_ID,
-            "client_secret": settings.LINE_CLIENT_SECRET,
-        }
-        resp = await client.post(TOKEN_URL, data=data)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail="刷新 token 失敗")
-
-        token_json = resp.json()
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "client_id": settings.LINE_CLIENT_ID,
+        "client_secret": settings.LINE_CLIENT_SECRET,
+    }
+    resp = await _http().post(TOKEN_URL, data=data)
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail="刷新 token 失敗")
+
+    token_json = resp.json()
 
     access_token = token_json.get("access_token")
     new_refresh_token = token_json.get("refresh_token", refresh_token)
@@ -236,10 +356,12 @@ async def exchange_token_refresh(db: Session, refresh_token: str) -> Dict:
     if not user:
         raise HTTPException(status_code=404, detail="找不到對應的使用者")
 
-    user.access_token = access_token
+    previous_tokens = _set_tokens(user, access_token, user.id_token)
     user.refresh_token = new_refresh_token
     user.token_expires_at = datetime.utcnow() + timedelta(seconds=int(expires_in))
     db.commit()
+    # id_token 不變，但快取中的到期時間已過時，一併清除
+    _forget_tokens(*previous_tokens)
 
     return {
         "access_token": access_token,
@@ -253,21 +375,28 @@ async def exchange_token_refresh(db: Session, refresh_token: str) -> Dict:
 
 # ====== Revoke Token ======
 
-async def revoke_token(access_token: str) -> bool:
+async def revoke_token(db: Session, access_token: str) -> bool:
     """
-    撤銷 access_token。
+    撤銷 access_token；本地也一併清除，撤銷後不能再用於 verify_user_token。
     """
-    async with httpx.AsyncClient(timeout=15) as client:
-        data = {
-            "access_token": access_token,
-            "client_id": settings.LINE_CLIENT_ID,
-            "client_secret": settings.LINE_CLIENT_SECRET,
-        }
-        resp = await client.post(REVOKE_URL, data=data)
-        if resp.status_code == 200:
-            return True
+    data = {
+        "access_token": access_token,
+        "client_id": settings.LINE_CLIENT_ID,
+        "client_secret": settings.LINE_CLIENT_SECRET,
+    }
+    resp = await _http().post(REVOKE_URL, data=data)
+    if resp.status_code != 200:
         raise HTTPException(status_code=resp.status_code, detail="撤銷失敗")
 
+    user = db.query(LineUser).filter(LineUser.access_token_hash == token_hash(access_token)).first()
+    if user is not None:
+        previous_tokens = _set_tokens(user, None, user.id_token)
+        db.commit()
+        _forget_tokens(*previous_tokens)
+    else:
+        _forget_tokens(access_token)
+    return True
+
 
 # ====== Userinfo (Local lookup) ======
 
@@ -275,7 +404,7 @@ def userinfo_from_id_token(db: Session, id_token: str) -> Dict:
     """
     根據本地已驗證的 id_token 找使用者資料。
     """
-    user = db.query(LineUser).filter(LineUser.id_token == id_token).first()
+    user = db.query(LineUser).filter(LineUser.id_token_hash == token_hash(id_token)).first()
     if not user:
         raise HTTPException(status_code=404, detail="找不到對應使用者")
     return {
@@ -328,28 +457,49 @@ def verify_user_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user: Optional[LineUser] = (
-        db.query(LineUser)
-        .filter(or_(LineUser.access_token == token, LineUser.id_token == token))
-        .first()
-    )
+    digest = token_hash(token)
+    user: Optional[LineUser] = _token_cache.get(digest)
     if user is None:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token 無效或使用者不存在")
-
-    if user.token_expires_at is not None:
-        now = datetime.now(timezone.utc)
-        expires = user.token_expires_at
-        if expires.tzinfo is None:
-            expires = expires.replace(tzinfo=timezone.utc)
-        if now >= expires:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token 已過期",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        db_user = (
+            db.query(LineUser)
+            .filter(or_(LineUser.access_token_hash == digest, LineUser.id_token_hash == digest))
+            .first()
+        )
+        if db_user is None:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token 無效或使用者不存在")
+        user = _snapshot(db_user)
+        ttl = settings.LINE_TOKEN_CACHE_TTL_SECONDS
+        expires = _expires_at(user)
+        if expires is not None:
+            ttl = min(ttl, (expires - datetime.now(timezone.utc)).total_seconds())
+        if ttl > 0:
+            _token_cache.set(digest, user, ttl=ttl)
+
+    expires = _expires_at(user)
+    if expires is not None and datetime.now(timezone.utc) >= expires:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token 已過期",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
+def _snapshot(user: LineUser) -> LineUser:
+    """
+    複製成不屬於任何 session 的 LineUser 放入快取；
+    原物件在請求的 session commit 後會過期，離開 session 後無法再讀取
+    """
+    return LineUser(**{column.key: getattr(user, column.key) for column in LineUser.__table__.columns})
+
+
+def _expires_at(user: LineUser) -> Optional[datetime]:
+    expires = user.token_expires_at
+    if expires is not None and expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return expires
+
+
 def require_scopes(*required_scopes: str) -> Callable[[LineUser], LineUser]:
     required = {s.strip().lower() for s in required_scopes if s.strip()}
 
@@ -0,0 +1,166 @@
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import redis
+import redis.asyncio as redis_asyncio
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from ..cache import TTLCache
+from ..config import settings
+from ..models import LineSessionState
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# LINE Login 的授權狀態（state / nonce / PKCE code_verifier）：/line/authorize 時存入，
+# /line/token 回呼時以 state 取出（get），向 LINE 換取 token 成功後才刪除（consume）；
+# consume 為原子操作，同一個 state 只有一個回呼能完成登入。過期的狀態不需另外清理。
+# LINE_STATE_STORE 選擇存放位置：
+#   memory   各 worker 的記憶體（僅限單一 worker / 單機，回呼可能落在其他 worker）
+#   redis    Redis（SET ... EX），多機部署時使用
+#   postgres line_session_states 資料表，定期刪除過期資料
+#   auto     有 REDIS_URL 時使用 redis，否則 postgres（預設）
+# ===================================================================
+
+
+@dataclass
+class AuthState:
+    state: str
+    nonce: str
+    code_verifier: str
+    redirect_uri: str
+    expires_at: datetime  # UTC（naive，與 datetime.utcnow() 相同）
+
+
+class MemoryStateStore:
+    def __init__(self):
+        self._states = TTLCache(maxsize=settings.LINE_STATE_MAX_ENTRIES, ttl=settings.LINE_STATE_TTL_SECONDS)
+
+    async def put(self, db: Session, auth_state: AuthState) -> None:
+        self._states.set(auth_state.state, auth_state)
+
+    async def get(self, db: Session, state: str) -> Optional[AuthState]:
+        return self._states.get(state)
+
+    async def consume(self, db: Session, state: str) -> bool:
+        return self._states.pop(state) is not None
+
+
+class RedisStateStore:
+    _KEY = "gf:line:state:{}"
+
+    def __init__(self, url: str):
+        self._redis = redis_asyncio.Redis.from_url(url)
+
+    async def put(self, db: Session, auth_state: AuthState) -> None:
+        value = asdict(auth_state)
+        value["expires_at"] = auth_state.expires_at.isoformat()
+        try:
+            await self._redis.set(self._KEY.format(auth_state.state), json.dumps(value), ex=settings.LINE_STATE_TTL_SECONDS)
+        except redis.RedisError:
+            logger.exception("LINE state store: Redis set failed")
+            raise HTTPException(status_code=503, detail="暫時無法建立登入狀態，請稍後再試")
+
+    async def get(self, db: Session, state: str) -> Optional[AuthState]:
+        try:
+            raw = await self._redis.get(self._KEY.format(state))
+        except redis.RedisError:
+            logger.exception("LINE state store: Redis get failed")
+            raise HTTPException(status_code=503, detail="暫時無法驗證登入狀態，請稍後再試")
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        value["expires_at"] = datetime.fromisoformat(value["expires_at"])
+        return AuthState(**value)
+
+    async def consume(self, db: Session, state: str) -> bool:
+        try:
+            return await self._redis.delete(self._KEY.format(state)) == 1
+        except redis.RedisError:
+            logger.exception("LINE state store: Redis delete failed")
+            raise HTTPException(status_code=503, detail="暫時無法驗證登入狀態，請稍後再試")
+
+
+class PostgresStateStore:
+    # Session 為同步 I/O：實際的查詢在 threadpool 執行，不阻塞 event loop
+    def __init__(self):
+        self._last_purge = 0.0
+
+    async def put(self, db: Session, auth_state: AuthState) -> None:
+        await run_in_threadpool(self._put, db, auth_state)
+
+    async def get(self, db: Session, state: str) -> Optional[AuthState]:
+        return await run_in_threadpool(self._get, db, state)
+
+    async def consume(self, db: Session, state: str) -> bool:
+        return await run_in_threadpool(self._consume, db, state)
+
+    def _put(self, db: Session, auth_state: AuthState) -> None:
+        db.add(LineSessionState(**asdict(auth_state)))
+        self._purge_if_due(db)
+        db.commit()
+
+    def _get(self, db: Session, state: str) -> Optional[AuthState]:
+        model = LineSessionState
+        row = db.execute(
+            select(model.state, model.nonce, model.code_verifier, model.redirect_uri, model.expires_at)
+            .where(model.state == state, or_(model.consumed.is_(False), model.consumed.is_(None)))
+        ).first()
+        if row is None:
+            return None
+        return AuthState(*row)
+
+    def _consume(self, db: Session, state: str) -> bool:
+        # 以 DELETE ... RETURNING 刪除，兩個同時到達的回呼只有一個刪得到
+        model = LineSessionState
+        row = db.execute(
+            delete(model)
+            .where(model.state == state, or_(model.consumed.is_(False), model.consumed.is_(None)))
+            .returning(model.state)
+        ).first()
+        db.commit()
+        return row is not None
+
+    def _purge_if_due(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < settings.LINE_STATE_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        model = LineSessionState
+        # consumed：舊版使用後只標記、不刪除的資料
+        db.execute(delete(model).where(or_(model.expires_at < datetime.utcnow(), model.consumed.is_(True))))
+
+
+def _create_store():
+    backend = settings.LINE_STATE_STORE
+    if backend == "auto":
+        backend = "redis" if settings.REDIS_URL else "postgres"
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("LINE_STATE_STORE=redis requires REDIS_URL")
+        return RedisStateStore(settings.REDIS_URL)
+    if backend == "postgres":
+        return PostgresStateStore()
+    raise ValueError(f"Unknown LINE_STATE_STORE: {settings.LINE_STATE_STORE!r}")
+
+
+store = _create_store()
+
+
+def new_auth_state(state: str, nonce: str, code_verifier: str, redirect_uri: str) -> AuthState:
+    return AuthState(
+        state=state,
+        nonce=nonce,
+        code_verifier=code_verifier,
+        redirect_uri=redirect_uri,
+        expires_at=datetime.utcnow() + timedelta(seconds=settings.LINE_STATE_TTL_SECONDS),
+    )
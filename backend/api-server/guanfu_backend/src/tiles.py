@@ -0,0 +1,188 @@
+import logging
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+import redis
+import redis.asyncio as redis_asyncio
+from sqlalchemy import func, select
+
+from . import models
+from .cache import TTLCache
+from .config import settings
+from .crud_async import AsyncDB
+from .enum_serializer import normalize_filters_dict
+from .geo import Area
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# 地圖圖磚：/places/tiles/{z}/{x}/{y}
+# 以 Web Mercator (XYZ) 切分，每張圖磚切成 TILE_CLUSTER_GRID x TILE_CLUSTER_GRID 格，
+# 同一格內相同 type / status 的場所合併成一個點（count 為數量），輸出 GeoJSON。
+# 圖磚快取以 (z, x, y) 為單位；場所新增 / 更新時只讓舊、新座標所在的圖磚失效：
+# 每張圖磚有一個版本號，寫入（commit）後遞增，快取 key 含版本號，舊資料自然不再命中。
+# 快取未命中時從主資料庫查詢（replica 可能尚未同步剛寫入的資料），
+# 查詢期間版本號有變動時不回寫，避免把失效前的結果存到新版本下。
+# ===================================================================
+
+MAX_ZOOM = 22
+MEDIA_TYPE = "application/geo+json"
+
+# 有設定 REDIS_URL 時圖磚與版本號存在 Redis（跨 worker 一起失效），
+# 否則存在各 worker 的記憶體（其他 worker 的寫入無法通知，只保留 TILE_CACHE_LOCAL_TTL_SECONDS）
+_memory = TTLCache(maxsize=settings.TILE_CACHE_MAX_ENTRIES, ttl=settings.TILE_CACHE_LOCAL_TTL_SECONDS)
+_local_versions: Dict[Tuple[int, int, int], int] = {}
+_redis = redis.Redis.from_url(settings.REDIS_URL) if settings.REDIS_URL else None
+_redis_async = redis_asyncio.Redis.from_url(settings.REDIS_URL) if settings.REDIS_URL else None
+
+_VERSION_KEY = "gf:tile:ver:{}/{}/{}"
+_TILE_KEY = "gf:tile:{}/{}/{}:{}"
+
+Tile = Tuple[int, int, int]
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """圖磚的範圍 (min_lng, min_lat, max_lng, max_lat)"""
+    n = 2 ** z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tile_for(lat: float, lng: float, z: int) -> Tuple[int, int]:
+    """座標在縮放層級 z 所在的圖磚 (x, y)"""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_points(points: Iterable[Tuple[Optional[float], Optional[float]]]) -> List[Tile]:
+    """各縮放層級中包含這些 (lat, lng) 的圖磚；沒有座標的點略過"""
+    tiles = set()
+    for lat, lng in points:
+        if lat is None or lng is None:
+            continue
+        for z in range(MAX_ZOOM + 1):
+            tiles.add((z, *tile_for(lat, lng, z)))
+    return sorted(tiles)
+
+
+def invalidate_points(*points: Tuple[Optional[float], Optional[float]]) -> None:
+    """場所寫入（commit）後呼叫，傳入異動前後的 (geo_lat, geo_lng)，讓所在的圖磚失效"""
+    tiles = tiles_for_points(points)
+    if not tiles:
+        return
+    for tile in tiles:
+        _local_versions[tile] = _local_versions.get(tile, 0) + 1
+    if _redis is not None:
+        try:
+            pipe = _redis.pipeline(transaction=False)
+            for tile in tiles:
+                pipe.incr(_VERSION_KEY.format(*tile))
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("tile cache: failed to bump tile versions in Redis", exc_info=True)
+
+
+async def _get_version(tile: Tile) -> Optional[int]:
+    if _redis_async is None:
+        return _local_versions.get(tile, 0)
+    try:
+        return int(await _redis_async.get(_VERSION_KEY.format(*tile)) or 0)
+    except redis.RedisError:
+        # 無法確認版本時不使用快取，避免回傳已失效的圖磚
+        logger.warning("tile cache: failed to read tile version from Redis", exc_info=True)
+        return None
+
+
+async def _cached(tile: Tile, version: int, variant: str) -> Optional[bytes]:
+    if _redis_async is None:
+        return (_memory.get((tile, version)) or {}).get(variant)
+    try:
+        return await _redis_async.hget(_TILE_KEY.format(*tile, version), variant)
+    except redis.RedisError:
+        logger.warning("tile cache: Redis get failed", exc_info=True)
+        return None
+
+
+async def _store(tile: Tile, version: int, variant: str, body: bytes) -> None:
+    if _redis_async is None:
+        # 同一張圖磚、同一版本的不同篩選條件放在同一筆
+        variants: Dict[str, bytes] = _memory.get((tile, version)) or {}
+        _memory.set((tile, version), {**variants, variant: body})
+        return
+    key = _TILE_KEY.format(*tile, version)
+    try:
+        pipe = _redis_async.pipeline(transaction=False)
+        pipe.hset(key, variant, body)
+        pipe.expire(key, settings.TILE_CACHE_TTL_SECONDS)
+        await pipe.execute()
+    except redis.RedisError:
+        logger.warning("tile cache: Redis set failed", exc_info=True)
+
+
+async def render(db: AsyncDB, z: int, x: int, y: int, **filters) -> bytes:
+    """查詢圖磚範圍內的場所並依格子 + type + status 聚合，回傳 GeoJSON FeatureCollection"""
+    min_lng, min_lat, max_lng, max_lat = tile_bounds(z, x, y)
+    grid = settings.TILE_CLUSTER_GRID
+    Place = models.Place
+    cell_x = func.least(func.floor((Place.geo_lng - min_lng) / ((max_lng - min_lng) / grid)), grid - 1)
+    cell_y = func.least(func.floor((max_lat - Place.geo_lat) / ((max_lat - min_lat) / grid)), grid - 1)
+    stmt = (
+        select(
+            Place.type,
+            Place.status,
+            func.count(),
+            func.avg(Place.geo_lng),
+            func.avg(Place.geo_lat),
+            func.min(Place.id),
+            func.min(Place.name),
+        )
+        .filter(*Area(bbox=(min_lng, min_lat, max_lng, max_lat)).criteria(Place))
+        # 邊界上的點只算在一張圖磚：經度含左不含右、緯度含上不含下（與 tile_for 相同）
+        .filter(Place.geo_lng < max_lng, Place.geo_lat > min_lat)
+        .filter_by(**filters)
+        .group_by(Place.type, Place.status, cell_x, cell_y)
+    )
+    features = []
+    for place_type, status, count, lng, lat, place_id, name in (await db.execute(stmt)).all():
+        properties = {"type": place_type, "status": status, "count": count}
+        if count == 1:
+            properties.update(id=place_id, name=name)
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lng, lat]},
+                "properties": properties,
+            }
+        )
+    return orjson.dumps({"type": "FeatureCollection", "features": features})
+
+
+async def get_tile(db: AsyncDB, z: int, x: int, y: int, use_cache: bool = True, **filters) -> Tuple[bytes, bool]:
+    """回傳 (GeoJSON bytes, 是否命中快取)；filters 為 status / type（值為 None 表示不篩選）"""
+    tile = (z, x, y)
+    filters = normalize_filters_dict(filters)
+    variant = "&".join(f"{k}={v}" for k, v in sorted(filters.items()))
+    version = await _get_version(tile) if use_cache else None
+    if version is not None:
+        body = await _cached(tile, version, variant)
+        if body is not None:
+            metrics.inc("tile_cache_requests_total", result="hit")
+            return body, True
+    metrics.inc("tile_cache_requests_total", result="miss" if version is not None else "bypass")
+    body = await render(db, z, x, y, **filters)
+    # 查詢期間有寫入（版本號已變）時不回寫：查詢結果可能不含這次寫入
+    if version is not None and await _get_version(tile) == version:
+        await _store(tile, version, variant, body)
+    return body, False
@@ -1,5 +1,6 @@
 import logging
 import os
+from urllib.parse import parse_qs, urlparse
 
 import dotenv
 import requests
@@ -110,7 +111,9 @@ class GfApiClient:
         batch_size: int = 100,
         **kwargs,
     ) -> list[BaseModel]:
-        """取得所有資源（分頁處理）
+        """取得所有資源（游標分頁處理）
+
+        使用 API 的 cursor 分頁逐頁讀取，每頁成本固定，不會因 offset 變大而變慢。
 
         Args:
             endpoint: API 端點路徑（例如 "human_resources", "supplies"）
@@ -123,10 +126,10 @@ class GfApiClient:
             解析後的 model 列表
         """
         all_resources: list[BaseModel] = []
-        offset = 0
+        cursor = ""  # 空字串代表從第一頁開始
 
         while True:
-            params = {"limit": batch_size, "offset": offset, **kwargs}
+            params = {"limit": batch_size, "cursor": cursor, **kwargs}
 
             response = self.base_request(
                 "GET",
@@ -134,10 +137,6 @@ class GfApiClient:
                 params=params,
             )
 
-            total_items = response.get("totalItems", 0)
-            if total_items == 0:
-                break
-
             members = response.get("member", [])
             if not members:
                 break
@@ -148,9 +147,11 @@ class GfApiClient:
             for item in members:
                 all_resources.append(model_class(**item))
 
-            offset += len(members)
-
-            if offset >= total_items:
+            next_link = response.get("next")
+            if not next_link:
+                break
+            cursor = parse_qs(urlparse(next_link).query).get("cursor", [""])[0]
+            if not cursor:
                 break
 
         logger.info(f"Total {endpoint} fetched: {len(all_resources)}")
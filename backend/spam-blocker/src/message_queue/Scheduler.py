@@ -1,4 +1,5 @@
 import logging
+import time
 from functools import partial
 from typing import Callable
 
@@ -9,6 +10,9 @@ from wokers import RecordFetcher
 
 logger = logging.getLogger(__name__)
 
+# 增量抓取的時間重疊（秒），避免兩台主機的時鐘誤差漏掉資料；重複的記錄會被 RecordFetcher 過濾
+FETCH_OVERLAP_SECONDS = 60
+
 
 class Scheduler:
     """排程器 - 協調資料抓取和 Queue 管理"""
@@ -35,6 +39,7 @@ class Scheduler:
         self.add_to_queue = add_to_queue_func
         self.resource_type = resource_type
         self.all_records_loaded_key = f"spam_blocker:all_records_loaded:{resource_type}"
+        self.last_fetched_at_key = f"spam_blocker:last_fetched_at:{resource_type}"
 
     def is_all_records_loaded(self) -> bool:
         """檢查是否已載入所有記錄"""
@@ -45,8 +50,17 @@ class Scheduler:
         self.redis.set(self.all_records_loaded_key, "1")
         logger.info(f"已標記 {self.resource_type} 所有記錄載入完成")
 
+    def get_last_fetched_at(self) -> int | None:
+        """上次抓取開始的時間（unix timestamp）；尚未記錄時回傳 None"""
+        value = self.redis.get(self.last_fetched_at_key)
+        return int(value) if value is not None else None
+
+    def set_last_fetched_at(self, timestamp: int):
+        self.redis.set(self.last_fetched_at_key, str(timestamp))
+
     def scheduled_fetch(self, limit: int = 10, offset: int = 0):
         """定時抓取任務"""
+        started_at = int(time.time()) - FETCH_OVERLAP_SECONDS
         if not self.is_all_records_loaded():
             logger.info(f"[定時任務 - {self.resource_type}] 首次執行，開始載入所有記錄...")
 
@@ -61,19 +75,33 @@ class Scheduler:
                 self.add_to_queue(new_records)
                 logger.info(f"[定時任務 - {self.resource_type}] 已將 {len(new_records)} 筆資料加入 Redis queue")
                 self.mark_all_records_loaded()
+                self.set_last_fetched_at(started_at)
             else:
                 logger.warning(
                     f"[定時任務 - {self.resource_type}] 沒有載入到任何新資料（可能全被過濾或 API 異常），保持未完成狀態以便重試"
                 )
         else:
-            logger.info(f"[定時任務 - {self.resource_type}] 開始抓取最新 {limit} 筆資料...")
-
-            if self.resource_type == "human_resource":
-                get_method = partial(self.gf_api_client.get_human_resource, limit=limit, offset=offset, status="active")
-            elif self.resource_type == "supplies":
-                get_method = partial(self.gf_api_client.get_supplies, limit=limit, offset=offset, embed="all")
+            last_fetched_at = self.get_last_fetched_at()
+            if last_fetched_at is not None:
+                # 只抓上次之後新增或修改的資料（API 的 updated_since），不受每分鐘筆數上限影響
+                logger.info(f"[定時任務 - {self.resource_type}] 開始抓取 {last_fetched_at} 之後異動的資料...")
+                if self.resource_type == "human_resource":
+                    get_method = partial(
+                        self.gf_api_client.get_all_human_resources, status="active", updated_since=last_fetched_at
+                    )
+                else:
+                    get_method = partial(self.gf_api_client.get_all_supplies, embed="all", updated_since=last_fetched_at)
+            else:
+                logger.info(f"[定時任務 - {self.resource_type}] 開始抓取最新 {limit} 筆資料...")
+                if self.resource_type == "human_resource":
+                    get_method = partial(
+                        self.gf_api_client.get_human_resource, limit=limit, offset=offset, status="active"
+                    )
+                else:
+                    get_method = partial(self.gf_api_client.get_supplies, limit=limit, offset=offset, embed="all")
 
             new_records = self.fetcher.fetch_new_records(get_method)
+            self.set_last_fetched_at(started_at)
 
             if new_records:
                 self.add_to_queue(new_records)